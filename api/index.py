@@ -0,0 +1,11 @@
+# api/index.py
+"""
+Vercel entry point. Runs the app in serverless mode: no scheduler, no
+update queue, and no webhook check on cold starts. Register the webhook
+after each deploy with `python -m app.bot_setup`.
+"""
+import os
+
+os.environ.setdefault("SERVERLESS", "true")
+
+from app.main import app  # noqa: E402
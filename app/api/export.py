@@ -0,0 +1,30 @@
+# app/api/export.py
+from datetime import datetime
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.services import export_service
+
+router = APIRouter()
+
+
+@router.get("/export/{user_id}")
+async def export_transactions(user_id: int, expires: int, sig: str, format: str = "csv",
+                              since: str = "", until: str = ""):
+    """
+    Streams the user's transactions as CSV or NDJSON. Only links signed by
+    the bot's "export" command are accepted, until they expire.
+    """
+    if format not in export_service.FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown format")
+    if not export_service.verify_export_link(user_id, format, since, until, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+
+    start = datetime.fromisoformat(since) if since else None
+    end = datetime.fromisoformat(until) if until else None
+    media_type = export_service.FORMATS[format][0]
+    filename = export_service.export_filename(format, start, end)
+    return StreamingResponse(
+        export_service.iter_export(user_id, format, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,64 +1,268 @@
-from fastapi import APIRouter, Request
+import asyncio
+import io
+import tempfile
+from datetime import datetime
+from typing import Awaitable, Optional, Set
+from fastapi import APIRouter, Request, Response
 from telegram import Update
-from app.bot_setup import application
+from telegram.constants import MessageLimit
+from telegram.error import TelegramError
+from app.bot_setup import get_bot
+from app.core import metrics
+from app.core.config import settings
+from app.core.dedupe import deduplicator
+from app.core.update_queue import UpdateQueue
 from app.db import users as db_users
 from app.nlp import parser
-from app.services import finance_service
+from app.services import export_service, finance_service
 
 router = APIRouter()
 
-@router.post("/telegram")
-async def telegram_webhook(request: Request):
-    """Handle incoming Telegram updates by processing them."""
-    body = await request.json()
-    update = Update.de_json(body, application.bot)
-    
-    # Skip if no message or no text
-    if not update.message or not update.message.text:
-        return {"status": "ok, no message to process"}
+CSV_MIME_TYPES = {"text/csv", "text/comma-separated-values", "application/csv", "text/plain"}
 
-    user_id = update.message.from_user.id
-    username = update.message.from_user.username or update.message.from_user.first_name
-    text = update.message.text
-    
+# Imports and exports run past the webhook request; held here so they
+# aren't garbage collected midway
+_background: Set[asyncio.Task] = set()
+
+
+async def run_in_background(work: Awaitable):
+    """
+    Runs `work` after the webhook has been answered, since large imports
+    and exports take longer than Telegram waits. A serverless function may
+    be frozen once it has answered, so there the work is done first.
+    """
+    if settings.SERVERLESS:
+        await work
+        return
+    task = asyncio.create_task(work)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def build_response(user_id: int, username: str, text: str, update_id: int = None) -> str:
+    """Runs the DB and service work for one message and returns the reply text."""
     # Ensure the user exists in our DB
-    db_users.get_or_create_user(user_id, username)
-    
+    await db_users.get_or_create_user(user_id, username)
+
     # Determine the intent of the message
-    intent = parser.get_intent(text)
-    response_message = ""
+    with metrics.span("parse"):
+        intent = parser.get_intent(text)
+    metrics.count("intent", intent=intent)
+
+    # Service time includes the DB calls it makes, which are also timed
+    # on their own under the "db" stage
+    with metrics.span("service", intent=intent):
+        return await _dispatch(intent, user_id, text, update_id)
 
+
+async def _dispatch(intent: str, user_id: int, text: str, update_id: int = None) -> str:
     if intent == 'start':
-        response_message = finance_service.get_start_message()
+        return finance_service.get_start_message()
 
     elif intent == 'help':
-        response_message = finance_service.get_help_message()
+        return finance_service.get_help_message()
 
     elif intent in ('expense', 'income'):
         # Process either an expense or income
-        response_message = await finance_service.process_transaction(user_id, text)
+        return await finance_service.process_transaction(user_id, text, update_id)
 
     elif intent == 'summary':
-        response_message = await finance_service.generate_weekly_summary(user_id)
+        return await finance_service.generate_weekly_summary(user_id)
 
     elif intent == 'balance':
-        response_message = await finance_service.get_balance(user_id)
-
-    else:
-        response_message = (
-            "Sorry, I didn't understand that.\n\n"
-            "Try logging an expense or income like:\n"
-            "`spent 100 on snacks`\n"
-            "`earned 500 from freelancing`\n\n"
-            "Or ask for:\n"
-            "`summary`, `balance`, `help`"
-        )
+        return await finance_service.get_balance(user_id)
 
-    # Send the response back to the user
-    await application.bot.send_message(
-        chat_id=user_id, 
-        text=response_message, 
-        parse_mode='Markdown'
+    elif intent == 'timezone':
+        return await finance_service.set_timezone(user_id, text)
+
+    elif intent == 'import':
+        return finance_service.get_import_help()
+
+    elif intent == 'export':
+        request = export_service.parse_export_request(text)
+        if request is None:
+            return export_service.EXPORT_USAGE
+        await run_in_background(export_document(user_id, *request))
+        return "📤 Preparing your export…"
+
+    return (
+        "Sorry, I didn't understand that.\n\n"
+        "Try logging an expense or income like:\n"
+        "`spent 100 on snacks`\n"
+        "`earned 500 from freelancing`\n\n"
+        "Or ask for:\n"
+        "`summary`, `balance`, `help`"
     )
 
-    return {"status": "ok"}
+
+async def import_document(update: Update):
+    """
+    Imports a CSV statement sent as a document. Progress and the outcome are
+    shown by editing a single status message.
+    """
+    message = update.message
+    user_id = message.from_user.id
+    document = message.document
+    bot = get_bot()
+    await db_users.get_or_create_user(user_id, message.from_user.username or message.from_user.first_name)
+
+    if not (document.file_name or "").lower().endswith(".csv") and document.mime_type not in CSV_MIME_TYPES:
+        await bot.send_message(chat_id=user_id, text=finance_service.get_import_help())
+        return
+    if document.file_size and document.file_size > settings.IMPORT_MAX_BYTES:
+        limit = settings.IMPORT_MAX_BYTES // (1024 * 1024)
+        await bot.send_message(chat_id=user_id, text=f"That file is too large to import; the limit is {limit} MB.")
+        return
+
+    status = await bot.send_message(chat_id=user_id, text="📥 Importing your statement…")
+
+    async def show(text: str):
+        try:
+            await bot.edit_message_text(text, chat_id=user_id, message_id=status.message_id)
+        except TelegramError as e:
+            # Progress is best effort
+            print(f"Could not update import status for {user_id}: {e}")
+
+    metrics.count("intent", intent="import")
+    try:
+        # Spooled to disk and parsed row by row, so memory stays flat
+        # however long the statement is
+        with metrics.span("service", intent="import"), tempfile.TemporaryFile() as raw:
+            file = await bot.get_file(document.file_id)
+            await file.download_to_memory(raw)
+            raw.seek(0)
+            lines = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+            result = await finance_service.import_statement(
+                user_id, lines, f"imp-{document.file_unique_id}", show
+            )
+    except Exception as e:
+        print(f"Statement import failed for {user_id}: {e}")
+        result = ("⚠️ The import stopped before finishing. Send the file again to continue; "
+                  "rows already imported are skipped.")
+    await show(result)
+
+
+async def export_document(user_id: int, fmt: str, since: Optional[datetime], until: Optional[datetime]):
+    """
+    Sends the user's history, or the range asked for, as a document. It is
+    encoded into a temporary file page by page; exports over
+    EXPORT_DOCUMENT_MAX_BYTES get a link to the streaming route instead.
+    """
+    bot = get_bot()
+    metrics.count("intent", intent="export")
+    try:
+        with metrics.span("service", intent="export"), tempfile.TemporaryFile() as out:
+            size = 0
+            chunks = export_service.iter_export(user_id, fmt, since, until)
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > settings.EXPORT_DOCUMENT_MAX_BYTES:
+                    break
+                out.write(chunk)
+            await chunks.aclose()
+
+            if not size:
+                await bot.send_message(chat_id=user_id, text="No transactions to export in that range.")
+            elif size > settings.EXPORT_DOCUMENT_MAX_BYTES:
+                link = export_service.export_link(user_id, fmt, since, until)
+                minutes = settings.EXPORT_LINK_TTL_SECONDS // 60
+                await bot.send_message(
+                    chat_id=user_id,
+                    text=f"Your export is too large to send here. Download it within {minutes} minutes: {link}"
+                )
+            else:
+                out.seek(0)
+                await bot.send_document(
+                    chat_id=user_id,
+                    document=out,
+                    filename=export_service.export_filename(fmt, since, until)
+                )
+    except Exception as e:
+        # Runs as a background task, so nothing else would report this
+        print(f"Export failed for {user_id}: {e}")
+        try:
+            await bot.send_message(chat_id=user_id, text="⚠️ Your export failed. Please try again in a moment.")
+        except TelegramError as send_error:
+            print(f"Could not report the failed export to {user_id}: {send_error}")
+
+
+async def handle_update(update: Update, reply_in_response: bool = False):
+    """
+    Processes a text message update and replies to it.
+
+    With `reply_in_response` the reply is returned as a sendMessage payload
+    for the webhook response body, which saves the outbound round trip.
+    Replies too long for that are still sent explicitly.
+
+    Documents are statement imports, which reply on their own.
+    """
+    if update.message.document is not None:
+        await run_in_background(import_document(update))
+        return None
+
+    user_id = update.message.from_user.id
+    username = update.message.from_user.username or update.message.from_user.first_name
+    response_message = await build_response(user_id, username, update.message.text, update.update_id)
+
+    if reply_in_response and len(response_message) <= MessageLimit.MAX_TEXT_LENGTH:
+        return {
+            "method": "sendMessage",
+            "chat_id": user_id,
+            "text": response_message,
+            "parse_mode": "Markdown"
+        }
+
+    # Send the response back to the user
+    with metrics.span("send", method="sendMessage"):
+        await get_bot().send_message(
+            chat_id=user_id,
+            text=response_message,
+            parse_mode='Markdown'
+        )
+
+
+# Used when WEBHOOK_QUEUE_ENABLED is set; started and drained by the lifespan in app/main.py
+update_queue = UpdateQueue(
+    handle_update,
+    workers=settings.WEBHOOK_QUEUE_WORKERS,
+    maxsize=settings.WEBHOOK_QUEUE_SIZE,
+    put_timeout=settings.WEBHOOK_QUEUE_PUT_TIMEOUT,
+)
+
+
+@router.post("/telegram")
+async def telegram_webhook(request: Request):
+    """Handle incoming Telegram updates by processing them."""
+    body = await request.json()
+
+    # Redelivered updates are dropped before any parsing or DB work
+    update_id = body.get("update_id")
+    if update_id is not None and await deduplicator.is_duplicate(update_id):
+        return {"status": "ok, duplicate update"}
+
+    update = Update.de_json(body, get_bot())
+
+    # Skip if no message, or neither text nor a document to import
+    if not update.message or not (update.message.text or update.message.document):
+        return {"status": "ok, no message to process"}
+
+    if update_queue.running:
+        # Acknowledge now and let a worker do the DB work and the reply
+        if not await update_queue.submit(update.message.from_user.id, update):
+            # Telegram redelivers on non-2xx, which gives us natural backpressure
+            await deduplicator.forget(update.update_id)
+            return Response(status_code=503)
+        return {"status": "queued"}
+
+    try:
+        with metrics.span("webhook"):
+            reply = await handle_update(update, settings.REPLY_IN_WEBHOOK)
+    except Exception:
+        # Let Telegram's retry through; the transaction ID derived from the
+        # update keeps a partially processed message from being logged twice
+        await deduplicator.forget(update.update_id)
+        raise
+    if settings.SERVERLESS:
+        # No scheduler flushes last_active in a serverless function
+        await db_users.flush_last_active_if_due(settings.LAST_ACTIVE_FLUSH_SECONDS)
+    return reply or {"status": "ok"}
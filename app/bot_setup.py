@@ -1,21 +1,81 @@
 # app/bot_setup.py
-from telegram.ext import Application
+import asyncio
+from typing import Optional
+from telegram import Bot
+from app.core.bot_http import build_request
 from app.core.config import settings
+from app.db.jobs import get_job_state, set_job_state
 
-# Initialize the bot application
-application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
-bot = application.bot
+# Job state recording the URL Telegram currently delivers updates to
+WEBHOOK_STATE = "telegram_webhook"
 
-async def set_telegram_webhook():
-    """Sets the Telegram webhook on application startup."""
+_bot: Optional[Bot] = None
+
+def get_bot() -> Bot:
+    """
+    Creates the bot client on first use rather than at import time. Updates
+    arrive through the webhook, so a plain Bot is all that's needed and
+    telegram.ext (with its updater and webhook server) is never imported.
+    Its connection pool is configured by the BOT_* settings.
+    """
+    global _bot
+    if _bot is None:
+        _bot = Bot(
+            settings.TELEGRAM_BOT_TOKEN,
+            base_url=settings.TELEGRAM_API_BASE_URL,
+            base_file_url=settings.TELEGRAM_API_FILE_URL,
+            request=build_request(),
+        )
+    return _bot
+
+async def prewarm_bot_connections(connections: int):
+    """
+    Opens up to `connections` pooled connections to the Bot API with
+    concurrent getMe calls, so the first replies after startup reuse them.
+    """
+    bot = get_bot()
+    # One HTTP/2 connection carries every send
+    opened = 1 if settings.BOT_HTTP2 else min(connections, settings.BOT_POOL_SIZE)
+    try:
+        await bot.initialize()
+        # Concurrent, so each call needs a connection of its own
+        await asyncio.gather(*(bot.get_me() for _ in range(opened)))
+        print(f"Opened {opened} Bot API connection(s).")
+    except Exception as e:
+        # Only a warm-up; sends open connections as they need them
+        print(f"Could not pre-warm Bot API connections: {e}")
+
+async def close_bot():
+    """Closes the Bot API connection pool."""
+    if _bot is not None:
+        await _bot.shutdown()
+
+async def set_telegram_webhook(force: bool = False):
+    """
+    Sets the Telegram webhook on application startup, or for serverless
+    deployments once per deploy:
+
+        python -m app.bot_setup
+
+    The registered URL is remembered in storage, so startups that find it
+    unchanged (every restart, every replica) skip the call.
+    """
     webhook_url = f"{settings.WEBHOOK_URL}/api/telegram"
     if not webhook_url.startswith("https://"):
         print("WARNING: WEBHOOK_URL must be HTTPS.")
         return
-    await bot.set_webhook(url=webhook_url)
+    if not force and (await get_job_state(WEBHOOK_STATE)).get('url') == webhook_url:
+        print(f"Telegram webhook already set to {webhook_url}")
+        return
+    await get_bot().set_webhook(url=webhook_url)
+    await set_job_state(WEBHOOK_STATE, url=webhook_url)
     print(f"Telegram webhook has been set to {webhook_url}")
 
 async def clear_telegram_webhook():
     """Clears the Telegram webhook on application shutdown."""
-    await bot.delete_webhook()
-    print("Telegram webhook has been cleared.")
\ No newline at end of file
+    await get_bot().delete_webhook()
+    await set_job_state(WEBHOOK_STATE, url=None)
+    print("Telegram webhook has been cleared.")
+
+if __name__ == "__main__":
+    asyncio.run(set_telegram_webhook())
@@ -0,0 +1,83 @@
+# app/core/bot_http.py
+"""
+The HTTP client behind every outbound Bot API call.
+
+Webhook replies, imports, exports and the weekly summary job all send
+through the one Bot from app.bot_setup.get_bot, so they share this
+connection pool. Its size, keep-alive, HTTP version and timeouts come from
+the BOT_* settings. PTB's HTTPXRequest only sets the pool size, so the
+httpx transport is built here and handed to it.
+
+With METRICS_ENABLED, each request is traced through httpcore to record
+how long it waited for a pooled connection ("bot_pool_wait" stage),
+how long a new connection took to set up ("bot_connect" stage) and whether
+the connection was new or reused (the bot_connections counter).
+"""
+import time
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from app.core import metrics
+from app.core.config import settings
+
+
+class TracedTransport(httpx.AsyncBaseTransport):
+    """Wraps an httpx transport to time pool waits and count connection reuse."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not settings.METRICS_ENABLED:
+            return await self.transport.handle_async_request(request)
+
+        start = time.perf_counter()
+        connect_start = None
+
+        async def trace(event: str, info: dict):
+            nonlocal start, connect_start
+            if start is None:
+                return
+            now = time.perf_counter()
+            if event == "connection.connect_tcp.started":
+                # A new connection: the wait for a pool slot ends here
+                metrics.observe("bot_pool_wait", now - start)
+                metrics.count("bot_connections", event="new")
+                connect_start = now
+            elif event.endswith(".send_request_headers.started") or event == "http2.send_connection_init.started":
+                if connect_start is not None:
+                    metrics.observe("bot_connect", now - connect_start)
+                else:
+                    metrics.observe("bot_pool_wait", now - start)
+                    metrics.count("bot_connections", event="reused")
+                start = None
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def build_request() -> HTTPXRequest:
+    """An HTTPXRequest configured from the BOT_* settings."""
+    http2 = settings.BOT_HTTP2
+    transport = httpx.AsyncHTTPTransport(
+        http1=not http2,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.BOT_POOL_SIZE,
+            max_keepalive_connections=settings.BOT_POOL_SIZE,
+            keepalive_expiry=settings.BOT_KEEPALIVE_SECONDS,
+        ),
+    )
+    return HTTPXRequest(
+        connection_pool_size=settings.BOT_POOL_SIZE,
+        connect_timeout=settings.BOT_CONNECT_TIMEOUT,
+        read_timeout=settings.BOT_READ_TIMEOUT,
+        write_timeout=settings.BOT_WRITE_TIMEOUT,
+        pool_timeout=settings.BOT_POOL_TIMEOUT,
+        http_version="2" if http2 else "1.1",
+        httpx_kwargs={"transport": TracedTransport(transport)},
+    )
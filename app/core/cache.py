@@ -0,0 +1,73 @@
+# app/core/cache.py
+"""
+Bounded, per-process TTL cache used in front of rarely changing stored
+records (budgets, goals, user profiles).
+
+Entries expire after `ttl` seconds and the least recently used entry is
+evicted once `maxsize` is reached. Each cache keeps hit/miss/eviction
+counters, available for every cache through `get_cache_stats()`.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+_caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    def __init__(self, name: str, maxsize: int = None, ttl: float = None):
+        self.name = name
+        self.maxsize = maxsize or settings.CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.CACHE_TTL_SECONDS
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None on a miss or expired entry."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the counters of every cache created in this process."""
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -6,6 +6,96 @@ class Settings(BaseSettings):
     FIREBASE_PROJECT_ID: str
     WEBHOOK_URL: str
     FIREBASE_SERVICE_ACCOUNT_FILE: str = "firebase-service-account.json"
+    # Point at a self-hosted or fake Bot API server (e.g. for benchmarks)
+    TELEGRAM_API_BASE_URL: str = "https://api.telegram.org/bot"
+    TELEGRAM_API_FILE_URL: str = "https://api.telegram.org/file/bot"
+
+    # Outbound Bot API connection pool, shared by webhook replies and the
+    # summary job: sends beyond BOT_POOL_SIZE wait up to BOT_POOL_TIMEOUT
+    # for a connection, idle ones stay open BOT_KEEPALIVE_SECONDS, and
+    # BOT_PREWARM_CONNECTIONS are opened at startup so the first sends
+    # skip the TCP/TLS handshake. HTTP/2 multiplexes every send over one
+    # connection (needs the h2 package; api.telegram.org supports it).
+    BOT_POOL_SIZE: int = 32
+    BOT_KEEPALIVE_SECONDS: float = 60.0
+    BOT_HTTP2: bool = False
+    BOT_PREWARM_CONNECTIONS: int = 4
+    BOT_CONNECT_TIMEOUT: float = 5.0
+    BOT_READ_TIMEOUT: float = 5.0
+    BOT_WRITE_TIMEOUT: float = 5.0
+    BOT_POOL_TIMEOUT: float = 5.0
+
+    # Serverless deployments (api/index.py) start no scheduler or update
+    # queue and leave the webhook to `python -m app.bot_setup`
+    SERVERLESS: bool = False
+
+    # Per-stage latency histograms and counters, served on /metrics
+    METRICS_ENABLED: bool = False
+
+    # Storage engine: "firestore" or "sqlite" (a local file at SQLITE_PATH)
+    STORAGE_BACKEND: str = "firestore"
+    SQLITE_PATH: str = "finance.db"
+    # Firestore writes from concurrent requests are committed together, at
+    # most this long after the first one arrives; 0 commits each directly
+    FIRESTORE_COALESCE_MS: float = 5.0
+
+    # In-process cache for budgets, goals and user records
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: int = 300
+
+    # How often coalesced last_active timestamps are written back
+    LAST_ACTIVE_FLUSH_SECONDS: int = 60
+
+    # Fast-ack webhook: queue updates for background workers instead of
+    # processing them inside the request
+    WEBHOOK_QUEUE_ENABLED: bool = False
+    WEBHOOK_QUEUE_WORKERS: int = 8
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    WEBHOOK_QUEUE_PUT_TIMEOUT: float = 2.0
+    WEBHOOK_QUEUE_DRAIN_TIMEOUT: float = 10.0
+
+    # Redelivered update suppression; DEDUPE_PERSIST adds a stored marker
+    # per update so duplicates are caught across workers and replicas
+    DEDUPE_CACHE_SIZE: int = 10000
+    DEDUPE_PERSIST: bool = False
+
+    # Return replies as a sendMessage call in the webhook response body
+    # instead of making a separate outbound request
+    REPLY_IN_WEBHOOK: bool = False
+
+    # CSV statement import: rows per batched write, the largest file
+    # accepted (the Bot API serves downloads up to 20 MB) and how often the
+    # progress message is updated
+    IMPORT_BATCH_ROWS: int = 400
+    IMPORT_MAX_BYTES: int = 20 * 1024 * 1024
+    IMPORT_PROGRESS_SECONDS: float = 3.0
+
+    # Exports: files up to EXPORT_DOCUMENT_MAX_BYTES are sent as a document,
+    # larger ones as a signed download link valid for EXPORT_LINK_TTL_SECONDS.
+    # The links are signed with EXPORT_LINK_SECRET, or a key derived from the
+    # bot token when it is empty.
+    EXPORT_DOCUMENT_MAX_BYTES: int = 20 * 1024 * 1024
+    EXPORT_LINK_TTL_SECONDS: int = 3600
+    EXPORT_LINK_SECRET: str = ""
+
+    # Weekly summary fan-out. Telegram allows roughly 30 messages per second
+    # overall and one per second per chat. The rates are per process, so
+    # divide the global one by the number of replicas.
+    SUMMARY_CONCURRENCY: int = 20
+    SUMMARY_CHECKPOINT_EVERY: int = 100
+    # Users are split into shards that replicas claim through leases
+    SUMMARY_SHARDS: int = 8
+    SCHEDULER_LEASE_SECONDS: int = 120
+    # Summaries go out on Sunday at SUMMARY_LOCAL_TIME in each user's
+    # timezone, spread over SUMMARY_WINDOW_MINUTES by a per-user offset.
+    # Each replica starts at most SUMMARY_MAX_PER_MINUTE summaries a minute.
+    SUMMARY_LOCAL_TIME: str = "19:30"
+    SUMMARY_DEFAULT_TIMEZONE: str = "Asia/Kolkata"
+    SUMMARY_WINDOW_MINUTES: int = 120
+    SUMMARY_MAX_PER_MINUTE: int = 1000
+    TELEGRAM_GLOBAL_RATE: float = 25.0
+    TELEGRAM_PER_CHAT_INTERVAL: float = 1.0
+    TELEGRAM_SEND_MAX_RETRIES: int = 3
     
     class Config:
         env_file = ".env"
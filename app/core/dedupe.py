@@ -0,0 +1,54 @@
+# app/core/dedupe.py
+"""
+Suppresses Telegram updates that were already handled.
+
+Telegram redelivers an update when the webhook is slow to answer. The
+recently seen update IDs are remembered in a bounded in-memory set, and
+with DEDUPE_PERSIST enabled a marker in the storage backend also catches
+redeliveries that land on another worker or replica. The number of
+updates dropped is exported on /metrics.
+"""
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.db.updates import claim_update, release_update
+
+
+class UpdateDeduplicator:
+    def __init__(self, maxsize: int, persist: bool = False):
+        self.maxsize = maxsize
+        self.persist = persist
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+        self.duplicates = 0
+
+    def _remember(self, update_id: int):
+        self._recent[update_id] = None
+        while len(self._recent) > self.maxsize:
+            self._recent.popitem(last=False)
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """Returns True if `update_id` was seen before, otherwise records it."""
+        if update_id in self._recent:
+            self.duplicates += 1
+            return True
+
+        if self.persist:
+            if not await claim_update(update_id):
+                self._remember(update_id)
+                self.duplicates += 1
+                return True
+
+        self._remember(update_id)
+        return False
+
+    async def forget(self, update_id: int):
+        """Lets a redelivery of `update_id` through, e.g. when processing it failed."""
+        self._recent.pop(update_id, None)
+        if self.persist:
+            await release_update(update_id)
+
+    def stats(self):
+        return {'tracked': len(self._recent), 'duplicates': self.duplicates}
+
+
+deduplicator = UpdateDeduplicator(settings.DEDUPE_CACHE_SIZE, settings.DEDUPE_PERSIST)
@@ -0,0 +1,131 @@
+# app/core/fanout.py
+"""
+Helpers for sending one message to many users without tripping Telegram's
+flood limits: a token bucket for the global rate, per-chat spacing, RetryAfter
+handling and a bounded-concurrency fan-out over an async stream of items.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimitedSender:
+    """
+    Sends messages through `bot` while respecting the global rate, the
+    per-chat interval and any RetryAfter that Telegram returns.
+
+    A RetryAfter pauses every send, not just the one that hit it, because
+    Telegram applies it to the whole bot.
+    """
+
+    def __init__(self, bot, global_rate: float, per_chat_interval: float, max_retries: int):
+        self.bot = bot
+        self.bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._next_chat_slot: Dict[Any, float] = {}
+        self._paused_until = 0.0
+        self.sent = 0
+        self.retries = 0
+
+    async def _wait_for_chat(self, chat_id):
+        now = time.monotonic()
+        slot = max(now, self._next_chat_slot.get(chat_id, 0.0))
+        self._next_chat_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def send_message(self, chat_id, text: str, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self._wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                message = await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                self.sent += 1
+                return message
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = e.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            except BadRequest:
+                raise
+            except NetworkError:
+                # Timeouts and connection errors; back off exponentially
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+            self.retries += 1
+
+    def forget_chats(self):
+        """Drops per-chat bookkeeping, e.g. after a finished run."""
+        self._next_chat_slot.clear()
+
+
+async def fan_out(
+    items: AsyncIterable[Any],
+    handler: Callable[[Any], Awaitable[None]],
+    concurrency: int,
+) -> Dict[str, int]:
+    """
+    Runs `handler` for every item of `items` with at most `concurrency`
+    handlers in flight. Items are pulled lazily, so the stream can be far
+    larger than memory. A failing item is logged and does not stop the run.
+
+    Returns:
+        Dict[str, int]: Number of succeeded and failed items
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {'succeeded': 0, 'failed': 0}
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+                counts['succeeded'] += 1
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"Fan-out failed for {item}: {e}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        async for item in items:
+            await queue.put(item)
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    return counts
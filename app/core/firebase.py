@@ -1,6 +1,6 @@
 # app/core/firebase.py
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore_async
 import json
 import os
 from app.core.config import settings
@@ -30,8 +30,18 @@ def initialize_firebase():
         print(f"Error initializing Firebase Admin SDK: {e}")
         exit(1)
 
-# Call initialization once when the module is loaded
-initialize_firebase()
+_db = None
 
-# Get a reference to the Firestore database
-db = firestore.client()
\ No newline at end of file
+def get_db():
+    """
+    Returns the Firestore client, initializing the SDK on first use so a
+    cold start only pays for it when a request actually needs storage.
+
+    The async client keeps every query off the event loop, so one slow
+    user's request no longer stalls the other webhooks in the worker.
+    """
+    global _db
+    if _db is None:
+        initialize_firebase()
+        _db = firestore_async.client()
+    return _db
\ No newline at end of file
@@ -0,0 +1,193 @@
+# app/core/metrics.py
+"""
+In-process latency and count metrics, exposed in the Prometheus text format
+on /metrics.
+
+`span(stage, **labels)` times a block into a histogram per (stage, labels);
+the webhook path records parse, service, db (one op label per backend
+method) and send, and `count(name, **labels)` bumps a counter such as the
+intent counts. Histograms keep counts in fixed log-spaced buckets, so memory
+doesn't grow with traffic and p50/p95/p99 are interpolated from the buckets.
+`render` adds the counters the pipeline keeps itself: cache hits, update
+queue depth and wait times, suppressed duplicate updates and Firestore
+write coalescing.
+
+With METRICS_ENABLED off, `span` hands out one shared no-op context manager
+and `count` returns immediately, so the instrumentation costs an attribute
+lookup and a call.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+
+# Bucket upper bounds from 50µs to ~105s, four per doubling
+BUCKETS = [0.00005 * 2 ** (i / 4) for i in range(85)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimates the q-quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, hits in enumerate(self.counts):
+            if hits and seen + hits >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return min(low + (high - low) * (rank - seen) / hits, self.max)
+            seen += hits
+        return self.max
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_histograms: Dict[LabelKey, Histogram] = {}
+_counters: Dict[str, Dict[LabelKey, int]] = {}
+
+
+def _key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def observe(stage: str, seconds: float, **labels):
+    key = _key({'stage': stage, **labels})
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(seconds)
+
+
+@contextmanager
+def _timed(stage: str, labels: Dict):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, **labels)
+
+
+def span(stage: str, **labels):
+    """Context manager timing the block into the `stage` histogram."""
+    if not settings.METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _timed(stage, labels)
+
+
+def count(name: str, amount: int = 1, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    series = _counters.setdefault(name, {})
+    key = _key(labels)
+    series[key] = series.get(key, 0) + amount
+
+
+def reset():
+    _histograms.clear()
+    _counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from app.core.cache import get_cache_stats
+    from app.core.dedupe import deduplicator
+    from app.core.update_queue import get_queue_stats
+    from app.db.backends.coalescer import get_coalescer_stats
+
+    lines: List[str] = [
+        "# HELP finance_bot_stage_seconds Latency of each stage of handling a message.",
+        "# TYPE finance_bot_stage_seconds summary",
+    ]
+    for key, histogram in sorted(_histograms.items()):
+        for q in QUANTILES:
+            lines.append(f"finance_bot_stage_seconds{_labels(key, quantile=str(q))} {histogram.quantile(q):.6f}")
+        lines.append(f"finance_bot_stage_seconds_sum{_labels(key)} {histogram.sum:.6f}")
+        lines.append(f"finance_bot_stage_seconds_count{_labels(key)} {histogram.count}")
+
+    for name, series in sorted(_counters.items()):
+        lines.append(f"# TYPE finance_bot_{name}_total counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"finance_bot_{name}_total{_labels(key)} {value}")
+
+    lines.append("# TYPE finance_bot_cache_events_total counter")
+    cache_stats = get_cache_stats()
+    for cache, stats in sorted(cache_stats.items()):
+        for event in ('hits', 'misses', 'evictions', 'expirations'):
+            lines.append(f"finance_bot_cache_events_total{_labels((('cache', cache), ('event', event)))} {stats[event]}")
+    lines.append("# TYPE finance_bot_cache_entries gauge")
+    for cache, stats in sorted(cache_stats.items()):
+        lines.append(f"finance_bot_cache_entries{_labels((('cache', cache),))} {stats['size']}")
+
+    dedupe_stats = deduplicator.stats()
+    lines.append("# HELP finance_bot_duplicate_updates_total Redelivered updates dropped before handling.")
+    lines.append("# TYPE finance_bot_duplicate_updates_total counter")
+    lines.append(f"finance_bot_duplicate_updates_total {dedupe_stats['duplicates']}")
+    lines.append("# TYPE finance_bot_dedupe_tracked_updates gauge")
+    lines.append(f"finance_bot_dedupe_tracked_updates {dedupe_stats['tracked']}")
+
+    queue_stats = get_queue_stats()
+    lines.append("# TYPE finance_bot_queue_updates_total counter")
+    for queue, stats in sorted(queue_stats.items()):
+        for event in ('submitted', 'rejected', 'processed', 'failed'):
+            lines.append(f"finance_bot_queue_updates_total{_labels((('event', event), ('queue', queue)))} {stats[event]}")
+    for gauge in ('depth', 'capacity'):
+        lines.append(f"# TYPE finance_bot_queue_{gauge} gauge")
+        for queue, stats in sorted(queue_stats.items()):
+            lines.append(f"finance_bot_queue_{gauge}{_labels((('queue', queue),))} {stats[gauge]}")
+    # Enqueue-to-done time over each queue's last 1000 updates
+    lines.append("# TYPE finance_bot_queue_latency_seconds gauge")
+    for queue, stats in sorted(queue_stats.items()):
+        for quantile, field in (('0.5', 'latency_p50'), ('0.95', 'latency_p95'), ('1', 'latency_max')):
+            if stats[field] is not None:
+                lines.append(f"finance_bot_queue_latency_seconds"
+                             f"{_labels((('quantile', quantile), ('queue', queue)))} {stats[field]:.6f}")
+
+    # Firestore write coalescing: commits issued, units (request writes)
+    # they carried, and batches split to isolate a rejected unit
+    coalescer_stats = get_coalescer_stats()
+    for counter in ('commits', 'units', 'splits'):
+        lines.append(f"# TYPE finance_bot_coalescer_{counter}_total counter")
+        for coalescer, stats in sorted(coalescer_stats.items()):
+            lines.append(f"finance_bot_coalescer_{counter}_total{_labels((('coalescer', coalescer),))} {stats[counter]}")
+    lines.append("# TYPE finance_bot_coalescer_pending_writes gauge")
+    for coalescer, stats in sorted(coalescer_stats.items()):
+        lines.append(f"finance_bot_coalescer_pending_writes{_labels((('coalescer', coalescer),))} {stats['pending_writes']}")
+    return "\n".join(lines) + "\n"
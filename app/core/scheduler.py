@@ -1,31 +1,200 @@
 # app/core/scheduler.py
+import asyncio
+import os
+import random
+import socket
+import uuid
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from app.db.users import get_all_user_ids
+from datetime import datetime
+from typing import Tuple
+from telegram.error import BadRequest, Forbidden
+from app.core.config import settings
+from app.core.fanout import RateLimitedSender, fan_out
+from app.core.summary_slots import cycle_minute, summary_week
+from app.db.backends.base import shard_range
+from app.db.jobs import acquire_lease, get_job_state, release_lease, set_job_state
+from app.db.users import flush_last_active, iter_user_ids_pending_summary, mark_summaries_sent
 from app.services.finance_service import generate_weekly_summary
-from app.bot_setup import bot
+from app.bot_setup import get_bot
 
 scheduler = AsyncIOScheduler(timezone="UTC")
 
-async def send_weekly_summaries():
-    """Job to send a weekly summary to all users."""
-    print("Scheduler running: Sending weekly summaries...")
-    try:
-        user_ids = get_all_user_ids()
-        for user_id in user_ids:
+WEEKLY_SUMMARY_JOB = "weekly_summary"
+
+# Lease owner name of this process
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def shard_job(week: str, shard: int) -> str:
+    return f"{WEEKLY_SUMMARY_JOB}-{week}-shard-{shard}"
+
+
+_sender = None
+
+
+def get_sender() -> RateLimitedSender:
+    # Shared by every tick, so the rate limits hold across them
+    global _sender
+    if _sender is None:
+        _sender = RateLimitedSender(
+            get_bot(),
+            global_rate=settings.TELEGRAM_GLOBAL_RATE,
+            per_chat_interval=settings.TELEGRAM_PER_CHAT_INTERVAL,
+            max_retries=settings.TELEGRAM_SEND_MAX_RETRIES,
+        )
+    return _sender
+
+
+async def send_shard_summaries(week: str, shard: int, due: Tuple[int, int], limit: int) -> Tuple[dict, bool]:
+    """
+    Sends the summaries of one shard's users whose slot is in `due`, while
+    holding the shard's lease. At most `limit` users are started.
+
+    The lease is renewed in the background. If a renewal fails, another
+    replica has taken the shard over, so no new users are started and the
+    shard is left for that replica to finish.
+
+    Returns:
+        The succeeded/failed counts, and whether every due user was reached
+    """
+    job = shard_job(week, shard)
+    ttl = settings.SCHEDULER_LEASE_SECONDS
+    sender = get_sender()
+    lost = asyncio.Event()
+    capped = False
+    delivered = []
+    checkpoint_lock = asyncio.Lock()
+
+    async def renew():
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await acquire_lease(job, INSTANCE_ID, ttl):
+                print(f"Lost the lease on summary shard {shard}, stopping.")
+                lost.set()
+                return
+
+    async def pending_users():
+        nonlocal capped
+        slots = shard_range(shard, settings.SUMMARY_SHARDS)
+        started = 0
+        async for user_id in iter_user_ids_pending_summary(week, slots=slots, due=due):
+            if lost.is_set():
+                return
+            if started >= limit:
+                capped = True
+                return
+            started += 1
+            yield user_id
+
+    async def checkpoint():
+        # Users are only dropped from `delivered` once the write succeeded,
+        # so a failed write is retried with the next checkpoint
+        async with checkpoint_lock:
+            done = delivered[:]
+            if done:
+                await mark_summaries_sent(done, week)
+                del delivered[:len(done)]
+
+    async def deliver(user_id: str):
+        try:
+            summary_message = await generate_weekly_summary(int(user_id), week)
+            await sender.send_message(
+                chat_id=user_id,
+                text=summary_message,
+                parse_mode='Markdown'
+            )
+        except Forbidden:
+            # The user blocked the bot; retrying next time won't help
+            print(f"User {user_id} blocked the bot, skipping summary.")
+        except BadRequest as e:
+            # E.g. "chat not found". Telegram rejected the request itself, so
+            # a retry would fail the same way and hold the shard's cursor back
+            print(f"Summary for user {user_id} was rejected, skipping: {e}")
+        delivered.append(user_id)
+        if len(delivered) >= settings.SUMMARY_CHECKPOINT_EVERY:
             try:
-                summary_message = await generate_weekly_summary(int(user_id))
-                await bot.send_message(
-                    chat_id=user_id, 
-                    text=summary_message,
-                    parse_mode='Markdown'
-                )
+                await checkpoint()
             except Exception as e:
-                print(f"Failed to send summary to user {user_id}: {e}")
+                # This user's summary went out; the failure belongs to the write
+                print(f"Failed to checkpoint summary shard {shard}: {e}")
+
+    renewal = asyncio.create_task(renew())
+    try:
+        counts = await fan_out(pending_users(), deliver, settings.SUMMARY_CONCURRENCY)
+    finally:
+        renewal.cancel()
+        # Also records the users reached before an error cut the run short
+        await checkpoint()
+    return counts, not (lost.is_set() or capped)
+
+
+async def dispatch_due_summaries():
+    """
+    Job that runs every minute and sends the summaries that have come due.
+
+    Each user has a summary slot: a minute of the weekly cycle derived from
+    their timezone plus a per-user offset (see app.core.summary_slots). Each
+    shard keeps a cursor with the last slot it has covered. A tick sends to
+    the users whose slot lies between the cursor and now, then moves the
+    cursor forward. A tick that was missed, e.g. while no replica was
+    running, is caught up by the next one.
+
+    Every replica runs this job. A replica only works on a shard while it
+    holds that shard's lease, so the replicas share the work instead of
+    repeating it. Each replica starts at most SUMMARY_MAX_PER_MINUTE
+    summaries per tick. A shard that hits the cap, or where a delivery
+    failed, keeps its cursor and continues on the next tick, skipping users
+    already checkpointed. Users who blocked the bot or whose chat Telegram
+    rejects are checkpointed without a summary, so they can't hold the
+    cursor back.
+    """
+    now = datetime.utcnow()
+    week = summary_week(now)
+    until = cycle_minute(now)
+    budget = settings.SUMMARY_MAX_PER_MINUTE
+
+    # Replicas start on different shards, so they rarely contend for leases
+    shards = list(range(settings.SUMMARY_SHARDS))
+    random.shuffle(shards)
+
+    try:
+        for shard in shards:
+            if budget <= 0:
+                break
+            job = shard_job(week, shard)
+            if not await acquire_lease(job, INSTANCE_ID, settings.SCHEDULER_LEASE_SECONDS):
+                continue
+            try:
+                after = (await get_job_state(job)).get('cursor', -1)
+                if after >= until:
+                    continue
+                counts, complete = await send_shard_summaries(week, shard, (after, until), budget)
+                budget -= counts['succeeded'] + counts['failed']
+                # Users whose delivery failed aren't checkpointed, so the
+                # cursor stays put and the next tick retries them
+                covered = complete and not counts['failed']
+                if covered:
+                    await set_job_state(job, week=week, cursor=until)
+                if counts['succeeded'] or counts['failed']:
+                    print(
+                        f"Summary shard {shard} for {week}: {counts['succeeded']} sent, "
+                        f"{counts['failed']} failed{'' if covered else ', more pending'}."
+                    )
+            finally:
+                await release_lease(job, INSTANCE_ID)
     except Exception as e:
-        print(f"Error fetching user IDs for scheduler: {e}")
+        print(f"Error sending weekly summaries: {e}")
+    finally:
+        get_sender().forget_chats()
+
 
 def start_scheduler():
-    # Schedule to run every Sunday at 14:00 UTC (e.g., 7:30 PM IST)
-    scheduler.add_job(send_weekly_summaries, 'cron', day_of_week='sun', hour=14, minute=0)
+    # Summaries go out per user on Sunday evening local time, so the
+    # dispatcher wakes every minute and only picks up the users due then
+    scheduler.add_job(dispatch_due_summaries, 'cron', minute='*')
+    scheduler.add_job(flush_last_active, 'interval', seconds=settings.LAST_ACTIVE_FLUSH_SECONDS)
     scheduler.start()
-    print("Scheduler started. Weekly summaries will be sent on Sundays at 14:00 UTC.")
\ No newline at end of file
+    print(
+        f"Scheduler started. Weekly summaries will be sent on Sundays at {settings.SUMMARY_LOCAL_TIME} "
+        f"in each user's timezone, spread over {settings.SUMMARY_WINDOW_MINUTES} minutes."
+    )
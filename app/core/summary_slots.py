@@ -0,0 +1,65 @@
+# app/core/summary_slots.py
+"""
+When each user's weekly summary is due.
+
+A summary cycle starts on Wednesday 00:00 UTC, so Sunday evening in every
+timezone from UTC-12 to UTC+14 falls inside one cycle, and that cycle
+summarizes the ISO week its Wednesday belongs to. A user's slot is the
+minute of the cycle at which their summary is due: Sunday at
+SUMMARY_LOCAL_TIME in their timezone, plus a stable per-user offset of up
+to SUMMARY_WINDOW_MINUTES so users of one timezone don't all land on the
+same minute.
+
+Slots are stored with the user, so the dispatcher can select the due users
+by slot range, and recomputed when the timezone changes. A slot uses the
+UTC offset in effect when it was computed. After a daylight saving change,
+users in that zone get their summary an hour early or late until their
+slot is recomputed. `python -m app.db.reconcile --slots` recomputes every
+user's slot without touching their transactions; run it after each change
+(late March/early April and late October/early November for most zones).
+"""
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.core.config import settings
+from app.db.backends.base import iso_week
+
+MINUTES_PER_CYCLE = 7 * 24 * 60
+# Monday is weekday 0, so a Wednesday start shifts weekdays by 2
+CYCLE_START_WEEKDAY = 2
+
+
+def cycle_minute(moment: datetime) -> int:
+    """Minute of the summary cycle that `moment` (naive or aware UTC) falls in."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    days = (moment.weekday() - CYCLE_START_WEEKDAY) % 7
+    return days * 24 * 60 + moment.hour * 60 + moment.minute
+
+
+def summary_week(moment: datetime) -> str:
+    """ISO week whose summaries are due in the cycle containing `moment`."""
+    return iso_week(moment - timedelta(days=CYCLE_START_WEEKDAY))
+
+
+def valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def summary_slot(user_id, tz_name: Optional[str] = None) -> int:
+    """Minute of the cycle at which the user's summary is due."""
+    tz = ZoneInfo(tz_name or settings.SUMMARY_DEFAULT_TIMEZONE)
+    hour, minute = (int(part) for part in settings.SUMMARY_LOCAL_TIME.split(':'))
+    # The coming Sunday, so the UTC offset in effect now is used
+    today = datetime.now(tz)
+    local = (today + timedelta(days=6 - today.weekday())).replace(
+        hour=hour, minute=minute, second=0, microsecond=0
+    )
+    jitter = zlib.crc32(str(user_id).encode()) % max(settings.SUMMARY_WINDOW_MINUTES, 1)
+    return (cycle_minute(local) + jitter) % MINUTES_PER_CYCLE
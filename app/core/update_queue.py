@@ -0,0 +1,120 @@
+# app/core/update_queue.py
+"""
+Bounded worker queue that lets the webhook acknowledge Telegram right away.
+
+Each update is routed to a worker by its user ID, so updates from one user
+are processed in the order they arrived while different users run in
+parallel. When a worker's queue is full, `submit` waits up to
+`put_timeout` seconds and then reports the update as rejected, which the
+webhook turns into a 503 so Telegram redelivers it later. Depth, counters
+and wait times of every queue are available through `get_queue_stats()`
+and exported on /metrics.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_update_queues: Dict[str, "UpdateQueue"] = {}
+
+class UpdateQueue:
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        workers: int,
+        maxsize: int,
+        put_timeout: float,
+        name: str = "webhook",
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._recent_latencies = deque(maxlen=1000)
+        self.submitted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        _update_queues[name] = self
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Starts the workers. Must be called from a running event loop."""
+        per_worker = max(1, self.maxsize // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+        print(f"Update queue started with {self.workers} workers.")
+
+    async def submit(self, user_id: int, item: Any) -> bool:
+        """Queues `item` behind the user's earlier updates. Returns False if the queue stayed full."""
+        queue = self._queues[hash(user_id) % len(self._queues)]
+        try:
+            await asyncio.wait_for(queue.put((time.monotonic(), item)), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.submitted += 1
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            enqueued_at, item = await queue.get()
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed to process queued update: {e}")
+            finally:
+                self._recent_latencies.append(time.monotonic() - enqueued_at)
+                queue.task_done()
+
+    async def drain(self, timeout: float):
+        """Waits up to `timeout` seconds for queued updates to finish, then stops the workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            print(f"Update queue drain timed out with {self.depth()} updates left.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print("Update queue drained.")
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def _latency_percentile(self, pct: float) -> Optional[float]:
+        if not self._recent_latencies:
+            return None
+        ordered = sorted(self._recent_latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, counters and enqueue-to-done latency over the last 1000 updates."""
+        return {
+            'depth': self.depth(),
+            'capacity': sum(q.maxsize for q in self._queues),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'failed': self.failed,
+            'latency_p50': self._latency_percentile(0.50),
+            'latency_p95': self._latency_percentile(0.95),
+            'latency_max': max(self._recent_latencies, default=None),
+        }
+
+
+def get_queue_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns the stats of every update queue created in this process."""
+    return {name: queue.stats() for name, queue in _update_queues.items()}
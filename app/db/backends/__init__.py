@@ -0,0 +1,44 @@
+# app/db/backends/__init__.py
+"""
+Storage backend selection. STORAGE_BACKEND picks the engine:
+
+    firestore  (default) Firebase Firestore
+    sqlite     a local SQLite file at SQLITE_PATH
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.db.backends.base import StorageBackend
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    """Returns the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_BACKEND == "sqlite":
+            from app.db.backends.sqlite import SQLiteBackend
+            _backend = SQLiteBackend(settings.SQLITE_PATH)
+        elif settings.STORAGE_BACKEND == "firestore":
+            from app.db.backends.firestore import FirestoreBackend
+            _backend = FirestoreBackend()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+        if settings.METRICS_ENABLED:
+            from app.db.backends.instrumented import InstrumentedBackend
+            _backend = InstrumentedBackend(_backend)
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]):
+    """Replaces the backend in use, e.g. with one wrapped for a benchmark."""
+    global _backend
+    _backend = backend
+
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,280 @@
+# app/db/backends/base.py
+"""
+The storage interface the app/db modules dispatch through.
+
+Each method is one logical operation of the bot, not a generic document
+access, so every backend can implement it the way its engine does best:
+Firestore with denormalized counters and rollups, SQL with indexed
+aggregate queries.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.db.frame import TransactionFrame
+
+
+# What the aggregation paths read from a transaction. The free-text
+# description is only fetched when a caller asks for it.
+TXN_FIELDS = ('type', 'amount', 'category', 'timestamp')
+
+
+# Users are spread over this many fixed shard slots by ID. Jobs split the
+# slot space into however many shards they want, so changing the shard
+# count never requires rewriting users.
+SHARD_SLOTS = 1024
+
+
+def shard_slot(user_id) -> int:
+    return int(user_id) % SHARD_SLOTS
+
+
+def shard_range(shard: int, shards: int) -> Tuple[int, int]:
+    """The [start, end) slot range covered by `shard` out of `shards`."""
+    return shard * SHARD_SLOTS // shards, (shard + 1) * SHARD_SLOTS // shards
+
+
+def period_start(days: int) -> datetime:
+    """
+    Start of the reporting window for the last `days` days: midnight UTC of
+    the oldest day, so the window covers `days` whole calendar days with
+    today included.
+    """
+    today = datetime.utcnow()
+    start = today - timedelta(days=days - 1)
+    return datetime(start.year, start.month, start.day)
+
+
+def iso_week(timestamp: datetime) -> str:
+    """ISO week of `timestamp` as "YYYY-Www"."""
+    year, week, _ = timestamp.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(week: str) -> datetime:
+    """Midnight UTC on the Monday that starts ISO `week`."""
+    return datetime.strptime(f"{week}-1", "%G-W%V-%u")
+
+
+def totals_match(a: Dict, b: Dict, tolerance: float = 0.005) -> bool:
+    """Whether two period totals agree, allowing for float rounding."""
+    if a['count'] != b['count'] or set(a['categories']) != set(b['categories']):
+        return False
+    pairs = [(a['income'], b['income']), (a['expense'], b['expense'])]
+    pairs += [(amount, b['categories'][category]) for category, amount in a['categories'].items()]
+    return all(abs(x - y) <= tolerance for x, y in pairs)
+
+
+def empty_period_totals() -> Dict:
+    return {'income': 0.0, 'expense': 0.0, 'count': 0, 'categories': {}}
+
+
+class StorageBackend(ABC):
+    # --- users ---
+
+    @abstractmethod
+    async def create_user(self, user_id: int, user: Dict) -> bool:
+        """Creates the user record. Returns False if the user already exists."""
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Dict:
+        """Fetches the user's profile fields, or {} if the user doesn't exist."""
+
+    @abstractmethod
+    async def update_user(self, user_id: int, fields: Dict):
+        """Overwrites the given profile fields of an existing user."""
+
+    @abstractmethod
+    async def touch_users(self, last_active: List[Tuple[int, datetime]]):
+        """Writes last_active for many users at once."""
+
+    @abstractmethod
+    def iter_user_ids(self, page_size: int = 500) -> AsyncIterator[str]:
+        """Yields every user ID, reading them page by page."""
+
+    @abstractmethod
+    def iter_user_ids_pending_summary(self, week: str, page_size: int = 500,
+                                      slots: Optional[Tuple[int, int]] = None,
+                                      due: Optional[Tuple[int, int]] = None) -> AsyncIterator[str]:
+        """
+        Yields the IDs of users whose summary for ISO `week` hasn't been
+        sent, optionally only those whose shard slot is in the [start, end)
+        range `slots` and whose summary slot is in the (after, until] range
+        `due`.
+        """
+
+    @abstractmethod
+    async def mark_summaries_sent(self, user_ids: Iterable[str], week: str):
+        """Checkpoints that the summary for ISO `week` reached `user_ids`."""
+
+    # --- transactions ---
+
+    @abstractmethod
+    async def add_transaction(self, user_id: int, txn: Dict, txn_id: Optional[str] = None,
+                              goal_name: Optional[str] = None) -> bool:
+        """
+        Stores `txn` (type, amount, category, description, timestamp) and
+        updates any aggregates atomically with it. With `goal_name`, the
+        amount is also added to that goal's progress in the same commit,
+        unless the goal no longer exists. Returns False if a transaction
+        with `txn_id` already exists, in which case nothing is written.
+        """
+
+    async def add_transactions(self, user_id: int, txns: List[Tuple[str, Dict]]) -> int:
+        """
+        Stores a batch of (txn_id, txn) pairs, e.g. rows of an imported
+        statement, skipping IDs that already exist, and returns how many were
+        new. Backends override this to write the batch, and to update their
+        aggregates, in a few commits rather than one per transaction.
+        """
+        added = 0
+        for txn_id, txn in txns:
+            added += await self.add_transaction(user_id, txn, txn_id)
+        return added
+
+    async def add_transaction_group(self, user_id: int,
+                                    entries: List[Tuple[Optional[str], Dict, Optional[str]]]) -> bool:
+        """
+        Stores the (txn_id, txn, goal_name) entries of one message, e.g.
+        "spent 50 on tea, 120 on bus", like `add_transaction` does for one.
+        Returns False if they already exist. Backends override this to commit
+        the entries, their summed aggregates and goal progress in one write.
+        """
+        added = False
+        for txn_id, txn, goal_name in entries:
+            added = await self.add_transaction(user_id, txn, txn_id, goal_name) or added
+        return added
+
+    @abstractmethod
+    def iter_transactions(self, user_id: int, since: Optional[datetime] = None,
+                          fields: Sequence[str] = TXN_FIELDS, page_size: int = 500,
+                          until: Optional[datetime] = None) -> AsyncIterator[Dict]:
+        """
+        Yields the user's transactions, optionally only those at or after
+        `since` and before `until`, reading only `fields` and one page at a
+        time through a cursor, so callers can aggregate in constant memory.
+        They come in timestamp order.
+        """
+
+    async def get_transactions(self, user_id: int, since: Optional[datetime] = None,
+                               fields: Sequence[str] = TXN_FIELDS) -> List[Dict]:
+        """Like `iter_transactions`, collected into a list."""
+        return [txn async for txn in self.iter_transactions(user_id, since, fields)]
+
+    @abstractmethod
+    async def get_balance(self, user_id: int) -> float:
+        """Total income minus total expense over the user's whole history."""
+
+    @abstractmethod
+    async def get_period_totals(self, user_id: int, days: int) -> Dict:
+        """
+        Income, expense, transaction count and per-category expense for the
+        window starting at `period_start(days)`.
+        """
+
+    @abstractmethod
+    async def get_category_expense(self, user_id: int, category: str, days: int) -> float:
+        """Expense in one category over the window starting at `period_start(days)`."""
+
+    @abstractmethod
+    async def get_week_totals(self, user_id: int, week: str) -> Dict:
+        """
+        The same totals as `get_period_totals`, for ISO `week` ("YYYY-Www").
+        Backends that keep counters keep one summary per week, updated with
+        every transaction, so this never reads the raw history.
+        """
+
+    async def check_week_totals(self, user_id: int, week: str) -> Dict:
+        """
+        Compares `get_week_totals` with a recomputation from the raw
+        transactions of the week.
+        """
+        start = week_start(week)
+        frame = await TransactionFrame.from_stream(self.iter_transactions(user_id, since=start))
+        actual = frame.window(until=start + timedelta(days=7)).period_totals()
+        stored = await self.get_week_totals(user_id, week)
+        return {'week': week, 'stored': stored, 'actual': actual, 'consistent': totals_match(stored, actual)}
+
+    @abstractmethod
+    async def rebuild_aggregates(self, user_id: int) -> Dict:
+        """
+        Recomputes any denormalized aggregates from the raw history and
+        returns the user's totals (total_income, total_expense, txn_count).
+        """
+
+    # --- budgets ---
+
+    @abstractmethod
+    async def set_budget(self, user_id: int, budget: Dict):
+        """Stores `budget` (amount, category, created_at) keyed by its category."""
+
+    @abstractmethod
+    async def get_budget(self, user_id: int, category: str) -> Dict:
+        """Fetches the budget of a category, or {} if there is none."""
+
+    @abstractmethod
+    async def get_all_budgets(self, user_id: int) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    async def delete_budget(self, user_id: int, category: str):
+        pass
+
+    # --- goals ---
+
+    @abstractmethod
+    async def set_goal(self, user_id: int, goal: Dict):
+        """Stores `goal`, keyed by its lower-cased goal_name."""
+
+    @abstractmethod
+    async def add_goal_progress(self, user_id: int, goal_name: str, amount: float):
+        """
+        Adds `amount` to the goal's current_amount. A missing goal is created
+        with `amount` as both its target and its progress.
+        """
+
+    @abstractmethod
+    async def get_goal(self, user_id: int, goal_name: str) -> Dict:
+        pass
+
+    @abstractmethod
+    async def get_all_goals(self, user_id: int) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    async def delete_goal(self, user_id: int, goal_name: str):
+        pass
+
+    # --- update dedupe markers ---
+
+    @abstractmethod
+    async def claim_update(self, update_id: int, expires_at: datetime) -> bool:
+        """Records an update marker. Returns False if it already existed."""
+
+    @abstractmethod
+    async def release_update(self, update_id: int):
+        pass
+
+    # --- scheduled job state ---
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: timedelta) -> bool:
+        """
+        Takes or renews the lease `name` for `owner` until `ttl` from now.
+        Returns False if another owner holds a lease that hasn't expired.
+        """
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str):
+        """Gives the lease up early, if `owner` still holds it."""
+
+    @abstractmethod
+    async def get_job_state(self, job_name: str) -> Dict:
+        pass
+
+    @abstractmethod
+    async def set_job_state(self, job_name: str, state: Dict):
+        """Merges `state` into the job's stored state."""
+
+    async def close(self):
+        """Releases connections. Called on shutdown."""
@@ -0,0 +1,151 @@
+# app/db/backends/coalescer.py
+"""
+Write-behind coalescing of Firestore writes from concurrent requests.
+
+Callers submit a unit of writes that must land together (one transaction
+with its aggregates, one user touch, ...) and await its completion. Units
+are packed into a shared WriteBatch that is committed once it reaches 500
+writes or `delay` seconds after its first unit arrived, whichever comes
+first, so a burst of webhooks costs a handful of commits instead of one
+per request.
+
+A batch is atomic, so one failing unit would fail every unit packed with
+it. When a commit is rejected for a reason that guarantees nothing was
+applied (a `create` of an existing document, an `update` of a missing
+one), the batch is split in halves, committed in order, until the faulty
+units are isolated, and only they see the error. Other errors (timeouts,
+unavailability) leave the outcome unknown and are reported to every unit
+of the batch, as a direct commit would have.
+
+Commit, unit and split counts of every coalescer are available through
+`get_coalescer_stats()` and exported on /metrics.
+"""
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, InvalidArgument, NotFound
+
+# Firestore caps a batch at 500 writes
+MAX_BATCH_WRITES = 500
+# Errors that reject the whole commit before any write is applied
+REJECTED = (AlreadyExists, FailedPrecondition, InvalidArgument, NotFound)
+
+# Every coalescer created in this process, by name, for /metrics
+_coalescers: Dict[str, "WriteCoalescer"] = {}
+
+
+def apply_writes(batch, writes: List[Tuple]):
+    """Adds (op, ref, data) writes to a WriteBatch; op is create/set/merge/update/delete."""
+    for op, ref, data in writes:
+        if op == 'create':
+            batch.create(ref, data)
+        elif op == 'merge':
+            batch.set(ref, data, merge=True)
+        elif op == 'update':
+            batch.update(ref, data)
+        elif op == 'delete':
+            batch.delete(ref)
+        else:
+            batch.set(ref, data)
+
+
+class WriteCoalescer:
+    def __init__(self, db, delay: float, max_writes: int = MAX_BATCH_WRITES, name: str = "firestore"):
+        self.name = name
+        self.db = db
+        self.delay = delay
+        self.max_writes = max_writes
+        self._pending: List[Tuple[List[Tuple], asyncio.Future]] = []
+        self._pending_writes = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self.commits = 0
+        self.units = 0
+        self.splits = 0
+        _coalescers[name] = self
+
+    async def submit(self, writes: List[Tuple]):
+        """Queues a unit of (op, ref, data) writes and waits until it is committed."""
+        if len(writes) > self.max_writes:
+            raise ValueError(f"A unit can hold at most {self.max_writes} writes")
+        if self._pending_writes + len(writes) > self.max_writes:
+            self._flush()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((writes, future))
+        self._pending_writes += len(writes)
+        if self._pending_writes >= self.max_writes:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._flush)
+
+        # A cancelled caller doesn't take its writes out of the batch
+        await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        units, self._pending, self._pending_writes = self._pending, [], 0
+        task = asyncio.create_task(self._commit(units))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _commit(self, units: List[Tuple[List[Tuple], asyncio.Future]]):
+        batch = self.db.batch()
+        for writes, _ in units:
+            apply_writes(batch, writes)
+        try:
+            self.commits += 1
+            await batch.commit()
+        except REJECTED as e:
+            if len(units) == 1:
+                _settle(units[0][1], e)
+                return
+            # Halve until the faulty units are isolated, so a rare
+            # duplicate costs a few extra commits rather than one per unit.
+            # The halves go one after the other: units touching the same
+            # document (one user's totals) must land in submission order.
+            self.splits += 1
+            middle = len(units) // 2
+            await self._commit(units[:middle])
+            await self._commit(units[middle:])
+            return
+        except Exception as e:
+            for _, future in units:
+                _settle(future, e)
+            return
+        self.units += len(units)
+        for _, future in units:
+            _settle(future)
+
+    async def close(self):
+        """Commits whatever is queued and waits for the commits in flight."""
+        self._flush()
+        while self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'commits': self.commits,
+            'units': self.units,
+            'splits': self.splits,
+            'pending_writes': self._pending_writes,
+        }
+
+
+def get_coalescer_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the counters of every coalescer created in this process."""
+    return {name: coalescer.stats() for name, coalescer in _coalescers.items()}
+
+
+def _settle(future: asyncio.Future, error: Optional[BaseException] = None):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
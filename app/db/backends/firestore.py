@@ -0,0 +1,576 @@
+# app/db/backends/firestore.py
+"""
+Firestore implementation of the storage backend.
+
+Layout under `users/{id}`:
+    transactions/   raw history
+    rollups/        per-day (d-YYYY-MM-DD), per-ISO-week (w-YYYY-Www) and
+                    per-month (m-YYYY-MM) buckets of income, expense, count
+                    and per-category expense
+    budgets/, goals/
+The user document itself keeps running total_income / total_expense /
+txn_count. Every aggregate is updated in the same batch as the transaction
+it counts, so reads never scan the raw history.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from app.core.config import settings
+from app.core.summary_slots import summary_slot
+from app.db.frame import TransactionFrame
+from app.db.backends.base import (
+    TXN_FIELDS, StorageBackend, empty_period_totals, iso_week, period_start, shard_slot
+)
+from app.db.backends.coalescer import MAX_BATCH_WRITES, WriteCoalescer, apply_writes
+
+
+def day_key(timestamp: datetime) -> str:
+    return f"d-{timestamp:%Y-%m-%d}"
+
+
+def week_key(timestamp: datetime) -> str:
+    return f"w-{iso_week(timestamp)}"
+
+
+def month_key(timestamp: datetime) -> str:
+    return f"m-{timestamp:%Y-%m}"
+
+
+def _bucket_starts(timestamp: datetime) -> Dict[str, tuple]:
+    day_start = datetime(timestamp.year, timestamp.month, timestamp.day)
+    month_start = datetime(timestamp.year, timestamp.month, 1)
+    return {
+        day_key(timestamp): ('day', day_start),
+        week_key(timestamp): ('week', day_start - timedelta(days=day_start.weekday())),
+        month_key(timestamp): ('month', month_start),
+    }
+
+
+def _with_defaults(txn: Dict) -> Dict:
+    # Ensure each transaction has type, amount, and category
+    txn.setdefault("type", "expense")
+    txn.setdefault("amount", 0.0)
+    txn.setdefault("category", "general")
+    return txn
+
+
+class FirestoreBackend(StorageBackend):
+    def __init__(self):
+        # Imported here so other backends never initialize the Firebase SDK
+        from app.core.firebase import get_db
+        self.db = get_db()
+        # Shares commits between concurrent requests; see coalescer.py
+        self.coalescer = None
+        if settings.FIRESTORE_COALESCE_MS > 0:
+            self.coalescer = WriteCoalescer(self.db, settings.FIRESTORE_COALESCE_MS / 1000)
+
+    def _user_ref(self, user_id):
+        return self.db.collection('users').document(str(user_id))
+
+    async def _commit_in_batches(self, writes: List[Tuple]):
+        """Commits (op, ref, data) writes in as few batches as the write limit allows."""
+        for i in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            apply_writes(batch, writes[i:i + MAX_BATCH_WRITES])
+            await batch.commit()
+
+    async def _write(self, writes: List[Tuple]):
+        """Commits (op, ref, data) writes atomically, sharing the commit with other requests."""
+        if self.coalescer is not None:
+            await self.coalescer.submit(writes)
+        else:
+            await self._commit_in_batches(writes)
+
+    async def _write_each(self, writes: List[Tuple]):
+        """Commits independent writes; a failing one doesn't hold the others back."""
+        if self.coalescer is not None:
+            await asyncio.gather(*(self.coalescer.submit([write]) for write in writes))
+        else:
+            await self._commit_in_batches(writes)
+
+    # --- users ---
+
+    async def create_user(self, user_id: int, user: Dict) -> bool:
+        try:
+            await self._user_ref(user_id).create({
+                **user,
+                'shard': shard_slot(user_id),
+                'total_income': 0.0,
+                'total_expense': 0.0,
+                'txn_count': 0,
+                'totals_initialized': True
+            })
+        except AlreadyExists:
+            return False
+        return True
+
+    async def get_user(self, user_id: int) -> Dict:
+        doc = await self._user_ref(user_id).get()
+        return doc.to_dict() if doc.exists else {}
+
+    async def update_user(self, user_id: int, fields: Dict):
+        await self._write([('update', self._user_ref(user_id), fields)])
+
+    async def touch_users(self, last_active: List[Tuple[int, datetime]]):
+        # Users created before summary slots existed have none, so the
+        # dispatcher's range query never finds them. One batched read of
+        # the chunk tells which ones to backfill; the shard slot is simply
+        # rewritten every time.
+        refs = [self._user_ref(user_id) for user_id, _ in last_active]
+        missing_slot = {
+            doc.id: (doc.to_dict() or {}).get('timezone')
+            async for doc in self.db.get_all(refs, field_paths=['summary_slot', 'timezone'])
+            if doc.exists and (doc.to_dict() or {}).get('summary_slot') is None
+        }
+        writes = []
+        for ref, (user_id, timestamp) in zip(refs, last_active):
+            fields = {'last_active': timestamp, 'shard': shard_slot(user_id)}
+            if ref.id in missing_slot:
+                fields['summary_slot'] = summary_slot(user_id, missing_slot[ref.id])
+            writes.append(('merge', ref, fields))
+        await self._write_each(writes)
+
+    async def _paginate(self, query, page_size: int):
+        """
+        Streams an ordered query one page at a time, resuming each page after
+        the last document of the previous one, so no stream is held open
+        while the consumer works.
+        """
+        query = query.limit(page_size)
+        last_doc = None
+        while True:
+            page = query.start_after(last_doc) if last_doc else query
+            docs = [doc async for doc in page.stream()]
+            for doc in docs:
+                yield doc
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+
+    def _iter_user_docs(self, field_paths: List[str], page_size: int):
+        query = self.db.collection('users').select(field_paths).order_by('__name__')
+        return self._paginate(query, page_size)
+
+    async def iter_user_ids(self, page_size: int = 500) -> AsyncIterator[str]:
+        async for doc in self._iter_user_docs([], page_size):
+            yield doc.id
+
+    async def iter_user_ids_pending_summary(self, week: str, page_size: int = 500,
+                                            slots: Optional[Tuple[int, int]] = None,
+                                            due: Optional[Tuple[int, int]] = None) -> AsyncIterator[str]:
+        if slots is None and due is None:
+            docs = self._iter_user_docs(['last_summary_week'], page_size)
+        else:
+            # Users carry their shard slot and summary slot since they were
+            # created or last reconciled. Range filters order by their field
+            # first, so the page cursor needs those fields in the projection.
+            # Filtering on both needs a composite index on the users
+            # collection over (summary_slot, shard).
+            fields = ['last_summary_week']
+            query = self.db.collection('users')
+            if due is not None:
+                fields.append('summary_slot')
+                query = (
+                    query.where(field_path='summary_slot', op_string='>', value=due[0])
+                    .where(field_path='summary_slot', op_string='<=', value=due[1])
+                    .order_by('summary_slot')
+                )
+            if slots is not None:
+                fields.append('shard')
+                query = (
+                    query.where(field_path='shard', op_string='>=', value=slots[0])
+                    .where(field_path='shard', op_string='<', value=slots[1])
+                    .order_by('shard')
+                )
+            docs = self._paginate(query.select(fields).order_by('__name__'), page_size)
+        async for doc in docs:
+            if (doc.to_dict() or {}).get('last_summary_week') != week:
+                yield doc.id
+
+    async def mark_summaries_sent(self, user_ids: Iterable[str], week: str):
+        await self._write_each([
+            ('merge', self._user_ref(user_id), {'last_summary_week': week})
+            for user_id in user_ids
+        ])
+
+    # --- transactions ---
+
+    def _rollup_writes(self, user_ref, txn: Dict) -> List[Tuple]:
+        rollups_ref = user_ref.collection('rollups')
+        writes = []
+        for key, (period, start) in _bucket_starts(txn['timestamp']).items():
+            update = {
+                'period': period,
+                'start': start,
+                txn['type']: firestore.Increment(txn['amount']),
+                'count': firestore.Increment(1)
+            }
+            if txn['type'] == 'expense':
+                update['categories'] = {txn['category']: firestore.Increment(txn['amount'])}
+            writes.append(('merge', rollups_ref.document(key), update))
+        return writes
+
+    def _aggregate_writes(self, user_ref, txns: List[Dict]) -> List[Tuple]:
+        # One summed write for the user totals and one per rollup bucket,
+        # however many transactions touch them
+        totals = {'income': 0.0, 'expense': 0.0}
+        rollups: Dict[str, Dict] = {}
+        for txn in txns:
+            totals[txn['type']] += txn['amount']
+            for key, (period, start) in _bucket_starts(txn['timestamp']).items():
+                bucket = rollups.setdefault(key, {'period': period, 'start': start, **empty_period_totals()})
+                bucket[txn['type']] += txn['amount']
+                bucket['count'] += 1
+                if txn['type'] == 'expense':
+                    bucket['categories'][txn['category']] = bucket['categories'].get(txn['category'], 0.0) + txn['amount']
+
+        writes = [('merge', user_ref, {
+            'total_income': firestore.Increment(totals['income']),
+            'total_expense': firestore.Increment(totals['expense']),
+            'txn_count': firestore.Increment(len(txns))
+        })]
+        rollups_ref = user_ref.collection('rollups')
+        for key, bucket in rollups.items():
+            update = {
+                'period': bucket['period'],
+                'start': bucket['start'],
+                'count': firestore.Increment(bucket['count'])
+            }
+            for txn_type in ('income', 'expense'):
+                if bucket[txn_type]:
+                    update[txn_type] = firestore.Increment(bucket[txn_type])
+            if bucket['categories']:
+                update['categories'] = {
+                    category: firestore.Increment(amount) for category, amount in bucket['categories'].items()
+                }
+            writes.append(('merge', rollups_ref.document(key), update))
+        return writes
+
+    async def add_transaction(self, user_id: int, txn: Dict, txn_id: Optional[str] = None,
+                              goal_name: Optional[str] = None) -> bool:
+        user_ref = self._user_ref(user_id)
+        txn_ref = user_ref.collection('transactions').document(txn_id)
+
+        # The transaction, the running totals on the user document, the
+        # day/week/month rollups and the goal progress are committed together, so
+        # none of them can drift from the history. `create` fails the whole
+        # batch if the transaction already exists, increments included.
+        writes = [
+            ('create', txn_ref, txn),
+            ('merge', user_ref, {
+                f"total_{txn['type']}": firestore.Increment(txn['amount']),
+                "txn_count": firestore.Increment(1)
+            }),
+            *self._rollup_writes(user_ref, txn),
+        ]
+        if goal_name is not None:
+            # `update` rather than a merge, so a goal deleted in the meantime
+            # isn't recreated without a target
+            writes.append(('update', user_ref.collection('goals').document(goal_name.lower()), {
+                'current_amount': firestore.Increment(txn['amount']),
+                'updated_at': txn['timestamp']
+            }))
+        try:
+            await self._write(writes)
+        except AlreadyExists:
+            return False
+        except NotFound:
+            # Only the goal update can miss, so log the transaction without it
+            return await self.add_transaction(user_id, txn, txn_id)
+        return True
+
+    async def add_transaction_group(self, user_id: int,
+                                    entries: List[Tuple[Optional[str], Dict, Optional[str]]]) -> bool:
+        user_ref = self._user_ref(user_id)
+        txns_ref = user_ref.collection('transactions')
+
+        # Like add_transaction: the transactions, their summed aggregates and
+        # the goal progress share one commit, which a redelivered message
+        # fails as a whole on its first `create`
+        writes = [('create', txns_ref.document(txn_id), txn) for txn_id, txn, _ in entries]
+        writes += self._aggregate_writes(user_ref, [txn for _, txn, _ in entries])
+        progress: Dict[str, Tuple[float, datetime]] = {}
+        for _, txn, goal_name in entries:
+            if goal_name is not None:
+                amount, _ = progress.get(goal_name.lower(), (0.0, None))
+                progress[goal_name.lower()] = (amount + txn['amount'], txn['timestamp'])
+        for goal_key, (amount, updated_at) in progress.items():
+            writes.append(('update', user_ref.collection('goals').document(goal_key), {
+                'current_amount': firestore.Increment(amount),
+                'updated_at': updated_at
+            }))
+        try:
+            await self._write(writes)
+        except AlreadyExists:
+            return False
+        except NotFound:
+            # Only a goal update can miss, so log the transactions without them
+            return await self.add_transaction_group(user_id, [(txn_id, txn, None) for txn_id, txn, _ in entries])
+        return True
+
+    async def add_transactions(self, user_id: int, txns: List[Tuple[str, Dict]]) -> int:
+        # Each commit holds its transactions plus one summed write per
+        # aggregate document they touch, so the batch is sized by the
+        # distinct rollup buckets as well as the rows
+        added = 0
+        chunk, buckets = [], set()
+        for txn_id, txn in txns:
+            keys = _bucket_starts(txn['timestamp']).keys()
+            if chunk and len(chunk) + 1 + len(buckets.union(keys)) > MAX_BATCH_WRITES:
+                added += await self._add_transaction_chunk(user_id, chunk)
+                chunk, buckets = [], set()
+            chunk.append((txn_id, txn))
+            buckets.update(keys)
+        if chunk:
+            added += await self._add_transaction_chunk(user_id, chunk)
+        return added
+
+    async def _add_transaction_chunk(self, user_id: int, chunk: List[Tuple[str, Dict]]) -> int:
+        user_ref = self._user_ref(user_id)
+        txns_ref = user_ref.collection('transactions')
+        refs = {txn_id: txns_ref.document(txn_id) for txn_id, _ in chunk}
+        existing = {doc.id async for doc in self.db.get_all(list(refs.values()), field_paths=['type']) if doc.exists}
+        new = [(txn_id, txn) for txn_id, txn in chunk if txn_id not in existing]
+        if not new:
+            return 0
+
+        writes = [('create', refs[txn_id], txn) for txn_id, txn in new]
+        writes += self._aggregate_writes(user_ref, [txn for _, txn in new])
+
+        try:
+            # One batch, bypassing the coalescer: it is already full-sized
+            await self._commit_in_batches(writes)
+        except AlreadyExists:
+            # Another import of the same rows got in between the existence
+            # check and the commit; fall back to one commit per transaction
+            added = 0
+            for txn_id, txn in new:
+                added += await self.add_transaction(user_id, txn, txn_id)
+            return added
+        return len(new)
+
+    async def iter_transactions(self, user_id: int, since: Optional[datetime] = None,
+                                fields: Sequence[str] = TXN_FIELDS, page_size: int = 500,
+                                until: Optional[datetime] = None) -> AsyncIterator[Dict]:
+        # Always in timestamp order, with the document ID breaking ties, so
+        # exports read chronologically. The page cursor reads the timestamp
+        # back from the last document of each page, so it is always selected.
+        query = self._user_ref(user_id).collection('transactions').select(list({*fields, 'timestamp'}))
+        # Use keyword arguments to avoid Firestore warning
+        if since is not None:
+            query = query.where(field_path="timestamp", op_string=">=", value=since)
+        if until is not None:
+            query = query.where(field_path="timestamp", op_string="<", value=until)
+        query = query.order_by('timestamp').order_by('__name__')
+        async for doc in self._paginate(query, page_size):
+            yield _with_defaults(doc.to_dict())
+
+    async def get_balance(self, user_id: int) -> float:
+        # Users created before the running totals existed fall back to a full
+        # history scan until rebuild_aggregates has been run for them.
+        user_doc = await self._user_ref(user_id).get()
+        user = user_doc.to_dict() or {}
+        if user.get("totals_initialized"):
+            return user.get("total_income", 0.0) - user.get("total_expense", 0.0)
+
+        frame = await TransactionFrame.from_stream(self.iter_transactions(user_id, fields=('type', 'amount')))
+        return frame.balance()
+
+    async def _get_day_rollups(self, user_id: int, days: int) -> List[Dict]:
+        # One batched read of at most `days` small documents
+        rollups_ref = self._user_ref(user_id).collection('rollups')
+        start = period_start(days)
+        refs = [rollups_ref.document(day_key(start + timedelta(days=i))) for i in range(days)]
+        return [snap.to_dict() async for snap in self.db.get_all(refs) if snap.exists]
+
+    async def get_period_totals(self, user_id: int, days: int) -> Dict:
+        totals = empty_period_totals()
+        for bucket in await self._get_day_rollups(user_id, days):
+            totals['income'] += bucket.get('income', 0.0)
+            totals['expense'] += bucket.get('expense', 0.0)
+            totals['count'] += bucket.get('count', 0)
+            for category, amount in bucket.get('categories', {}).items():
+                totals['categories'][category] = totals['categories'].get(category, 0.0) + amount
+        return totals
+
+    async def get_category_expense(self, user_id: int, category: str, days: int) -> float:
+        totals = await self.get_period_totals(user_id, days)
+        return totals['categories'].get(category, 0.0)
+
+    async def get_week_totals(self, user_id: int, week: str) -> Dict:
+        # The week bucket is the materialized summary: one document read.
+        # A new week simply starts a new bucket.
+        snap = await self._user_ref(user_id).collection('rollups').document(f"w-{week}").get()
+        bucket = snap.to_dict() if snap.exists else {}
+        totals = empty_period_totals()
+        totals['income'] = bucket.get('income', 0.0)
+        totals['expense'] = bucket.get('expense', 0.0)
+        totals['count'] = bucket.get('count', 0)
+        totals['categories'] = dict(bucket.get('categories', {}))
+        return totals
+
+    async def _rebuild_totals(self, user_id: int) -> Dict:
+        # Runs inside a Firestore transaction that also reads the user
+        # document, so a transaction logged concurrently forces a retry
+        # instead of being lost or counted twice.
+        user_ref = self._user_ref(user_id)
+
+        @firestore.async_transactional
+        async def rebuild(transaction):
+            await user_ref.get(transaction=transaction)
+            txns = user_ref.collection('transactions').select(['type', 'amount'])
+            frame = await TransactionFrame.from_stream(
+                _with_defaults(doc.to_dict()) async for doc in txns.stream(transaction=transaction)
+            )
+            summed = frame.totals()
+            totals = {"total_income": summed['income'], "total_expense": summed['expense'], "txn_count": summed['count']}
+            transaction.set(user_ref, {
+                **totals, "totals_initialized": True, "shard": shard_slot(user_id)
+            }, merge=True)
+            return totals
+
+        return await rebuild(self.db.transaction())
+
+    async def _rebuild_rollups(self, user_id: int) -> int:
+        # Existing buckets are replaced. Writes made while this runs can be
+        # lost, so run it while the user is idle.
+        user_ref = self._user_ref(user_id)
+        rollups_ref = user_ref.collection('rollups')
+
+        frame = await TransactionFrame.from_stream(self.iter_transactions(user_id))
+        buckets = {}
+        for period, key_of in (('day', day_key), ('week', week_key), ('month', month_key)):
+            for start, totals in frame.group_by_period(period).items():
+                buckets[key_of(start)] = {'period': period, 'start': start, **totals}
+
+        stale = [doc.reference async for doc in rollups_ref.select([]).stream() if doc.id not in buckets]
+        await self._commit_in_batches(
+            [('delete', ref, None) for ref in stale] +
+            [('set', rollups_ref.document(key), bucket) for key, bucket in buckets.items()]
+        )
+        return len(buckets)
+
+    async def rebuild_aggregates(self, user_id: int) -> Dict:
+        totals = await self._rebuild_totals(user_id)
+        totals['rollup_buckets'] = await self._rebuild_rollups(user_id)
+        return totals
+
+    # --- budgets ---
+
+    async def set_budget(self, user_id: int, budget: Dict):
+        budget_ref = self._user_ref(user_id).collection('budgets').document(budget['category'])
+        await self._write([('set', budget_ref, budget)])
+
+    async def get_budget(self, user_id: int, category: str) -> Dict:
+        doc = await self._user_ref(user_id).collection('budgets').document(category).get()
+        return doc.to_dict() if doc.exists else {}
+
+    async def get_all_budgets(self, user_id: int) -> List[Dict]:
+        docs = self._user_ref(user_id).collection('budgets').stream()
+        return [doc.to_dict() async for doc in docs]
+
+    async def delete_budget(self, user_id: int, category: str):
+        await self._write([('delete', self._user_ref(user_id).collection('budgets').document(category), None)])
+
+    # --- goals ---
+
+    async def set_goal(self, user_id: int, goal: Dict):
+        goal_ref = self._user_ref(user_id).collection('goals').document(goal['goal_name'].lower())
+        await self._write([('set', goal_ref, goal)])
+
+    async def add_goal_progress(self, user_id: int, goal_name: str, amount: float):
+        goal_ref = self._user_ref(user_id).collection('goals').document(goal_name.lower())
+        now = datetime.utcnow()
+        # An increment rather than a read and a write, so concurrent
+        # progress on one goal can't overwrite each other
+        try:
+            await self._write([('update', goal_ref, {
+                'current_amount': firestore.Increment(amount),
+                'updated_at': now
+            })])
+            return
+        except NotFound:
+            pass
+        # If goal doesn't exist, create it with this amount as progress
+        try:
+            await self._write([('create', goal_ref, {
+                'goal_name': goal_name,
+                'target_amount': amount,
+                'current_amount': amount,
+                'created_at': now,
+                'updated_at': now
+            })])
+        except AlreadyExists:
+            # Created by a concurrent call in the meantime
+            await self.add_goal_progress(user_id, goal_name, amount)
+
+    async def get_goal(self, user_id: int, goal_name: str) -> Dict:
+        doc = await self._user_ref(user_id).collection('goals').document(goal_name.lower()).get()
+        return doc.to_dict() if doc.exists else {}
+
+    async def get_all_goals(self, user_id: int) -> List[Dict]:
+        docs = self._user_ref(user_id).collection('goals').stream()
+        return [doc.to_dict() async for doc in docs]
+
+    async def delete_goal(self, user_id: int, goal_name: str):
+        await self._write([('delete', self._user_ref(user_id).collection('goals').document(goal_name.lower()), None)])
+
+    # --- update dedupe markers ---
+
+    async def claim_update(self, update_id: int, expires_at: datetime) -> bool:
+        # Configure a Firestore TTL policy on `expires_at` for the
+        # `processed_updates` collection to have markers cleaned up.
+        marker_ref = self.db.collection('processed_updates').document(str(update_id))
+        try:
+            await marker_ref.create({'created_at': datetime.utcnow(), 'expires_at': expires_at})
+        except AlreadyExists:
+            return False
+        return True
+
+    async def release_update(self, update_id: int):
+        await self.db.collection('processed_updates').document(str(update_id)).delete()
+
+    # --- scheduled job state ---
+
+    async def acquire_lease(self, name: str, owner: str, ttl: timedelta) -> bool:
+        lease_ref = self.db.collection('leases').document(name)
+
+        @firestore.async_transactional
+        async def acquire(transaction):
+            snap = await lease_ref.get(transaction=transaction)
+            lease = snap.to_dict() if snap.exists else {}
+            now = datetime.now(timezone.utc)
+            expires_at = lease.get('expires_at')
+            if lease.get('owner') not in (None, owner) and expires_at and expires_at > now:
+                return False
+            transaction.set(lease_ref, {'owner': owner, 'expires_at': now + ttl})
+            return True
+
+        return await acquire(self.db.transaction())
+
+    async def release_lease(self, name: str, owner: str):
+        lease_ref = self.db.collection('leases').document(name)
+
+        @firestore.async_transactional
+        async def release(transaction):
+            snap = await lease_ref.get(transaction=transaction)
+            if snap.exists and snap.to_dict().get('owner') == owner:
+                transaction.delete(lease_ref)
+
+        await release(self.db.transaction())
+
+    async def get_job_state(self, job_name: str) -> Dict:
+        doc = await self.db.collection('jobs').document(job_name).get()
+        return doc.to_dict() if doc.exists else {}
+
+    async def set_job_state(self, job_name: str, state: Dict):
+        await self.db.collection('jobs').document(job_name).set(state, merge=True)
+
+    async def close(self):
+        if self.coalescer is not None:
+            await self.coalescer.close()
+        self.db.close()
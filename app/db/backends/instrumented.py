@@ -0,0 +1,31 @@
+# app/db/backends/instrumented.py
+"""
+Wraps a backend so every coroutine method call is timed into the "db"
+stage of app.core.metrics, labelled with the method name. Streaming
+methods (the iter_* ones) are passed through untimed, since their cost
+is spread over the consumer's loop.
+"""
+import functools
+import inspect
+
+from app.core import metrics
+from app.db.backends.base import StorageBackend
+
+
+class InstrumentedBackend:
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def timed(*args, **kwargs):
+            with metrics.span("db", op=name):
+                return await attr(*args, **kwargs)
+
+        # Cached on the instance so __getattr__ only runs once per method
+        setattr(self, name, timed)
+        return timed
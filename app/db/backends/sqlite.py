@@ -0,0 +1,483 @@
+# app/db/backends/sqlite.py
+"""
+SQLite implementation of the storage backend, for self-hosting, local
+development and load tests without a Firebase project.
+
+All statements run on one dedicated thread that owns the connection, so
+they never block the event loop and never race each other. Aggregates are
+computed by SQL over the (user_id, timestamp) and
+(user_id, category, timestamp) indexes instead of being maintained as
+denormalized counters.
+"""
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.summary_slots import summary_slot
+from app.db.backends.base import (
+    SHARD_SLOTS, TXN_FIELDS, StorageBackend, empty_period_totals, period_start, week_start
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    created_at TEXT,
+    last_active TEXT,
+    last_summary_week TEXT,
+    timezone TEXT,
+    summary_slot INTEGER
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    txn_id TEXT,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT,
+    timestamp TEXT NOT NULL,
+    UNIQUE (user_id, txn_id)
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_time
+    ON transactions (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_time
+    ON transactions (user_id, category, timestamp);
+CREATE TABLE IF NOT EXISTS budgets (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    created_at TEXT,
+    PRIMARY KEY (user_id, category)
+);
+CREATE TABLE IF NOT EXISTS goals (
+    user_id INTEGER NOT NULL,
+    goal_key TEXT NOT NULL,
+    goal_name TEXT NOT NULL,
+    target_amount REAL NOT NULL,
+    current_amount REAL NOT NULL DEFAULT 0,
+    created_at TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (user_id, goal_key)
+);
+CREATE TABLE IF NOT EXISTS processed_updates (
+    update_id INTEGER PRIMARY KEY,
+    created_at TEXT,
+    expires_at TEXT
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+
+# Columns added to tables after their first release, created on startup
+# when an older database file lacks them
+MIGRATIONS = {
+    'users': {'timezone': 'TEXT', 'summary_slot': 'INTEGER'},
+}
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_users_summary_slot ON users (summary_slot);
+"""
+
+TXN_COLUMNS = {'type', 'amount', 'category', 'description', 'timestamp'}
+USER_COLUMNS = {'username', 'created_at', 'last_active', 'last_summary_week', 'timezone', 'summary_slot'}
+
+
+def _ts(value: Optional[datetime]) -> Optional[str]:
+    # ISO text sorts chronologically, which the timestamp indexes rely on
+    return value.isoformat(sep=' ') if value is not None else None
+
+
+def _dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path: str):
+        self.path = path
+        # One thread owns the connection; every statement is queued onto it
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = self._executor.submit(self._connect).result()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        for table, columns in MIGRATIONS.items():
+            existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        conn.executescript(INDEXES)
+        # Users from before summary slots get theirs at startup, so they are
+        # found by the dispatcher without running app.db.reconcile
+        conn.create_function("summary_slot", 2, summary_slot)
+        conn.execute("UPDATE users SET summary_slot = summary_slot(user_id, timezone) WHERE summary_slot IS NULL")
+        conn.commit()
+        return conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def _execute(self, sql: str, params: Tuple = ()) -> int:
+        def run():
+            with self._conn:
+                return self._conn.execute(sql, params).rowcount
+        return await self._run(run)
+
+    async def _executemany(self, sql: str, rows: List[Tuple]):
+        def run():
+            with self._conn:
+                self._conn.executemany(sql, rows)
+        await self._run(run)
+
+    async def _fetchall(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        return await self._run(lambda: self._conn.execute(sql, params).fetchall())
+
+    async def _fetchone(self, sql: str, params: Tuple = ()) -> Optional[sqlite3.Row]:
+        return await self._run(lambda: self._conn.execute(sql, params).fetchone())
+
+    # --- users ---
+
+    async def create_user(self, user_id: int, user: Dict) -> bool:
+        inserted = await self._execute(
+            "INSERT OR IGNORE INTO users (user_id, username, created_at, last_active, timezone, summary_slot) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, user.get('username'), _ts(user.get('created_at')), _ts(user.get('last_active')),
+             user.get('timezone'), user.get('summary_slot'))
+        )
+        return inserted == 1
+
+    async def get_user(self, user_id: int) -> Dict:
+        row = await self._fetchone("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        if row is None:
+            return {}
+        user = {column: row[column] for column in USER_COLUMNS}
+        for column in ('created_at', 'last_active'):
+            user[column] = _dt(user[column])
+        return user
+
+    async def update_user(self, user_id: int, fields: Dict):
+        unknown = set(fields) - USER_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown user fields: {sorted(unknown)}")
+        values = [_ts(value) if isinstance(value, datetime) else value for value in fields.values()]
+        await self._execute(
+            f"UPDATE users SET {', '.join(f'{column} = ?' for column in fields)} WHERE user_id = ?",
+            (*values, user_id)
+        )
+
+    async def touch_users(self, last_active: List[Tuple[int, datetime]]):
+        # Backfills the summary slot of users created before slots existed;
+        # a stored slot (which may follow the user's timezone) is kept
+        await self._executemany(
+            "UPDATE users SET last_active = ?, summary_slot = COALESCE(summary_slot, ?) WHERE user_id = ?",
+            [(_ts(timestamp), summary_slot(user_id), user_id) for user_id, timestamp in last_active]
+        )
+
+    async def _iter_user_rows(self, where: str, params: Tuple, page_size: int):
+        last_id = None
+        while True:
+            keyset = "user_id > ?" if last_id is not None else "1"
+            rows = await self._fetchall(
+                f"SELECT user_id FROM users WHERE {keyset} AND {where} ORDER BY user_id LIMIT ?",
+                ((last_id,) if last_id is not None else ()) + params + (page_size,)
+            )
+            for row in rows:
+                yield str(row['user_id'])
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['user_id']
+
+    async def iter_user_ids(self, page_size: int = 500) -> AsyncIterator[str]:
+        async for user_id in self._iter_user_rows("1", (), page_size):
+            yield user_id
+
+    async def iter_user_ids_pending_summary(self, week: str, page_size: int = 500,
+                                            slots: Optional[Tuple[int, int]] = None,
+                                            due: Optional[Tuple[int, int]] = None) -> AsyncIterator[str]:
+        where = "(last_summary_week IS NULL OR last_summary_week != ?)"
+        params: Tuple = (week,)
+        if slots is not None:
+            where += " AND user_id % ? >= ? AND user_id % ? < ?"
+            params += (SHARD_SLOTS, slots[0], SHARD_SLOTS, slots[1])
+        if due is not None:
+            where += " AND summary_slot > ? AND summary_slot <= ?"
+            params += due
+        async for user_id in self._iter_user_rows(where, params, page_size):
+            yield user_id
+
+    async def mark_summaries_sent(self, user_ids: Iterable[str], week: str):
+        await self._executemany(
+            "UPDATE users SET last_summary_week = ? WHERE user_id = ?",
+            [(week, int(user_id)) for user_id in user_ids]
+        )
+
+    # --- transactions ---
+
+    def _insert_transaction(self, user_id: int, txn: Dict, txn_id: Optional[str],
+                            goal_name: Optional[str]) -> bool:
+        # Runs inside the caller's transaction on the executor thread
+        inserted = self._conn.execute(
+            "INSERT OR IGNORE INTO transactions "
+            "(user_id, txn_id, type, amount, category, description, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, txn_id, txn['type'], txn['amount'], txn['category'],
+             txn['description'], _ts(txn['timestamp']))
+        ).rowcount
+        if inserted and goal_name is not None:
+            self._conn.execute(
+                "UPDATE goals SET current_amount = current_amount + ?, updated_at = ? "
+                "WHERE user_id = ? AND goal_key = ?",
+                (txn['amount'], _ts(txn['timestamp']), user_id, goal_name.lower())
+            )
+        return inserted == 1
+
+    async def add_transaction(self, user_id: int, txn: Dict, txn_id: Optional[str] = None,
+                              goal_name: Optional[str] = None) -> bool:
+        def run():
+            with self._conn:
+                return self._insert_transaction(user_id, txn, txn_id, goal_name)
+        return await self._run(run)
+
+    async def add_transaction_group(self, user_id: int,
+                                    entries: List[Tuple[Optional[str], Dict, Optional[str]]]) -> bool:
+        def run():
+            with self._conn:
+                added = [self._insert_transaction(user_id, txn, txn_id, goal_name)
+                         for txn_id, txn, goal_name in entries]
+                return any(added)
+        return await self._run(run)
+
+    async def add_transactions(self, user_id: int, txns: List[Tuple[str, Dict]]) -> int:
+        def run():
+            with self._conn:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO transactions "
+                    "(user_id, txn_id, type, amount, category, description, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(user_id, txn_id, txn['type'], txn['amount'], txn['category'],
+                      txn['description'], _ts(txn['timestamp'])) for txn_id, txn in txns]
+                )
+                return self._conn.total_changes - before
+        return await self._run(run)
+
+    async def iter_transactions(self, user_id: int, since: Optional[datetime] = None,
+                                fields: Sequence[str] = TXN_FIELDS, page_size: int = 500,
+                                until: Optional[datetime] = None) -> AsyncIterator[Dict]:
+        unknown = set(fields) - TXN_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown transaction fields: {sorted(unknown)}")
+        # Keyset pagination on (timestamp, id) walks the (user_id, timestamp)
+        # index, whose entries carry the rowid, without sorting or OFFSET scans
+        sql = (
+            f"SELECT id AS _id, timestamp AS _ts{''.join(', ' + f for f in fields)} FROM transactions "
+            "WHERE user_id = ? AND timestamp >= ? AND timestamp < ? AND (timestamp, id) > (?, ?) "
+            "ORDER BY timestamp, id LIMIT ?"
+        )
+        # Timestamps are ISO strings, which any string starting with "~" sorts after
+        bounds = (_ts(since) or '', _ts(until) or '~')
+        cursor = ('', 0)
+        while True:
+            rows = await self._fetchall(sql, (user_id, *bounds, *cursor, page_size))
+            for row in rows:
+                txn = {field: row[field] for field in fields}
+                if 'timestamp' in txn:
+                    txn['timestamp'] = _dt(txn['timestamp'])
+                yield txn
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]['_ts'], rows[-1]['_id'])
+
+    async def get_balance(self, user_id: int) -> float:
+        row = await self._fetchone(
+            "SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END), 0) "
+            "FROM transactions WHERE user_id = ?",
+            (user_id,)
+        )
+        return row[0]
+
+    async def _totals_between(self, user_id: int, start: datetime, end: Optional[datetime] = None) -> Dict:
+        sql = (
+            "SELECT type, category, SUM(amount) AS total, COUNT(*) AS count FROM transactions "
+            "WHERE user_id = ? AND timestamp >= ?"
+        )
+        params: Tuple = (user_id, _ts(start))
+        if end is not None:
+            sql += " AND timestamp < ?"
+            params += (_ts(end),)
+        rows = await self._fetchall(sql + " GROUP BY type, category", params)
+        totals = empty_period_totals()
+        for row in rows:
+            txn_type = 'income' if row['type'] == 'income' else 'expense'
+            totals[txn_type] += row['total']
+            totals['count'] += row['count']
+            if txn_type == 'expense':
+                totals['categories'][row['category']] = row['total']
+        return totals
+
+    async def get_period_totals(self, user_id: int, days: int) -> Dict:
+        return await self._totals_between(user_id, period_start(days))
+
+    async def get_week_totals(self, user_id: int, week: str) -> Dict:
+        # A week is one range scan of the (user_id, timestamp) index, so
+        # there is nothing worth materializing
+        start = week_start(week)
+        return await self._totals_between(user_id, start, start + timedelta(days=7))
+
+    async def get_category_expense(self, user_id: int, category: str, days: int) -> float:
+        row = await self._fetchone(
+            "SELECT COALESCE(SUM(amount), 0) FROM transactions "
+            "WHERE user_id = ? AND category = ? AND timestamp >= ? AND type != 'income'",
+            (user_id, category, _ts(period_start(days)))
+        )
+        return row[0]
+
+    async def rebuild_aggregates(self, user_id: int) -> Dict:
+        # Nothing is denormalized; report the totals straight from the history
+        row = await self._fetchone(
+            "SELECT "
+            "COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0), "
+            "COALESCE(SUM(CASE WHEN type != 'income' THEN amount END), 0), "
+            "COUNT(*) FROM transactions WHERE user_id = ?",
+            (user_id,)
+        )
+        return {'total_income': row[0], 'total_expense': row[1], 'txn_count': row[2]}
+
+    # --- budgets ---
+
+    async def set_budget(self, user_id: int, budget: Dict):
+        await self._execute(
+            "INSERT OR REPLACE INTO budgets (user_id, category, amount, created_at) VALUES (?, ?, ?, ?)",
+            (user_id, budget['category'], budget['amount'], _ts(budget.get('created_at')))
+        )
+
+    def _budget(self, row: sqlite3.Row) -> Dict:
+        return {'amount': row['amount'], 'category': row['category'], 'created_at': _dt(row['created_at'])}
+
+    async def get_budget(self, user_id: int, category: str) -> Dict:
+        row = await self._fetchone(
+            "SELECT * FROM budgets WHERE user_id = ? AND category = ?", (user_id, category)
+        )
+        return self._budget(row) if row else {}
+
+    async def get_all_budgets(self, user_id: int) -> List[Dict]:
+        rows = await self._fetchall("SELECT * FROM budgets WHERE user_id = ?", (user_id,))
+        return [self._budget(row) for row in rows]
+
+    async def delete_budget(self, user_id: int, category: str):
+        await self._execute("DELETE FROM budgets WHERE user_id = ? AND category = ?", (user_id, category))
+
+    # --- goals ---
+
+    async def set_goal(self, user_id: int, goal: Dict):
+        await self._execute(
+            "INSERT OR REPLACE INTO goals "
+            "(user_id, goal_key, goal_name, target_amount, current_amount, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, goal['goal_name'].lower(), goal['goal_name'], goal['target_amount'],
+             goal['current_amount'], _ts(goal.get('created_at')), _ts(goal.get('updated_at')))
+        )
+
+    async def add_goal_progress(self, user_id: int, goal_name: str, amount: float):
+        now = _ts(datetime.utcnow())
+        await self._execute(
+            "INSERT INTO goals "
+            "(user_id, goal_key, goal_name, target_amount, current_amount, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id, goal_key) DO UPDATE SET "
+            "current_amount = current_amount + excluded.current_amount, updated_at = excluded.updated_at",
+            (user_id, goal_name.lower(), goal_name, amount, amount, now, now)
+        )
+
+    def _goal(self, row: sqlite3.Row) -> Dict:
+        return {
+            'goal_name': row['goal_name'],
+            'target_amount': row['target_amount'],
+            'current_amount': row['current_amount'],
+            'created_at': _dt(row['created_at']),
+            'updated_at': _dt(row['updated_at']),
+        }
+
+    async def get_goal(self, user_id: int, goal_name: str) -> Dict:
+        row = await self._fetchone(
+            "SELECT * FROM goals WHERE user_id = ? AND goal_key = ?", (user_id, goal_name.lower())
+        )
+        return self._goal(row) if row else {}
+
+    async def get_all_goals(self, user_id: int) -> List[Dict]:
+        rows = await self._fetchall("SELECT * FROM goals WHERE user_id = ?", (user_id,))
+        return [self._goal(row) for row in rows]
+
+    async def delete_goal(self, user_id: int, goal_name: str):
+        await self._execute(
+            "DELETE FROM goals WHERE user_id = ? AND goal_key = ?", (user_id, goal_name.lower())
+        )
+
+    # --- update dedupe markers ---
+
+    async def claim_update(self, update_id: int, expires_at: datetime) -> bool:
+        def run():
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM processed_updates WHERE expires_at < ?", (_ts(datetime.utcnow()),)
+                )
+                return self._conn.execute(
+                    "INSERT OR IGNORE INTO processed_updates (update_id, created_at, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (update_id, _ts(datetime.utcnow()), _ts(expires_at))
+                ).rowcount
+        return await self._run(run) == 1
+
+    async def release_update(self, update_id: int):
+        await self._execute("DELETE FROM processed_updates WHERE update_id = ?", (update_id,))
+
+    # --- scheduled job state ---
+
+    async def acquire_lease(self, name: str, owner: str, ttl: timedelta) -> bool:
+        # The conditional upsert is atomic, and the database file is shared by
+        # every process on the host
+        now = datetime.utcnow()
+        acquired = await self._execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, owner, _ts(now + ttl), _ts(now))
+        )
+        return acquired == 1
+
+    async def release_lease(self, name: str, owner: str):
+        await self._execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    async def get_job_state(self, job_name: str) -> Dict:
+        row = await self._fetchone("SELECT state FROM jobs WHERE name = ?", (job_name,))
+        return json.loads(row['state']) if row else {}
+
+    async def set_job_state(self, job_name: str, state: Dict):
+        def run():
+            with self._conn:
+                row = self._conn.execute("SELECT state FROM jobs WHERE name = ?", (job_name,)).fetchone()
+                merged = {**(json.loads(row['state']) if row else {}), **state}
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (name, state) VALUES (?, ?)",
+                    (job_name, json.dumps(merged, default=str))
+                )
+        await self._run(run)
+
+    async def close(self):
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
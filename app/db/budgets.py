@@ -1,39 +1,45 @@
 # app/db/budgets.py
-from app.core.firebase import db
+from app.db.backends import get_backend
+from app.core.cache import TTLCache
 from typing import Dict, List
 from datetime import datetime
 
-def set_budget(user_id: int, category: str, amount: float):
+# (user_id, category) -> budget dict, {} when the category has no budget
+_budget_cache = TTLCache("budgets")
+
+async def set_budget(user_id: int, category: str, amount: float):
     """
     Set or update a budget for a specific category.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    budget_ref = user_ref.collection('budgets').document(category.lower())
-    budget_ref.set({
+    budget = {
         'amount': float(amount),
         'category': category.lower(),
         'created_at': datetime.utcnow()
-    })
+    }
+    await get_backend().set_budget(user_id, budget)
+    _budget_cache.set((user_id, category.lower()), budget)
 
-def get_budget(user_id: int, category: str) -> Dict:
+async def get_budget(user_id: int, category: str) -> Dict:
     """
     Fetch budget for a specific category.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    doc = user_ref.collection('budgets').document(category.lower()).get()
-    return doc.to_dict() if doc.exists else {}
+    cached = _budget_cache.get((user_id, category.lower()))
+    if cached is not None:
+        return cached
+
+    budget = await get_backend().get_budget(user_id, category.lower())
+    _budget_cache.set((user_id, category.lower()), budget)
+    return budget
 
-def get_all_budgets(user_id: int) -> List[Dict]:
+async def get_all_budgets(user_id: int) -> List[Dict]:
     """
     Fetch all budgets for a user.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    docs = user_ref.collection('budgets').stream()
-    return [doc.to_dict() for doc in docs]
+    return await get_backend().get_all_budgets(user_id)
 
-def delete_budget(user_id: int, category: str):
+async def delete_budget(user_id: int, category: str):
     """
     Delete a budget for a specific category.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    user_ref.collection('budgets').document(category.lower()).delete()
+    await get_backend().delete_budget(user_id, category.lower())
+    _budget_cache.set((user_id, category.lower()), {})
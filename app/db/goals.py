@@ -1,60 +1,74 @@
 # app/db/goals.py
-from app.core.firebase import db
-from typing import Dict, List
+from app.db.backends import get_backend
+from app.core.cache import TTLCache
+from typing import Dict, List, Optional
 from datetime import datetime
 
-def set_goal(user_id: int, goal_name: str, target_amount: float):
+# user_id -> {lower-cased goal name: goal dict}
+_goals_cache = TTLCache("goals")
+
+async def _get_goal_index(user_id: int) -> Dict[str, Dict]:
+    index = _goals_cache.get(user_id)
+    if index is None:
+        goals = await get_backend().get_all_goals(user_id)
+        index = {goal['goal_name'].lower(): goal for goal in goals}
+        _goals_cache.set(user_id, index)
+    return index
+
+async def set_goal(user_id: int, goal_name: str, target_amount: float):
     """
     Create or update a financial goal.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    goal_ref = user_ref.collection('goals').document(goal_name.lower())
-    goal_ref.set({
+    await get_backend().set_goal(user_id, {
         'goal_name': goal_name,
         'target_amount': float(target_amount),
         'current_amount': 0.0,
         'created_at': datetime.utcnow(),
         'updated_at': datetime.utcnow()
     })
+    _goals_cache.invalidate(user_id)
 
-def update_goal_progress(user_id: int, goal_name: str, amount: float):
+async def update_goal_progress(user_id: int, goal_name: str, amount: float):
     """
-    Add progress to a goal.
+    Add progress to a goal. A missing goal is created with this amount as
+    both its target and its progress.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    goal_ref = user_ref.collection('goals').document(goal_name.lower())
-    doc = goal_ref.get()
-    if doc.exists:
-        goal_data = doc.to_dict()
-        current_amount = goal_data.get('current_amount', 0.0) + float(amount)
-        goal_ref.update({
-            'current_amount': current_amount,
-            'updated_at': datetime.utcnow()
-        })
-    else:
-        # If goal doesn't exist, create it with this amount as progress
-        set_goal(user_id, goal_name, amount)
-        update_goal_progress(user_id, goal_name, amount)
+    await get_backend().add_goal_progress(user_id, goal_name, float(amount))
+    _goals_cache.invalidate(user_id)
 
-def get_goal(user_id: int, goal_name: str) -> Dict:
+async def get_goal(user_id: int, goal_name: str) -> Dict:
     """
     Get details of a specific goal.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    doc = user_ref.collection('goals').document(goal_name.lower()).get()
-    return doc.to_dict() if doc.exists else {}
+    return await get_backend().get_goal(user_id, goal_name)
 
-def get_all_goals(user_id: int) -> List[Dict]:
+async def get_all_goals(user_id: int) -> List[Dict]:
     """
     Get all goals for a user.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    docs = user_ref.collection('goals').stream()
-    return [doc.to_dict() for doc in docs]
+    return list((await _get_goal_index(user_id)).values())
+
+async def find_goal(user_id: int, goal_name: str) -> Optional[Dict]:
+    """
+    Looks a goal up by name in the cached goals, without a storage call
+    once they are cached. Returns None if the user has no such goal.
+    """
+    return (await _get_goal_index(user_id)).get(goal_name.lower())
+
+def record_cached_progress(user_id: int, goal_name: str, amount: float):
+    """
+    Mirrors progress that was committed together with a transaction into the
+    cached goals, so the next lookup doesn't need to refetch them.
+    """
+    index = _goals_cache.get(user_id)
+    goal = index.get(goal_name.lower()) if index is not None else None
+    if goal is not None:
+        goal['current_amount'] = goal.get('current_amount', 0.0) + float(amount)
+        goal['updated_at'] = datetime.utcnow()
 
-def delete_goal(user_id: int, goal_name: str):
+async def delete_goal(user_id: int, goal_name: str):
     """
     Delete a goal.
     """
-    user_ref = db.collection('users').document(str(user_id))
-    user_ref.collection('goals').document(goal_name.lower()).delete()
+    await get_backend().delete_goal(user_id, goal_name)
+    _goals_cache.invalidate(user_id)
@@ -0,0 +1,23 @@
+# app/db/jobs.py
+from app.db.backends import get_backend
+from datetime import datetime, timedelta
+from typing import Dict
+
+async def get_job_state(job_name: str) -> Dict:
+    """Fetches the persisted state of a scheduled job, or {} if it never ran."""
+    return await get_backend().get_job_state(job_name)
+
+async def set_job_state(job_name: str, **state):
+    """Merges `state` into the job's stored state."""
+    await get_backend().set_job_state(job_name, {**state, 'updated_at': datetime.utcnow()})
+
+async def acquire_lease(name: str, owner: str, ttl_seconds: float) -> bool:
+    """
+    Takes or renews the lease `name` for `owner`. Returns False while another
+    owner holds it; an owner that stops renewing loses it after `ttl_seconds`.
+    """
+    return await get_backend().acquire_lease(name, owner, timedelta(seconds=ttl_seconds))
+
+async def release_lease(name: str, owner: str):
+    """Gives the lease up so another owner doesn't have to wait for it to expire."""
+    await get_backend().release_lease(name, owner)
@@ -0,0 +1,106 @@
+# app/db/reconcile.py
+"""
+Rebuilds the denormalized aggregates the storage backend keeps (for
+Firestore, the running totals on the user document and the day/week/month
+rollups, plus the user's shard slot) from the raw transaction history, and
+recomputes each user's summary slot. Run it once after deploying a new
+aggregate, or any time they are suspected to have drifted:
+
+    python -m app.db.reconcile            # every user
+    python -m app.db.reconcile 12345 678  # specific users
+
+With --slots, only the summary slots are recomputed from each user's
+timezone, without reading any transactions. Run it after each daylight
+saving change (see app.core.summary_slots):
+
+    python -m app.db.reconcile --slots [user ids]
+
+With --check, nothing is written. This week's summary totals are compared
+against the raw transactions instead, and the users whose totals disagree
+are listed:
+
+    python -m app.db.reconcile --check [user ids]
+"""
+import asyncio
+import sys
+
+from app.db.transactions import check_week_totals, rebuild_user_aggregates
+from app.db.users import iter_user_ids, refresh_summary_slot
+
+
+async def _each(user_ids):
+    # Accepts a plain list from the command line or the paged user stream
+    if hasattr(user_ids, '__aiter__'):
+        async for user_id in user_ids:
+            yield user_id
+    else:
+        for user_id in user_ids:
+            yield user_id
+
+
+async def reconcile_users(user_ids):
+    """Recomputes the aggregates for each user in `user_ids`."""
+    async for user_id in _each(user_ids):
+        try:
+            totals = await rebuild_user_aggregates(int(user_id))
+            print(
+                f"Rebuilt totals for user {user_id}: "
+                f"income={totals['total_income']:.2f} "
+                f"expense={totals['total_expense']:.2f} "
+                f"count={totals['txn_count']}"
+            )
+            if 'rollup_buckets' in totals:
+                print(f"Rebuilt {totals['rollup_buckets']} rollup buckets for user {user_id}")
+            await refresh_summary_slot(int(user_id))
+        except Exception as e:
+            print(f"Failed to reconcile user {user_id}: {e}")
+
+
+async def refresh_slots(user_ids):
+    """Recomputes the summary slot of each user in `user_ids`."""
+    refreshed = 0
+    async for user_id in _each(user_ids):
+        try:
+            await refresh_summary_slot(int(user_id))
+            refreshed += 1
+        except Exception as e:
+            print(f"Failed to refresh the summary slot of user {user_id}: {e}")
+    print(f"Refreshed the summary slots of {refreshed} users.")
+
+
+async def check_users(user_ids):
+    """Reports users whose current week totals don't match their transactions."""
+    checked = drifted = 0
+    async for user_id in _each(user_ids):
+        checked += 1
+        try:
+            result = await check_week_totals(int(user_id))
+        except Exception as e:
+            print(f"Failed to check user {user_id}: {e}")
+            continue
+        if not result['consistent']:
+            drifted += 1
+            stored, actual = result['stored'], result['actual']
+            print(
+                f"User {user_id} week {result['week']} drifted: "
+                f"stored income={stored['income']:.2f} expense={stored['expense']:.2f} count={stored['count']}, "
+                f"actual income={actual['income']:.2f} expense={actual['expense']:.2f} count={actual['count']}"
+            )
+    print(f"Checked {checked} users, {drifted} inconsistent.")
+
+
+async def main(argv):
+    check = "--check" in argv
+    slots = "--slots" in argv
+    argv = [arg for arg in argv if arg not in ("--check", "--slots")]
+    user_ids = argv or iter_user_ids()
+    if check:
+        await check_users(user_ids)
+    elif slots:
+        await refresh_slots(user_ids)
+    else:
+        await reconcile_users(user_ids)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
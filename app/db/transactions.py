@@ -1,9 +1,12 @@
 # app/db/transactions.py
-from app.core.firebase import db
+from app.db.backends import get_backend
+from app.db.backends.base import TXN_FIELDS, iso_week
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Sequence, Tuple
 
-def add_transaction(user_id: int, amount: float, category: str, description: str, txn_type: str = "expense"):
+async def add_transaction(user_id: int, amount: float, category: str, description: str,
+                          txn_type: str = "expense", txn_id: Optional[str] = None,
+                          goal_name: Optional[str] = None) -> bool:
     """
     Adds a transaction for a user.
     
@@ -13,80 +16,125 @@ def add_transaction(user_id: int, amount: float, category: str, description: str
         category (str): Transaction category (e.g., groceries, salary)
         description (str): Original message/description
         txn_type (str): 'expense' or 'income'
+        txn_id (str): Optional ID derived from the source update.
+            Writing the same ID twice is a no-op, so redelivered updates
+            can't log the transaction again.
+        goal_name (str): Optional goal credited with `amount` in the same
+            commit as the transaction
+
+    Returns:
+        bool: False if a transaction with `txn_id` already exists
     """
     if txn_type not in ["expense", "income"]:
         txn_type = "expense"
 
-    user_ref = db.collection('users').document(str(user_id))
-    user_ref.collection('transactions').add({
+    txn = {
         "type": txn_type,
         "amount": float(amount),
         "category": category.lower(),
         "description": description,
         "timestamp": datetime.utcnow()
-    })
+    }
+    return await get_backend().add_transaction(user_id, txn, txn_id, goal_name)
 
 
-async def get_transactions_for_period(user_id: int, days: int = 7) -> List[Dict]:
+async def add_transaction_group(user_id: int, entries: List[Tuple[Optional[str], Dict, Optional[str]]]) -> bool:
     """
-    Fetches all transactions for a user in the last `days` days.
+    Adds the transactions of one message together, e.g. "spent 50 on tea,
+    120 on bus", in a single commit.
 
     Args:
         user_id (int): Telegram user ID
-        days (int): Number of days to look back (default 7)
+        entries (List[Tuple]): (txn_id, txn, goal_name) triples, each txn
+            with type, amount, category and description, and each
+            goal_name as in `add_transaction`
 
     Returns:
-        List[Dict]: List of transactions
+        bool: False if the message's transactions already exist
+    """
+    now = datetime.utcnow()
+    group = []
+    for txn_id, txn, goal_name in entries:
+        txn_type = txn.get('type') if txn.get('type') in ('expense', 'income') else 'expense'
+        group.append((txn_id, {
+            "type": txn_type,
+            "amount": float(txn['amount']),
+            "category": txn.get('category', 'general').lower(),
+            "description": txn.get('description', ''),
+            "timestamp": now
+        }, goal_name))
+    return await get_backend().add_transaction_group(user_id, group)
+
+
+async def add_transactions(user_id: int, rows: List[Tuple[str, Dict]]) -> int:
     """
-    user_ref = db.collection('users').document(str(user_id))
-    start_date = datetime.utcnow() - timedelta(days=days)
+    Adds a batch of transactions, e.g. the rows of an imported statement.
 
-    # Use keyword arguments to avoid Firestore warning
-    query = user_ref.collection('transactions').where(
-        field_path="timestamp",
-        op_string=">=",
-        value=start_date
-    ).stream()
+    Args:
+        user_id (int): Telegram user ID
+        rows (List[Tuple[str, Dict]]): (txn_id, txn) pairs, each txn with
+            type, amount, category, description and timestamp. A missing
+            timestamp means now.
 
-    transactions = []
-    for doc in query:
-        txn = doc.to_dict()
-        # Ensure each transaction has type, amount, and category
-        txn.setdefault("type", "expense")
-        txn.setdefault("amount", 0.0)
-        txn.setdefault("category", "general")
-        transactions.append(txn)
+    Returns:
+        int: How many transactions were new; IDs already stored are skipped
+    """
+    now = datetime.utcnow()
+    txns = []
+    for txn_id, txn in rows:
+        txn_type = txn.get('type') if txn.get('type') in ('expense', 'income') else 'expense'
+        txns.append((txn_id, {
+            "type": txn_type,
+            "amount": float(txn['amount']),
+            "category": txn.get('category', 'general').lower(),
+            "description": txn.get('description', ''),
+            "timestamp": txn.get('timestamp') or now
+        }))
+    return await get_backend().add_transactions(user_id, txns)
+
+
+async def get_transactions_for_period(user_id: int, days: int = 7,
+                                      fields: Sequence[str] = TXN_FIELDS) -> List[Dict]:
+    """
+    Fetches all transactions for a user in the last `days` days.
 
-    return transactions
+    Args:
+        user_id (int): Telegram user ID
+        days (int): Number of days to look back (default 7)
+        fields (Sequence[str]): Fields to fetch. The description is left
+            out unless asked for.
 
+    Returns:
+        List[Dict]: List of transactions
+    """
+    return await get_backend().get_transactions(user_id, datetime.utcnow() - timedelta(days=days), fields)
 
-async def get_all_transactions(user_id: int) -> List[Dict]:
+
+async def get_all_transactions(user_id: int, fields: Sequence[str] = TXN_FIELDS) -> List[Dict]:
     """
     Fetches all transactions of a user (no time filter).
 
     Args:
         user_id (int): Telegram user ID
+        fields (Sequence[str]): Fields to fetch. The description is left
+            out unless asked for.
 
     Returns:
         List[Dict]: List of all transactions
     """
-    user_ref = db.collection('users').document(str(user_id))
-    query = user_ref.collection('transactions').stream()
+    return await get_backend().get_transactions(user_id, fields=fields)
 
-    transactions = []
-    for doc in query:
-        txn = doc.to_dict()
-        txn.setdefault("type", "expense")
-        txn.setdefault("amount", 0.0)
-        txn.setdefault("category", "general")
-        transactions.append(txn)
 
-    return transactions
+def iter_all_transactions(user_id: int, fields: Sequence[str] = TXN_FIELDS) -> AsyncIterator[Dict]:
+    """
+    Like `get_all_transactions`, but yields the transactions page by page.
+    """
+    return get_backend().iter_transactions(user_id, fields=fields)
 
 
 async def get_balance(user_id: int) -> float:
     """
-    Calculates user's current balance (income - expense).
+    Returns user's current balance (income - expense).
 
     Args:
         user_id (int): Telegram user ID
@@ -94,27 +142,65 @@ async def get_balance(user_id: int) -> float:
     Returns:
         float: Balance amount
     """
-    transactions = await get_all_transactions(user_id)
-    balance = 0.0
-    for txn in transactions:
-        if txn["type"] == "income":
-            balance += txn["amount"]
-        else:
-            balance -= txn["amount"]
-    return balance
+    return await get_backend().get_balance(user_id)
+
+
+async def rebuild_user_aggregates(user_id: int) -> Dict:
+    """
+    Recomputes a user's denormalized aggregates from their full transaction
+    history.
+
+    Args:
+        user_id (int): Telegram user ID
+
+    Returns:
+        Dict: The user's totals (total_income, total_expense, txn_count)
+    """
+    return await get_backend().rebuild_aggregates(user_id)
+
+
+async def get_period_totals(user_id: int, days: int = 7) -> Dict:
+    """
+    Income, expense, transaction count and per-category expense for the
+    last `days` days, today included.
+    """
+    return await get_backend().get_period_totals(user_id, days)
+
+
+async def get_week_totals(user_id: int, week: Optional[str] = None) -> Dict:
+    """
+    Income, expense, transaction count and per-category expense for ISO
+    `week` ("YYYY-Www"), the current one by default.
+    """
+    return await get_backend().get_week_totals(user_id, week or iso_week(datetime.utcnow()))
+
+
+async def check_week_totals(user_id: int, week: Optional[str] = None) -> Dict:
+    """
+    Compares the stored totals of ISO `week` against the raw transactions.
+    The result has both versions and a `consistent` flag.
+    """
+    return await get_backend().check_week_totals(user_id, week or iso_week(datetime.utcnow()))
+
+
+async def get_category_expense(user_id: int, category: str, days: int = 30) -> float:
+    """
+    Expense in one category over the last `days` days, today included.
+    """
+    return await get_backend().get_category_expense(user_id, category.lower(), days)
 
 
 async def get_total_income(user_id: int, days: int = 7) -> float:
     """
     Total income in last `days` days.
     """
-    transactions = await get_transactions_for_period(user_id, days)
-    return sum(txn["amount"] for txn in transactions if txn["type"] == "income")
+    totals = await get_period_totals(user_id, days)
+    return totals["income"]
 
 
 async def get_total_expense(user_id: int, days: int = 7) -> float:
     """
     Total expense in last `days` days.
     """
-    transactions = await get_transactions_for_period(user_id, days)
-    return sum(txn["amount"] for txn in transactions if txn["type"] == "expense")
+    totals = await get_period_totals(user_id, days)
+    return totals["expense"]
@@ -0,0 +1,20 @@
+# app/db/updates.py
+from app.db.backends import get_backend
+from datetime import datetime, timedelta
+
+# Markers only need to outlive Telegram's redelivery window
+MARKER_LIFETIME = timedelta(days=2)
+
+async def claim_update(update_id: int) -> bool:
+    """
+    Records that an update is being processed.
+
+    Returns:
+        bool: True if this is the first time the update was claimed,
+              False if another delivery already claimed it
+    """
+    return await get_backend().claim_update(update_id, datetime.utcnow() + MARKER_LIFETIME)
+
+async def release_update(update_id: int):
+    """Removes the marker so a redelivery of the update is processed again."""
+    await get_backend().release_update(update_id)
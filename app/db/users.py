@@ -1,25 +1,113 @@
 # app/db/users.py
-from app.core.firebase import db
+from app.db.backends import get_backend
+from app.core.cache import TTLCache
+from app.core.summary_slots import summary_slot
 from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
 
-def get_or_create_user(user_id: int, username: str):
-    """Creates a user document if it doesn't exist, otherwise updates last active time."""
-    user_ref = db.collection('users').document(str(user_id))
-    user_doc = user_ref.get()
-    
-    if not user_doc.exists:
-        user_ref.set({
-            'username': username,
-            'created_at': datetime.utcnow(),
-            'last_active': datetime.utcnow()
-        })
+# user_id -> user profile dict for users known to exist. Users are never
+# deleted, so entries only expire to bound memory. The running totals kept
+# by some backends change with every transaction, so read them from the
+# backend, not from this cache.
+_user_cache = TTLCache("users", ttl=24 * 60 * 60)
+
+# user_id -> latest activity time not yet written to storage
+_pending_last_active: Dict[int, datetime] = {}
+_last_flush = datetime.utcnow()
+
+async def get_or_create_user(user_id: int, username: str):
+    """
+    Makes sure the user record exists and records the user as active.
+
+    Users already known to this process cost no storage call at all. For
+    the others a single create doubles as the existence check. The
+    last_active timestamp is coalesced in memory and written by
+    `flush_last_active`.
+    """
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        _pending_last_active[user_id] = datetime.utcnow()
+        return cached
+
+    user = {
+        'username': username,
+        'created_at': datetime.utcnow(),
+        'last_active': datetime.utcnow(),
+        'timezone': None,
+        'summary_slot': summary_slot(user_id)
+    }
+    if await get_backend().create_user(user_id, user):
         print(f"Created new user: {username} ({user_id})")
     else:
-        user_ref.update({'last_active': datetime.utcnow()})
-    
-    return user_ref.get().to_dict()
-
-def get_all_user_ids():
-    """Returns a list of all user IDs from the database."""
-    users_ref = db.collection('users').stream()
-    return [user.id for user in users_ref]
\ No newline at end of file
+        user = {'username': username}
+        _pending_last_active[user_id] = datetime.utcnow()
+
+    _user_cache.set(user_id, user)
+    return user
+
+async def set_timezone(user_id: int, timezone: str):
+    """Stores the user's timezone and moves their summary slot to match it."""
+    await get_backend().update_user(user_id, {
+        'timezone': timezone,
+        'summary_slot': summary_slot(user_id, timezone)
+    })
+    _user_cache.invalidate(user_id)
+
+async def refresh_summary_slot(user_id: int) -> int:
+    """
+    Recomputes the user's summary slot from their stored timezone, e.g. after
+    a daylight saving change or for users created before slots existed.
+    """
+    user = await get_backend().get_user(user_id)
+    slot = summary_slot(user_id, user.get('timezone'))
+    if user.get('summary_slot') != slot:
+        await get_backend().update_user(user_id, {'summary_slot': slot})
+    return slot
+
+async def flush_last_active():
+    """Writes the coalesced last_active timestamps in chunks of up to 500."""
+    global _last_flush
+    _last_flush = datetime.utcnow()
+    if not _pending_last_active:
+        return
+
+    pending = list(_pending_last_active.items())
+    _pending_last_active.clear()
+    for i in range(0, len(pending), 500):
+        chunk = pending[i:i + 500]
+        try:
+            await get_backend().touch_users(chunk)
+        except Exception as e:
+            print(f"Failed to flush last_active for {len(chunk)} users: {e}")
+            # Keep the timestamps for the next flush unless newer ones arrived
+            for user_id, last_active in chunk:
+                _pending_last_active.setdefault(user_id, last_active)
+
+async def flush_last_active_if_due(interval_seconds: float):
+    """
+    Flushes when the last flush is older than `interval_seconds`. Used where
+    no scheduler runs the periodic flush, e.g. in a serverless function.
+    """
+    if (datetime.utcnow() - _last_flush).total_seconds() >= interval_seconds:
+        await flush_last_active()
+
+def iter_user_ids(page_size: int = 500) -> AsyncIterator[str]:
+    """Yields every user ID, reading them page by page."""
+    return get_backend().iter_user_ids(page_size)
+
+def iter_user_ids_pending_summary(week: str, page_size: int = 500,
+                                  slots: Optional[Tuple[int, int]] = None,
+                                  due: Optional[Tuple[int, int]] = None) -> AsyncIterator[str]:
+    """
+    Yields the IDs of users whose summary for ISO `week` hasn't been sent yet,
+    optionally only those in the shard slot range `slots` and the summary
+    slot range `due`.
+
+    Users are read in pages, so a slow consumer never holds a long-lived
+    stream open.
+    """
+    return get_backend().iter_user_ids_pending_summary(week, page_size, slots, due)
+
+async def mark_summaries_sent(user_ids: Iterable[str], week: str):
+    """Checkpoints that the summary for ISO `week` was delivered to `user_ids`."""
+    await get_backend().mark_summaries_sent(list(user_ids), week)
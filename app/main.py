@@ -1,23 +1,51 @@
 # app/main.py
-import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from contextlib import asynccontextmanager
 
-from app.api.telegram_webhook import router as telegram_router
-from app.bot_setup import set_telegram_webhook, clear_telegram_webhook
-from app.core.scheduler import start_scheduler, scheduler
+from app.api.export import router as export_router
+from app.api.telegram_webhook import router as telegram_router, update_queue
+from app.bot_setup import close_bot, clear_telegram_webhook, prewarm_bot_connections, set_telegram_webhook
+from app.core import metrics
+from app.core.config import settings
+from app.db.backends import close_backend
+from app.db.users import flush_last_active
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Runs on application startup
     print("Starting up...")
+    if settings.SERVERLESS:
+        # A function instance is frozen between requests, so background work
+        # and webhook teardown are out; the weekly summaries need a
+        # long-running deployment. Checking the webhook would start the
+        # storage client on every cold start, so it is registered once per
+        # deploy with `python -m app.bot_setup` instead. The platform may
+        # stop an instance without running the cleanup below, so it is best
+        # effort: last_active times not yet flushed can be lost.
+        yield
+        await flush_last_active()
+        await close_backend()
+        await close_bot()
+        return
+
     await set_telegram_webhook()
+    # Imported here so serverless cold starts don't load APScheduler
+    from app.core.scheduler import start_scheduler, scheduler
     start_scheduler()
+    if settings.BOT_PREWARM_CONNECTIONS:
+        await prewarm_bot_connections(settings.BOT_PREWARM_CONNECTIONS)
+    if settings.WEBHOOK_QUEUE_ENABLED:
+        update_queue.start()
     yield
     # Runs on application shutdown
     print("Shutting down...")
     await clear_telegram_webhook()
+    # Finish the updates we already acknowledged before tearing anything down
+    await update_queue.drain(settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT)
     scheduler.shutdown()
+    await flush_last_active()
+    await close_backend()
+    await close_bot()
 
 app = FastAPI(
     title="AI Personal Finance Mentor Bot",
@@ -26,11 +54,20 @@ app = FastAPI(
 )
 
 app.include_router(telegram_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
 
 @app.get("/", tags=["Root"])
 def read_root():
     return {"message": "Finance Mentor Bot is running!"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint; 404 unless METRICS_ENABLED is set."""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     # For local development
+    import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
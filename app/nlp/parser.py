@@ -1,5 +1,5 @@
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 INTENT_KEYWORDS = {
     'expense': ['spent', 'paid', 'bought', 'expense', 'cost', 'purchase'],
@@ -7,28 +7,88 @@ INTENT_KEYWORDS = {
     'summary': ['summary', 'report', 'how much', 'show expenses', 'show income'],
     'balance': ['balance', 'remaining', 'how much money left'],
     'help': ['/help', 'help'],
-    'start': ['/start']
+    'start': ['/start'],
+    'timezone': ['timezone', '/timezone'],
+    # Only the command, so "imported" in a purchase stays in its category
+    'import': ['/import'],
+    'export': ['/export', 'export']
 }
 
 STOP_WORDS = {'on', 'for', 'at', 'a', 'the', 'my', 'i', 'in', 'of', 'was', 'is'}
 
 # FIXED: handles "1000000", "1,000,000", "₹1000000", "₹ 1,000,000.50"
 AMOUNT_REGEX = r'₹?\s?((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{1,2})?)'
+AMOUNT_PATTERN = re.compile(AMOUNT_REGEX)
+
+# Ranked keyword scanning in a single match() call. Each alternative looks for
+# one intent's keywords anywhere in the text and the regex engine only falls
+# through to the next intent when none of them occur, which keeps the
+# priority order of INTENT_KEYWORDS. The last alternative is the "any amount"
+# fallback. The name of the group that matched is the intent.
+_INTENT_SCANNER = re.compile(
+    '|'.join(
+        f'.*?(?P<{intent}>' + '|'.join(re.escape(kw) for kw in keywords) + ')'
+        for intent, keywords in INTENT_KEYWORDS.items()
+    ) + '|.*?(?P<amount>' + AMOUNT_REGEX + ')',
+    re.DOTALL
+)
+# Where a multi-transaction message may be split: new lines, ";" or ","
+# followed by whitespace (never the "," in "1,000" or "3,50"), and " and "
+_ENTRY_SEPARATOR = re.compile(r'(\n|[;,](?=\s)| and )', re.IGNORECASE)
+# "on 2 pens and 3 books" is one category phrase, not two entries
+_CATEGORY_PHRASE = re.compile(r'\b(?:on|for|at|in)\b')
+# "... and 120 on bus" starts a phrase of its own
+_STARTS_WITH_AMOUNT_PHRASE = re.compile(r'\s*' + AMOUNT_REGEX + r'\s+(?:on|for|at|in)\b')
+MAX_ENTRIES = 50
+
+_INCOME_KEYWORDS = re.compile('|'.join(re.escape(kw) for kw in INTENT_KEYWORDS['income']))
+_TYPE_KEYWORDS = re.compile('|'.join(re.escape(kw) for kw in INTENT_KEYWORDS['expense'] + INTENT_KEYWORDS['income']))
+_STARTS_WITH_TYPE_KEYWORD = re.compile(r'\s*(?:' + _TYPE_KEYWORDS.pattern + r')\b')
+# Commands added after the original keyword table. Their words stay in a
+# transaction's category, so "spent 50 on export fees" keeps "export fees"
+COMMAND_INTENTS = ('timezone', 'import', 'export')
+_KEYWORDS = [kw for intent, kw_list in INTENT_KEYWORDS.items() if intent not in COMMAND_INTENTS for kw in kw_list]
 
 
 def get_intent(text: str) -> str:
     text_lower = text.lower()
+    match = _INTENT_SCANNER.match(text_lower)
+    if match is None:
+        return 'unknown'
+    if match.lastgroup in COMMAND_INTENTS and match.start(match.lastgroup) != len(text_lower) - len(text_lower.lstrip()):
+        # A command word inside a message ("50 on export fees") isn't the
+        # command. Every older intent ranks above the commands, so none of
+        # their keywords occur and only the amount fallback is left.
+        return 'expense' if AMOUNT_PATTERN.search(text_lower) else 'unknown'
+    # If there is only a number, default to expense
+    return 'expense' if match.lastgroup == 'amount' else match.lastgroup
+
+
+# Only get_intent uses the combined scanner. Pulling the amount and the
+# keyword spans out of one finditer() pass over the same alternation was
+# measured on benchmarks/parser_bench at about 0.8x of the separate
+# searches below: each token then costs a Python-level step, while the
+# amount search and the `in` checks run in C and skip absent keywords.
+def _category_text(text_lower: str, match) -> str:
+    # Remove the matched amount token (match.group(0) includes currency symbol)
+    category_text = text_lower.replace(match.group(0), '')
+
+    # Remove intent-related keywords (the membership test is much cheaper
+    # than a replace that finds nothing)
+    for kw in _KEYWORDS:
+        if kw in category_text:
+            category_text = category_text.replace(kw, '')
 
-    # Ranked keyword scanning
-    for intent, keywords in INTENT_KEYWORDS.items():
-        if any(keyword in text_lower for keyword in keywords):
-            return intent
+    # Clean stopwords (token-based)
+    tokens = [t for t in category_text.split() if t not in STOP_WORDS]
+    return " ".join(tokens).strip()
 
-    # If there is a number, default to expense
-    if re.search(AMOUNT_REGEX, text_lower):
-        return 'expense'
 
-    return 'unknown'
+def _is_entry(piece: str) -> bool:
+    """Whether `piece` has an amount and a category word of its own."""
+    piece_lower = piece.lower()
+    match = AMOUNT_PATTERN.search(piece_lower)
+    return bool(match) and re.search('[a-z]', _category_text(piece_lower, match)) is not None
 
 
 def parse_transaction_message(text: str) -> Optional[Dict[str, Any]]:
@@ -36,28 +96,17 @@ def parse_transaction_message(text: str) -> Optional[Dict[str, Any]]:
     text_lower = text.lower()
 
     # Determine transaction type
-    txn_type = 'income' if any(k in text_lower for k in INTENT_KEYWORDS['income']) else 'expense'
+    txn_type = 'income' if _INCOME_KEYWORDS.search(text_lower) else 'expense'
 
     # Extract amount
-    match = re.search(AMOUNT_REGEX, text_lower)
+    match = AMOUNT_PATTERN.search(text_lower)
     if not match:
         return None
 
     raw_amount = match.group(1)
     amount = float(raw_amount.replace(',', ''))
 
-    # Remove the matched amount token (match.group(0) includes currency symbol)
-    category_text = text_lower.replace(match.group(0), '')
-
-    # Remove intent-related keywords
-    for kw_list in INTENT_KEYWORDS.values():
-        for kw in kw_list:
-            category_text = category_text.replace(kw, '')
-
-    # Clean stopwords (token-based)
-    tokens = [t for t in category_text.split() if t not in STOP_WORDS]
-    category = " ".join(tokens).strip()
-
+    category = _category_text(text_lower, match)
     if not category:
         category = "general"
 
@@ -67,3 +116,57 @@ def parse_transaction_message(text: str) -> Optional[Dict[str, Any]]:
         'category': category,
         'description': text
     }
+
+
+def parse_transactions(text: str) -> List[Dict[str, Any]]:
+    """
+    Extracts every transaction from a message such as "spent 50 on tea, 120
+    on bus, 300 on books", or one entry per line.
+
+    A message is only split between pieces that each have an amount and a
+    category word of their own, so "spent 3,50 on tea", "spent 50, 60 on
+    tea" and "50 on bread and butter" stay one entry. " and " inside an
+    "on/for/at/in ..." phrase doesn't split either ("spent 100 on 2 pens
+    and 3 books"), unless an income/expense keyword follows it ("... and
+    got 500 from mom") or an amount with a phrase of its own does ("... and
+    120 on bus"). An entry without its own income/expense keyword takes the
+    type of the one before it. A message that isn't split parses exactly
+    like parse_transaction_message. At most MAX_ENTRIES are returned.
+    """
+    pieces = _ENTRY_SEPARATOR.split(text)
+    if len(pieces) == 1:
+        parsed = parse_transaction_message(text)
+        return [parsed] if parsed else []
+
+    entries: List[str] = []
+    current = pieces[0]
+    for separator, piece in zip(pieces[1::2], pieces[2::2]):
+        boundary = _is_entry(current) and _is_entry(piece)
+        if boundary and separator.lower() == ' and ':
+            piece_lower = piece.lower()
+            boundary = (
+                not _CATEGORY_PHRASE.search(current.lower())
+                or bool(_STARTS_WITH_TYPE_KEYWORD.match(piece_lower))
+                or bool(_STARTS_WITH_AMOUNT_PHRASE.match(piece_lower))
+            )
+        if boundary:
+            entries.append(current)
+            current = piece
+        else:
+            current += separator + piece
+    entries.append(current)
+
+    if len(entries) == 1:
+        parsed = parse_transaction_message(text)
+        return [parsed] if parsed else []
+
+    transactions = []
+    last_type = None
+    for entry in entries:
+        # ", and" leaves the comma on the entry before it
+        parsed = parse_transaction_message(entry.strip().rstrip(',;').rstrip())
+        if last_type and not _TYPE_KEYWORDS.search(entry.lower()):
+            parsed['type'] = last_type
+        last_type = parsed['type']
+        transactions.append(parsed)
+    return transactions[:MAX_ENTRIES]
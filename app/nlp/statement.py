@@ -0,0 +1,203 @@
+# app/nlp/statement.py
+"""
+Reads transactions out of a CSV statement, one row at a time.
+
+Bank exports usually have a few preamble lines, then a header row naming
+columns such as Date, Narration, Withdrawal Amt. and Deposit Amt. The
+first row within HEADER_SCAN_ROWS that names a date and an amount column
+(or debit/credit columns) is taken as the header. Files without one are
+read like chat messages: each row is joined into a line of text and run
+through parse_transaction_message, so "12/03/2024,spent 250 on groceries"
+works as well as a bank export.
+
+Amounts go through the same AMOUNT_REGEX as chat messages, so "₹1,250.50"
+and "1250.5" both parse.
+"""
+import csv
+import functools
+import itertools
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from app.nlp.parser import AMOUNT_PATTERN, INTENT_KEYWORDS, STOP_WORDS, parse_transaction_message
+
+HEADER_SCAN_ROWS = 30
+
+COLUMN_ALIASES = {
+    'date': {'date', 'txn date', 'transaction date', 'value date', 'posting date', 'tran date'},
+    'description': {'description', 'narration', 'details', 'particulars', 'remarks', 'memo',
+                    'transaction details', 'transaction remarks'},
+    'category': {'category'},
+    'amount': {'amount', 'transaction amount', 'amount inr', 'amt'},
+    'debit': {'debit', 'withdrawal', 'withdrawal amt', 'withdrawal amount', 'debit amount', 'dr', 'paid out'},
+    'credit': {'credit', 'deposit', 'deposit amt', 'deposit amount', 'credit amount', 'cr', 'paid in'},
+    'type': {'type', 'dr/cr', 'cr/dr', 'transaction type', 'debit/credit'},
+}
+
+# Statements are mostly day-first; month-first is tried after
+DATE_FORMATS = (
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y',
+    '%d %b %Y', '%d-%b-%Y', '%d %b %y', '%d-%b-%y', '%d %B %Y', '%b %d, %Y', '%m/%d/%Y',
+)
+
+_TRAILING_TIME = re.compile(r'\s+\d{1,2}:\d{2}(:\d{2})?(\s*[ap]m)?$', re.IGNORECASE)
+
+# Words in bank narrations that say how money moved, not what it was for
+NARRATION_NOISE = {
+    'upi', 'neft', 'imps', 'rtgs', 'pos', 'atm', 'ach', 'nach', 'cr', 'dr', 'txn', 'ref', 'to', 'from', 'by'
+}
+_NOT_CATEGORY = STOP_WORDS | NARRATION_NOISE | {kw for kws in INTENT_KEYWORDS.values() for kw in kws}
+_INCOME_TYPES = {'cr', 'credit', 'income', 'deposit', 'c'}
+
+
+def _column(header: str) -> Optional[str]:
+    # "Withdrawal Amt. (INR)" -> "withdrawal amt inr"
+    name = " ".join(re.sub(r'[^a-z/ ]+', ' ', header.lower()).split())
+    for column, aliases in COLUMN_ALIASES.items():
+        if name in aliases:
+            return column
+    return None
+
+
+def _header(row) -> Optional[Dict[str, int]]:
+    columns = {}
+    for index, cell in enumerate(row):
+        column = _column(cell)
+        if column and column not in columns:
+            columns[column] = index
+    if 'date' in columns and ('amount' in columns or 'debit' in columns or 'credit' in columns):
+        return columns
+    return None
+
+
+def parse_date(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        if parsed.tzinfo is not None:
+            return parsed.replace(tzinfo=None) - parsed.utcoffset()
+        # Midday for bare dates, so the calendar day survives conversion
+        # to any timezone
+        return parsed if len(value) > 10 else parsed.replace(hour=12)
+    # Drop a trailing time, e.g. "12/03/2024 10:15:00" or "12 Mar 2024 10:15 AM"
+    date_part = _TRAILING_TIME.sub('', value)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_part, fmt).replace(hour=12)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """Absolute amount in `value`, or None if it has none."""
+    match = AMOUNT_PATTERN.search(value.strip().lower())
+    if not match:
+        return None
+    return float(match.group(1).replace(',', ''))
+
+
+def _is_negative(value: str) -> bool:
+    value = value.strip()
+    return value.startswith('-') or value.startswith('(') or value.lower().endswith('dr')
+
+
+def category_from_description(text: str, max_words: int = 2) -> str:
+    """
+    Category for a statement narration, e.g. "UPI/40213/SWIGGY BANGALORE/Food"
+    -> "swiggy bangalore": its first alphabetic words that aren't stop words,
+    intent keywords or payment-rail noise.
+    """
+    words = []
+    for token in re.split(r'[^a-z]+', text.lower()):
+        if len(token) > 1 and token not in _NOT_CATEGORY:
+            words.append(token)
+            if len(words) == max_words:
+                break
+    return " ".join(words) or "general"
+
+
+def _cell(row, columns: Dict[str, int], column: str) -> str:
+    index = columns.get(column)
+    return row[index] if index is not None and index < len(row) else ""
+
+
+def parse_row(row, columns: Dict[str, int]) -> Optional[Dict]:
+    """A transaction dict for a data row under `columns`, or None if it has no amount."""
+    debit, credit = _cell(row, columns, 'debit'), _cell(row, columns, 'credit')
+    debit_amount, credit_amount = parse_amount(debit), parse_amount(credit)
+    description = _cell(row, columns, 'description').strip()
+
+    if debit_amount:
+        txn_type, amount = 'expense', debit_amount
+    elif credit_amount:
+        txn_type, amount = 'income', credit_amount
+    else:
+        raw = _cell(row, columns, 'amount')
+        amount = parse_amount(raw)
+        if not amount:
+            return None
+        kind = _cell(row, columns, 'type').strip().lower()
+        if kind:
+            txn_type = 'income' if kind in _INCOME_TYPES else 'expense'
+        elif _is_negative(raw):
+            txn_type = 'expense'
+        elif raw.strip().startswith('+'):
+            txn_type = 'income'
+        else:
+            # Unsigned amounts read like a chat message would
+            txn_type = parse_transaction_message(f"{description} {amount}")['type']
+
+    category = _cell(row, columns, 'category').strip().lower() or category_from_description(description)
+    return {
+        'type': txn_type,
+        'amount': amount,
+        'category': category,
+        'description': description or category,
+        'timestamp': parse_date(_cell(row, columns, 'date')),
+    }
+
+
+def _parse_line(row) -> Optional[Dict]:
+    # Headerless files: a leading date cell, if any, and the rest as a message
+    cells = [cell.strip() for cell in row if cell.strip()]
+    timestamp = parse_date(cells[0]) if cells else None
+    if timestamp is not None:
+        cells = cells[1:]
+    parsed = parse_transaction_message(" ".join(cells))
+    if parsed is None:
+        return None
+    return {**parsed, 'timestamp': timestamp}
+
+
+def iter_statement(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """
+    Yields (row number, transaction) for every data row of a CSV statement,
+    with None for rows that hold no transaction. Transactions without a
+    readable date get timestamp None. Reads `lines` lazily, so a file object
+    is streamed rather than loaded.
+    """
+    reader = csv.reader(lines)
+    preamble = []
+    columns = None
+    for row in reader:
+        preamble.append(row)
+        columns = _header(row)
+        if columns is not None or len(preamble) == HEADER_SCAN_ROWS:
+            break
+
+    if columns is None:
+        # No header: every row, the scanned ones included, reads as a message
+        rows, first, parse = itertools.chain(preamble, reader), 1, _parse_line
+    else:
+        rows, first, parse = reader, len(preamble) + 1, functools.partial(parse_row, columns=columns)
+
+    for number, row in enumerate(rows, first):
+        if any(cell.strip() for cell in row):
+            yield number, parse(row)
@@ -1,17 +1,31 @@
 from app.db import transactions as txn_db
 from app.db import budgets as budget_db
 from app.db import goals as goal_db
+from app.db import users as user_db
+from app.core.config import settings
+from app.core.summary_slots import valid_timezone
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+import time
 
-async def process_transaction(user_id: int, text: str) -> str:
+async def process_transaction(user_id: int, text: str, update_id: Optional[int] = None) -> str:
     """
     Process a transaction message (income or expense) using the NLP parser.
+
+    A message can log several transactions at once ("spent 50 on tea, 120
+    on bus"); they are committed together and answered with one reply.
+
+    When `update_id` is given, the transaction ID is derived from it, so a
+    redelivered update is recognised and none of its side effects repeat.
     """
-    from app.nlp.parser import parse_transaction_message
+    from app.nlp.parser import parse_transactions
 
-    parsed = parse_transaction_message(text)  # no txn_type argument
-    if not parsed:
+    entries = parse_transactions(text)
+    if not entries:
         return "Could not parse the transaction. Please include an amount."
+    if len(entries) > 1:
+        return await _process_transactions(user_id, entries, update_id)
+    parsed = entries[0]
 
     amount = parsed['amount']
     category = parsed.get('category', 'general')
@@ -19,22 +33,24 @@ async def process_transaction(user_id: int, text: str) -> str:
     txn_type = parsed['type']
 
     try:
-        # Add transaction to DB
-        txn_db.add_transaction(user_id, amount, category, description, txn_type)
+        # Everything that can be decided up front comes from cached lookups,
+        # so logging the transaction, its aggregates and the goal progress is
+        # a single commit. A retry either replays all of it or none of it.
+        txn_id = f"tg-{update_id}" if update_id is not None else None
+        goal = await goal_db.find_goal(user_id, category) if txn_type == 'expense' else None
+        goal_name = goal['goal_name'] if goal else None
+        if not await txn_db.add_transaction(user_id, amount, category, description, txn_type, txn_id, goal_name):
+            return f"Already logged this {txn_type} of ₹{amount:.2f}."
 
-        # Update goals if expense
         if txn_type == 'expense':
-            all_goals = goal_db.get_all_goals(user_id)
-            for goal in all_goals:
-                if goal['goal_name'].lower() == category:
-                    goal_db.update_goal_progress(user_id, category, amount)
+            if goal_name:
+                goal_db.record_cached_progress(user_id, goal_name, amount)
 
-            # Check budget
-            budget = budget_db.get_budget(user_id, category)
+            # Check budget; the spend is only read when there is a budget
+            budget = await budget_db.get_budget(user_id, category)
             response = f"Logged {amount} in {category}."
             if budget:
-                txns = await txn_db.get_transactions_for_period(user_id, days=30)
-                spent = sum(t['amount'] for t in txns if t['category'] == category.lower())
+                spent = await txn_db.get_category_expense(user_id, category, days=30)
                 if spent > budget['amount']:
                     response += f" ⚠️ You've exceeded your {category} budget of {budget['amount']}!"
             else:
@@ -49,6 +65,46 @@ async def process_transaction(user_id: int, text: str) -> str:
         return f"Failed to log transaction: {e}"
 
 
+async def _process_transactions(user_id: int, entries: List[Dict], update_id: Optional[int]) -> str:
+    try:
+        # The first entry keeps the single-transaction ID, so the ID of any
+        # entry only depends on the update and its position
+        group = []
+        for index, txn in enumerate(entries):
+            txn_id = None
+            if update_id is not None:
+                txn_id = f"tg-{update_id}" if index == 0 else f"tg-{update_id}-{index}"
+            goal = await goal_db.find_goal(user_id, txn['category']) if txn['type'] == 'expense' else None
+            group.append((txn_id, txn, goal['goal_name'] if goal else None))
+        if not await txn_db.add_transaction_group(user_id, group):
+            return f"Already logged these {len(entries)} transactions."
+
+        totals = {'expense': 0.0, 'income': 0.0}
+        lines = [f"Logged {len(entries)} transactions:"]
+        for _, txn, goal_name in group:
+            if goal_name:
+                goal_db.record_cached_progress(user_id, goal_name, txn['amount'])
+            totals[txn['type']] += txn['amount']
+            lines.append(f"• {txn['type']} of ₹{txn['amount']:.2f} in '{txn['category']}'")
+        lines.append(" | ".join(f"Total {txn_type}: ₹{amount:.2f}" for txn_type, amount in totals.items() if amount))
+
+        # One budget check for the whole message: the cached budgets of the
+        # categories it spent in, and a single read of the 30-day totals
+        # if any of them has one
+        categories = list(dict.fromkeys(txn['category'] for _, txn, _ in group if txn['type'] == 'expense'))
+        budgets = [(category, await budget_db.get_budget(user_id, category)) for category in categories]
+        budgets = [(category, budget) for category, budget in budgets if budget]
+        if budgets:
+            spent = (await txn_db.get_period_totals(user_id, days=30))['categories']
+            for category, budget in budgets:
+                if spent.get(category, 0.0) > budget['amount']:
+                    lines.append(f"⚠️ You've exceeded your {category} budget of {budget['amount']}!")
+        return "\n".join(lines)
+
+    except Exception as e:
+        return f"Failed to log transactions: {e}"
+
+
 def get_start_message() -> str:
     return (
         "Welcome to Finance Mentor Bot by Anish! 💰\n\n"
@@ -59,13 +115,85 @@ def get_start_message() -> str:
     )
 
 
+async def set_timezone(user_id: int, text: str) -> str:
+    """
+    Handles "timezone <IANA name>", e.g. "timezone Europe/London", which moves
+    the user's weekly summary to Sunday evening in that timezone.
+    """
+    words = text.split()
+    name = words[-1] if len(words) > 1 else ""
+    if not valid_timezone(name):
+        return "Please send your timezone like `timezone Asia/Kolkata` or `timezone Europe/London`."
+    await user_db.set_timezone(user_id, name)
+    return f"Timezone set to {name}. Your weekly summary will arrive on Sundays at {settings.SUMMARY_LOCAL_TIME} your time."
+
+
+async def import_statement(user_id: int, lines: Iterable[str], import_id: str,
+                           progress: Optional[Callable[[str], Awaitable]] = None) -> str:
+    """
+    Imports the transactions of a CSV statement read lazily from `lines`.
+
+    Rows are written IMPORT_BATCH_ROWS at a time, so memory doesn't grow
+    with the file. Each row's transaction ID is derived from `import_id`
+    and its row number, so sending the same file again, e.g. after an
+    interrupted import, skips the rows already stored. `progress` is
+    awaited with a status line every IMPORT_PROGRESS_SECONDS.
+    """
+    from app.nlp.statement import iter_statement
+
+    added = existing = unreadable = 0
+    batch = []
+    last_report = time.monotonic()
+
+    async def write_batch():
+        nonlocal added, existing
+        new = await txn_db.add_transactions(user_id, batch)
+        added += new
+        existing += len(batch) - new
+        batch.clear()
+
+    for row_number, txn in iter_statement(lines):
+        if txn is None:
+            unreadable += 1
+            continue
+        batch.append((f"{import_id}-{row_number}", txn))
+        if len(batch) >= settings.IMPORT_BATCH_ROWS:
+            await write_batch()
+            if progress and time.monotonic() - last_report >= settings.IMPORT_PROGRESS_SECONDS:
+                await progress(f"📥 Importing your statement… {added + existing:,} rows so far.")
+                last_report = time.monotonic()
+    if batch:
+        await write_batch()
+
+    if not added and not existing:
+        return "Couldn't find any transactions in that file. Send a CSV with a date and an amount on each row."
+    reply = [f"✅ Imported {added:,} transactions."]
+    if existing:
+        reply.append(f"{existing:,} were already imported and were skipped.")
+    if unreadable:
+        reply.append(f"{unreadable:,} rows had no amount and were ignored.")
+    return "\n".join(reply)
+
+
+def get_import_help() -> str:
+    return (
+        "Send your bank statement or a spreadsheet export as a .csv file to import it. "
+        "Rows need a date and an amount, or a debit and credit column. "
+        "Rows like 'spent 50 on groceries' work too."
+    )
+
+
 def get_help_message() -> str:
     return (
         "Here’s what I can do:\n"
         "- Log an expense: 'spent 50 on groceries'\n"
+        "- Log several at once: 'spent 50 on tea, 120 on bus, 300 on books'\n"
         "- Show weekly summary: 'summary'\n"
         "- Set a budget: 'set budget 200 for groceries'\n"
         "- Set a goal: 'set goal vacation 500'\n"
+        "- Set your timezone for the weekly summary: 'timezone Europe/London'\n"
+        "- Import past transactions: send a CSV statement\n"
+        "- Export your history: 'export', 'export json' or 'export 2024-01-01 2024-03-31'\n"
         "- Check your budgets or goals anytime!"
     )
 
@@ -75,27 +203,28 @@ from app.db import transactions as txn_db
 from datetime import datetime, timedelta
 from collections import defaultdict
 
-async def generate_weekly_summary(user_id: int) -> str:
+async def generate_weekly_summary(user_id: int, week: Optional[str] = None) -> str:
     """
     Generate a weekly summary for a user, showing income, expenses, net balance, and expense breakdown.
+
+    The "summary" command covers the last 7 days, today included. The
+    scheduled summary passes ISO `week` and renders the totals kept for
+    that week. Both read totals that are updated with every transaction,
+    so nothing is re-aggregated.
     """
     try:
-        txns = await txn_db.get_transactions_for_period(user_id, days=7)
-        if not txns:
+        if week is None:
+            totals = await txn_db.get_period_totals(user_id, days=7)
+        else:
+            totals = await txn_db.get_week_totals(user_id, week)
+        if not totals['count']:
             return "No transactions in the past week."
 
-        total_income = 0.0
-        total_expense = 0.0
+        total_income = totals['income']
+        total_expense = totals['expense']
         expense_breakdown = defaultdict(float)
-
-        for t in txns:
-            amount = t['amount']
-            category = t.get('category', 'general').title()
-            if t['type'] == 'income':
-                total_income += amount
-            else:
-                total_expense += amount
-                expense_breakdown[category] += amount
+        for category, amount in totals['categories'].items():
+            expense_breakdown[category.title()] += amount
 
         net = total_income - total_expense
 
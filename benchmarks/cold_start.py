@@ -0,0 +1,123 @@
+# benchmarks/cold_start.py
+"""
+Measures what a serverless cold start costs: the import time of the Vercel
+entry point (api/index.py) and the time from process start to the first
+answered webhook.
+
+Each run starts a fresh interpreter. Imports are timed with `-X importtime`,
+and the heaviest modules of the last run are listed so a new eager import
+is easy to spot. The first response is timed against a uvicorn process
+serving api.index:app, with the Bot API replaced by benchmarks.fake_bot_api
+and data going to the Firestore emulator or a scratch SQLite file:
+
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.cold_start
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.cold_start --runs 5
+
+With --max-import-ms the script exits non-zero when the median import time
+exceeds the budget, so it can guard against regressions in CI.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_bot_api import create_fake_bot_api, serve_in_thread
+from benchmarks.reply_modes import BASE_USER_ID, make_update
+
+ENTRY_POINT = "api.index"
+
+
+def import_profile() -> tuple:
+    """Imports the entry point in a fresh interpreter; returns (total µs, [(self µs, module)])."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_POINT}"],
+        capture_output=True, text=True, check=True
+    )
+    total, modules = 0, []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        modules.append((int(self_us), name.strip()))
+        if name.strip() == ENTRY_POINT:
+            total = int(cumulative)
+    return total, modules
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response(env: dict, update_id: int) -> float:
+    """Starts the app and returns the seconds until it answered a webhook."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{ENTRY_POINT}:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        update = make_update(update_id, BASE_USER_ID, "balance")
+        while True:
+            try:
+                response = httpx.post(f"http://127.0.0.1:{port}/api/telegram", json=update, timeout=10)
+                response.raise_for_status()
+                return time.perf_counter() - start
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError("the app exited before answering")
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=10, help="heaviest modules to list")
+    arg_parser.add_argument("--port", type=int, default=8765, help="fake Bot API port")
+    arg_parser.add_argument("--max-import-ms", type=float, help="fail above this median import time")
+    args = arg_parser.parse_args()
+
+    fake = create_fake_bot_api()
+    serve_in_thread(fake, args.port)
+    env = {
+        **os.environ,
+        "SERVERLESS": "true",
+        "TELEGRAM_API_BASE_URL": f"http://127.0.0.1:{args.port}/bot",
+    }
+
+    imports, modules = [], []
+    for _ in range(args.runs):
+        total, modules = import_profile()
+        imports.append(total / 1000)
+    print(f"import {ENTRY_POINT}: median {statistics.median(imports):.0f} ms, "
+          f"min {min(imports):.0f} ms over {args.runs} runs")
+    print("heaviest modules (self time):")
+    for self_us, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:>7.1f} ms  {name}")
+
+    firsts = [first_response(env, int(time.time() * 1000) + i) for i in range(args.runs)]
+    print(f"first webhook response: median {statistics.median(firsts) * 1000:.0f} ms, "
+          f"min {min(firsts) * 1000:.0f} ms")
+    # Cold starts leave the webhook alone, so no setWebhook calls here
+    print(f"Bot API calls: {dict(sorted(fake.state.calls.items()))}")
+
+    if args.max_import_ms is not None and statistics.median(imports) > args.max_import_ms:
+        print(f"FAIL: import time over the {args.max_import_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
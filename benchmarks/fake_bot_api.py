@@ -0,0 +1,105 @@
+# benchmarks/fake_bot_api.py
+"""
+A stand-in for the Telegram Bot API that answers every method after a
+configurable delay. Point the bot at it with
+
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:<port>/bot
+
+so benchmarks never talk to Telegram or message real chats. Files put in
+`app.state.files` (file_id -> bytes) are served by getFile and the file
+download route, for which the bot needs
+
+    TELEGRAM_API_FILE_URL=http://127.0.0.1:<port>/file/bot
+
+GET /calls returns the number of calls per method so far. To keep the fake
+out of the process being measured, run it on its own:
+
+    python -m benchmarks.fake_bot_api --port 8765 --latency 0.08
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from urllib.parse import parse_qs
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+
+def create_fake_bot_api(latency: float = 0.0) -> FastAPI:
+    """Returns an app answering `/bot<token>/<method>` with a plausible result."""
+    fake = FastAPI()
+    message_ids = itertools.count(1)
+    fake.state.calls = {}
+    fake.state.files = {}
+
+    @fake.post("/bot{token}/{method}")
+    async def call(token: str, method: str, request: Request):
+        fake.state.calls[method] = fake.state.calls.get(method, 0) + 1
+        if latency:
+            await asyncio.sleep(latency)
+
+        raw = await request.body()
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            params = json.loads(raw or b"{}")
+        elif content_type.startswith("application/x-www-form-urlencoded"):
+            params = {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+        else:
+            params = {}
+
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            result = {
+                "file_id": file_id,
+                "file_unique_id": f"u-{file_id}",
+                "file_size": len(fake.state.files.get(file_id, b"")),
+                "file_path": f"documents/{file_id}",
+            }
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method.startswith("send") or method.startswith("edit"):
+            result = {
+                "message_id": next(message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return {"ok": True, "result": result}
+
+    @fake.get("/file/bot{token}/documents/{file_id}")
+    async def download(token: str, file_id: str):
+        if file_id not in fake.state.files:
+            return Response(status_code=404)
+        return Response(fake.state.files[file_id], media_type="application/octet-stream")
+
+    @fake.get("/calls")
+    async def calls():
+        return fake.state.calls
+
+    return fake
+
+
+def serve_in_thread(app: FastAPI, port: int, **config) -> uvicorn.Server:
+    """
+    Runs `app` on 127.0.0.1:`port` in a daemon thread and waits until it
+    accepts requests. Extra keyword arguments go to uvicorn.Config.
+    """
+    config.setdefault("log_level", "warning")
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, **config))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--latency", type=float, default=0.08, help="seconds before each answer")
+    args = arg_parser.parse_args()
+    uvicorn.run(create_fake_bot_api(args.latency), host="127.0.0.1", port=args.port, log_level="warning")
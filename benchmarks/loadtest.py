@@ -0,0 +1,276 @@
+# benchmarks/loadtest.py
+"""
+Replays synthetic Telegram traffic against the FastAPI app and reports
+throughput, webhook latency and the storage and Bot API calls it costs.
+
+Updates are drawn from a configurable mix of expenses, incomes, summaries,
+balance checks and help requests. They come from many users, a few of whom
+send most of the traffic, and are posted to /api/telegram either in-process
+(ASGI) or over localhost through uvicorn. Nothing leaves the machine:
+
+    Bot API   benchmarks.fake_bot_api with --bot-rtt latency, in a thread of
+              this process, or one already running at --bot-api
+    storage   a scratch SQLite file wrapped to add --db-rtt latency to every
+              call, standing in for Firestore round trips; --storage configured
+              uses the STORAGE_BACKEND from the environment instead (e.g. the
+              Firestore emulator)
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --messages 20000 --concurrency 200 --db-rtt 0.03
+    python -m benchmarks.loadtest --rate 300 --transport http --reply-in-webhook
+    python -m benchmarks.loadtest --mix expense=80,balance=20
+
+With --rate, updates arrive at that many per second whether or not earlier
+ones were answered (open loop, like Telegram). Otherwise --concurrency
+clients each send their next update once the last one was answered.
+
+Where every reply is a separate sendMessage, throughput is bound by the
+CPU each send costs, not by waiting on Telegram. On a 1-CPU machine the
+default run tops out around 70-80 msg/s, against several hundred with
+--reply-in-webhook. The bot's client spends about 8 ms of CPU per send,
+half of it in httpcore's pool bookkeeping, which re-checks every pooled
+connection whenever a request is queued or finishes. The fake server
+adds about 1 ms. The pool is never too small for the load: PTB's default
+is 256 connections, and raising BOT_POOL_SIZE from 32 to 256 makes the
+run slower, not faster. Running the fake in its own process keeps its
+share out of the app's event loop:
+
+    python -m benchmarks.fake_bot_api --port 8765 --latency 0.08 &
+    python -m benchmarks.loadtest --bot-api http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from benchmarks.fake_bot_api import create_fake_bot_api, serve_in_thread
+from benchmarks.reply_modes import make_update
+
+BASE_USER_ID = 920_000_000
+DEFAULT_MIX = "expense=50,income=15,summary=10,balance=15,help=5,unknown=5"
+CATEGORIES = ["food", "groceries", "coffee", "travel", "books", "rent", "snacks", "movies"]
+INCOME_SOURCES = ["salary", "tutoring", "freelancing", "stipend", "gift"]
+
+
+def make_text(kind: str, rng: random.Random) -> str:
+    if kind == "expense":
+        verb = rng.choice(["spent", "paid", "bought"])
+        joiner = "on" if verb == "spent" else "for"
+        return f"{verb} {rng.randint(10, 2500)} {joiner} {rng.choice(CATEGORIES)}"
+    if kind == "income":
+        return f"{rng.choice(['earned', 'received', 'got'])} {rng.randint(200, 20000)} from {rng.choice(INCOME_SOURCES)}"
+    if kind == "summary":
+        return rng.choice(["summary", "weekly report", "show expenses"])
+    if kind == "balance":
+        return rng.choice(["balance", "how much money left"])
+    if kind == "help":
+        return "help"
+    return rng.choice(["hello", "thanks!", "what can you do"])
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def synthesize(count: int, users: int, mix: Dict[str, float], seed: int):
+    """Yields (kind, update) pairs; user activity follows a Zipf-like curve."""
+    rng = random.Random(seed)
+    user_weights = [1 / (rank + 1) ** 0.8 for rank in range(users)]
+    kinds, kind_weights = list(mix), list(mix.values())
+    update_ids = itertools.count(int(time.time()) * 1000)
+    for _ in range(count):
+        user_id = BASE_USER_ID + rng.choices(range(users), user_weights)[0]
+        kind = rng.choices(kinds, kind_weights)[0]
+        yield kind, make_update(next(update_ids), user_id, make_text(kind, rng))
+
+
+class SimulatedLatencyBackend:
+    """
+    Wraps a backend so every call first waits `rtt` seconds (±`jitter`),
+    like a round trip to a remote database, and is counted by method name.
+    """
+
+    def __init__(self, backend, rtt: float, jitter: float = 0.2):
+        self.backend = backend
+        self.rtt = rtt
+        self.jitter = jitter
+        self.calls: Counter = Counter()
+
+    async def _round_trip(self, name: str):
+        self.calls[name] += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if inspect.isasyncgenfunction(attr):
+            @functools.wraps(attr)
+            async def stream(*args, **kwargs):
+                await self._round_trip(name)
+                async for item in attr(*args, **kwargs):
+                    yield item
+            wrapped = stream
+        elif inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def call(*args, **kwargs):
+                await self._round_trip(name)
+                return await attr(*args, **kwargs)
+            wrapped = call
+        else:
+            return attr
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(args, client, traffic) -> tuple:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors = Counter()
+
+    async def send(kind: str, update: dict):
+        start = time.perf_counter()
+        try:
+            response = await client.post("/api/telegram", json=update)
+            if response.status_code >= 400:
+                errors[f"HTTP {response.status_code}"] += 1
+                return
+        except Exception as e:
+            errors[type(e).__name__] += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if args.rate:
+        # Open loop: arrivals are a Poisson process at --rate per second
+        tasks = []
+        next_at = start
+        for kind, update in traffic:
+            next_at += random.expovariate(args.rate)
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(kind, update)))
+        await asyncio.gather(*tasks)
+    else:
+        async def client_loop():
+            for kind, update in traffic:
+                await send(kind, update)
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def report(args, elapsed: float, latencies, errors, db_calls: Counter, bot_calls: Dict[str, int]):
+    everything = sorted(itertools.chain.from_iterable(latencies.values()))
+    answered = len(everything)
+    load = f"rate {args.rate:g}/s" if args.rate else f"concurrency {args.concurrency}"
+    print(f"{answered} messages in {elapsed:.2f}s -> {answered / elapsed:,.0f} msg/s "
+          f"({load}, {args.transport}, {args.users} users)")
+    if not answered:
+        print(f"errors: {dict(errors)}")
+        return
+
+    print(f"latency  p50 {percentile(everything, 0.5) * 1000:7.1f} ms  "
+          f"p95 {percentile(everything, 0.95) * 1000:7.1f} ms  "
+          f"p99 {percentile(everything, 0.99) * 1000:7.1f} ms  "
+          f"max {everything[-1] * 1000:7.1f} ms")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"  {kind:<8} {len(values):>6}  p50 {statistics.median(values) * 1000:7.1f} ms  "
+              f"p99 {percentile(values, 0.99) * 1000:7.1f} ms")
+
+    if db_calls:
+        total = sum(db_calls.values())
+        print(f"db ops/message {total / answered:.2f}")
+        for name, calls in db_calls.most_common(8):
+            print(f"  {name:<28} {calls / answered:.2f}")
+    bot_total = sum(calls for method, calls in bot_calls.items() if method != "setWebhook")
+    print(f"Bot API calls/message {bot_total / answered:.2f} {dict(sorted(bot_calls.items()))}")
+    if errors:
+        print(f"errors: {dict(errors)}")
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--messages", type=int, default=5000)
+    arg_parser.add_argument("--users", type=int, default=1000)
+    arg_parser.add_argument("--concurrency", type=int, default=50, help="clients in closed-loop mode")
+    arg_parser.add_argument("--rate", type=float, help="open loop: updates per second")
+    arg_parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight pairs")
+    arg_parser.add_argument("--transport", choices=("asgi", "http"), default="asgi")
+    arg_parser.add_argument("--storage", choices=("simulated", "configured"), default="simulated")
+    arg_parser.add_argument("--db-rtt", type=float, default=0.02, help="simulated storage latency in seconds")
+    arg_parser.add_argument("--bot-rtt", type=float, default=0.08, help="fake Bot API latency in seconds")
+    arg_parser.add_argument("--reply-in-webhook", action="store_true")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--port", type=int, default=8765, help="fake Bot API port")
+    arg_parser.add_argument("--bot-api", help="URL of a fake Bot API already running in another process")
+    arg_parser.add_argument("--app-port", type=int, default=8766, help="app port with --transport http")
+    args = arg_parser.parse_args()
+
+    bot_api = args.bot_api or f"http://127.0.0.1:{args.port}"
+    if not args.bot_api:
+        serve_in_thread(create_fake_bot_api(args.bot_rtt), args.port)
+    os.environ["TELEGRAM_API_BASE_URL"] = f"{bot_api}/bot"
+    os.environ["REPLY_IN_WEBHOOK"] = str(args.reply_in_webhook)
+    for name, value in (("TELEGRAM_BOT_TOKEN", "1:loadtest"), ("FIREBASE_PROJECT_ID", "loadtest"),
+                        ("WEBHOOK_URL", "https://loadtest.invalid")):
+        os.environ.setdefault(name, value)
+    scratch = None
+    if args.storage == "simulated":
+        scratch = tempfile.TemporaryDirectory(prefix="loadtest-")
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(scratch.name, "loadtest.db")
+
+    # Imported late so the settings pick up the environment above
+    import httpx
+    from app.db.backends import close_backend, get_backend, set_backend
+    from app.main import app
+
+    db_calls = Counter()
+    if args.storage == "simulated":
+        simulated = SimulatedLatencyBackend(get_backend(), args.db_rtt)
+        set_backend(simulated)
+        db_calls = simulated.calls
+
+    traffic = synthesize(args.messages, args.users, parse_mix(args.mix), args.seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.concurrency)
+    if args.transport == "http":
+        # No lifespan, so the scheduler and webhook registration stay out of the numbers
+        serve_in_thread(app, args.app_port, lifespan="off")
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", limits=limits, timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+
+    async with httpx.AsyncClient(base_url=bot_api) as bot_client:
+        # An external fake may have served earlier runs, so only this run's calls count
+        calls_before = (await bot_client.get("/calls")).json()
+        async with client:
+            elapsed, latencies, errors = await run(args, client, traffic)
+        bot_calls = {
+            method: calls - calls_before.get(method, 0)
+            for method, calls in (await bot_client.get("/calls")).json().items()
+        }
+    report(args, elapsed, latencies, errors, db_calls, bot_calls)
+
+    await close_backend()
+    if scratch is not None:
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
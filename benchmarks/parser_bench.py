@@ -0,0 +1,166 @@
+# benchmarks/parser_bench.py
+"""
+Checks app.nlp.parser against the original keyword-loop implementation on a
+regression corpus, then reports messages per second for both.
+
+The reference keeps its own copy of the original keyword tables, so a
+change to parser.INTENT_KEYWORDS or STOP_WORDS shows up as a mismatch.
+Messages routed to a command added since (NEW_INTENTS) are counted
+separately rather than failing the check.
+
+parse_transactions, which the bot now uses, must return exactly the
+reference result for every message except those in MULTI_ENTRY, which
+must split into the given number of transactions.
+
+    python -m benchmarks.parser_bench
+"""
+import argparse
+import itertools
+import random
+import re
+import time
+
+from app.nlp import parser
+
+# --- Reference implementation, as it was before the compiled scanner ---
+
+LEGACY_INTENT_KEYWORDS = {
+    'expense': ['spent', 'paid', 'bought', 'expense', 'cost', 'purchase'],
+    'income': ['received', 'got', 'earned', 'income', 'added', 'credited'],
+    'summary': ['summary', 'report', 'how much', 'show expenses', 'show income'],
+    'balance': ['balance', 'remaining', 'how much money left'],
+    'help': ['/help', 'help'],
+    'start': ['/start']
+}
+LEGACY_STOP_WORDS = {'on', 'for', 'at', 'a', 'the', 'my', 'i', 'in', 'of', 'was', 'is'}
+LEGACY_AMOUNT_REGEX = r'₹?\s?((?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d{1,2})?)'
+
+# Commands added to the parser since; messages it routes to them are expected
+# to differ from the reference
+NEW_INTENTS = set(parser.INTENT_KEYWORDS) - set(LEGACY_INTENT_KEYWORDS)
+
+
+def legacy_get_intent(text):
+    text_lower = text.lower()
+    for intent, keywords in LEGACY_INTENT_KEYWORDS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            return intent
+    if re.search(LEGACY_AMOUNT_REGEX, text_lower):
+        return 'expense'
+    return 'unknown'
+
+
+def legacy_parse_transaction_message(text):
+    text_lower = text.lower()
+    txn_type = 'income' if any(k in text_lower for k in LEGACY_INTENT_KEYWORDS['income']) else 'expense'
+    match = re.search(LEGACY_AMOUNT_REGEX, text_lower)
+    if not match:
+        return None
+    amount = float(match.group(1).replace(',', ''))
+    category_text = text_lower.replace(match.group(0), '')
+    for kw_list in LEGACY_INTENT_KEYWORDS.values():
+        for kw in kw_list:
+            category_text = category_text.replace(kw, '')
+    tokens = [t for t in category_text.split() if t not in LEGACY_STOP_WORDS]
+    category = " ".join(tokens).strip() or "general"
+    return {'type': txn_type, 'amount': amount, 'category': category, 'description': text}
+
+# --- Corpus ---
+
+VERBS = ['spent', 'paid', 'bought', 'Spent', 'PAID', 'got', 'earned', 'received', 'credited',
+         'added', 'income', 'expense', 'cost', 'purchase', '']
+AMOUNTS = ['50', '1,000', '₹250', '₹ 1,000,000.50', '12.5', '99.99', '1000000', '3,50', '0']
+TAILS = ['on tea', 'for the bus', 'at the canteen', 'books', 'from freelancing', 'salary',
+         'for my mom', 'in groceries', 'on show expenses', 'was a gift', '', 'on forgot items',
+         'on 2 pens', 'cost of living', 'as pocket money', 'on help desk fees', 'on export fees',
+         'for a timezone converter', 'on imported cheese']
+FIXED = [
+    'summary', 'report please', 'how much did I spend', 'how much money left', 'balance',
+    'remaining?', '/help', 'help', '/start', 'hello', 'thanks!', 'show expenses', 'show income',
+    'show expenses 500', 'spent 50 on tea, 120 on bus', '₹300', '300', 'what is my balance 200',
+    'got 5000 salary and spent 200', 'I received ₹ 2,500.75 from dad', 'forgot 20 at home',
+    'bus fare 40', 'paid50for lunch', 'HOW MUCH MONEY LEFT', '/start 123', 'report 45 cost',
+    'export', 'export json 30', 'export 2024-01-01 2024-03-31', '/import', 'timezone Europe/London',
+    'spent 100 on 2 pens and 3 books', 'paid 1,5 for coffee', 'spent 50, 60 on tea',
+    'spent 50 on bread and butter',
+]
+# Messages holding several transactions, and how many
+MULTI_ENTRY = {
+    'spent 50 on tea, 120 on bus': 2,
+    'spent 50 on tea, 120 on bus, 300 on books': 3,
+    'tea 20\nbus 35\ngot 500 from mom': 3,
+    'spent 50 on tea and got 500 from mom': 2,
+    'spent 50 on tea and 120 on bus': 2,
+    'spent 50 on tea, and 120 on bus': 2,
+    'spent 50 on tea; received 200 salary': 2,
+}
+
+
+def build_corpus(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    combos = [
+        " ".join(part for part in (verb, amount, tail) if part)
+        for verb, amount, tail in itertools.product(VERBS, AMOUNTS, TAILS)
+    ]
+    corpus = FIXED + list(MULTI_ENTRY) + combos
+    while len(corpus) < size:
+        corpus.append(rng.choice(combos))
+    return corpus
+
+
+def check(corpus):
+    mismatches = rerouted = 0
+    for text in corpus:
+        intent = parser.get_intent(text)
+        if intent != legacy_get_intent(text):
+            if intent in NEW_INTENTS:
+                rerouted += 1
+                continue
+            mismatches += 1
+            print(f"intent mismatch: {text!r}")
+        legacy = legacy_parse_transaction_message(text)
+        if parser.parse_transaction_message(text) != legacy:
+            mismatches += 1
+            print(f"parse mismatch: {text!r}")
+        entries = parser.parse_transactions(text)
+        if text in MULTI_ENTRY:
+            if len(entries) != MULTI_ENTRY[text]:
+                mismatches += 1
+                print(f"split mismatch: {text!r} gave {len(entries)} transactions")
+        elif entries != ([legacy] if legacy else []):
+            mismatches += 1
+            print(f"parse_transactions mismatch: {text!r}")
+    return mismatches, rerouted
+
+
+def throughput(get_intent, parse, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            if get_intent(text) in ('expense', 'income'):
+                parse(text)
+    return len(corpus) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--size", type=int, default=5000, help="corpus size")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus(args.size)
+    mismatches, rerouted = check(corpus)
+    print(f"regression corpus: {len(corpus)} messages, {mismatches} mismatches, "
+          f"{rerouted} routed to commands added since ({', '.join(sorted(NEW_INTENTS))})")
+
+    before = throughput(legacy_get_intent, legacy_parse_transaction_message, corpus, args.repeat)
+    # The bot parses with parse_transactions, so that is what's timed
+    after = throughput(parser.get_intent, parser.parse_transactions, corpus, args.repeat)
+    print(f"before: {before:>10,.0f} msg/s")
+    print(f"after:  {after:>10,.0f} msg/s  ({after / before:.2f}x)")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
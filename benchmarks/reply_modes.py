@@ -0,0 +1,90 @@
+# benchmarks/reply_modes.py
+"""
+Compares webhook latency with explicit sendMessage calls against replies
+returned in the webhook response body (REPLY_IN_WEBHOOK).
+
+Updates are posted to the FastAPI app in-process. The Bot API is replaced by
+benchmarks.fake_bot_api with a configurable round-trip time, and data goes
+to the Firestore emulator or a scratch SQLite file:
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.reply_modes --bot-rtt 0.08
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.reply_modes
+
+In explicit mode the reply has reached Telegram when the webhook returns.
+In response mode Telegram dispatches it straight from the response body,
+so the webhook time is the end-to-end latency in both cases.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import time
+
+from benchmarks.fake_bot_api import create_fake_bot_api, serve_in_thread
+
+MESSAGES = ["spent 80 on snacks", "earned 400 from tutoring", "balance", "summary", "help"]
+BASE_USER_ID = 910_000_000
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }
+
+
+async def run_mode(client, settings, reply_in_webhook: bool, users: int, messages: int, update_ids):
+    settings.REPLY_IN_WEBHOOK = reply_in_webhook
+    latencies = []
+
+    async def simulate_user(user_id: int):
+        for _ in range(messages):
+            update = make_update(next(update_ids), user_id, random.choice(MESSAGES))
+            start = time.perf_counter()
+            response = await client.post("/api/telegram", json=update)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(simulate_user(BASE_USER_ID + i) for i in range(users)))
+    latencies.sort()
+    mode = "response body" if reply_in_webhook else "explicit send"
+    print(
+        f"{mode:>14} | p50 {statistics.median(latencies) * 1000:>7.1f} ms | "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:>7.1f} ms | "
+        f"mean {statistics.fmean(latencies) * 1000:>7.1f} ms"
+    )
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--bot-rtt", type=float, default=0.08, help="fake Bot API latency in seconds")
+    arg_parser.add_argument("--users", type=int, default=8)
+    arg_parser.add_argument("--messages", type=int, default=20, help="messages per user")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+
+    serve_in_thread(create_fake_bot_api(args.bot_rtt), args.port)
+    os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{args.port}/bot"
+
+    # Imported late so the settings pick up the fake Bot API URL
+    import httpx
+    from app.core.config import settings
+    from app.main import app
+
+    update_ids = itertools.count(int(time.time()) * 1000)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for reply_in_webhook in (False, True):
+            await run_mode(client, settings, reply_in_webhook, args.users, args.messages, update_ids)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+# benchmarks/transaction_scan.py
+"""
+Measures what reading a heavy user's full history costs in payload bytes,
+time and peak RSS, for four ways of computing their balance:
+
+    list-full         whole documents, description included, in one list
+    list-projected    only the aggregated fields, in one list
+    stream-projected  only the aggregated fields, paged through a cursor
+    frame             paged into a columnar TransactionFrame, then summed
+
+Each mode runs in a fresh subprocess so its peak RSS isn't polluted by the
+others. Payload bytes follow Firestore's document size rules (field name
+length + 1, 8 bytes per number/timestamp, string length + 1), which track
+what goes over the wire for both backends. Use the emulator or a scratch
+SQLite file:
+
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.transaction_scan
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.transaction_scan --transactions 50000
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.db import transactions as txn_db
+from app.db.backends import close_backend, get_backend
+from app.db.backends.base import TXN_FIELDS
+from app.db.frame import TransactionFrame
+
+BASE_USER_ID = 910_000_000
+MODES = ("list-full", "list-projected", "stream-projected", "frame")
+ALL_FIELDS = TXN_FIELDS + ('description',)
+CATEGORIES = ["food", "rent", "travel", "books", "groceries", "coffee", "salary", "tutoring"]
+
+
+def payload_bytes(txn: dict) -> int:
+    size = 0
+    for name, value in txn.items():
+        size += len(name) + 1
+        size += len(value.encode()) + 1 if isinstance(value, str) else 8
+    return size
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def seed(user_id: int, count: int):
+    backend = get_backend()
+    existing = (await backend.rebuild_aggregates(user_id))['txn_count']
+    if existing >= count:
+        return
+    print(f"Seeding {count - existing} transactions for user {user_id}...")
+    now = datetime.utcnow()
+    rng = random.Random(user_id)
+
+    async def add(i: int):
+        category = rng.choice(CATEGORIES)
+        txn_type = "income" if category in ("salary", "tutoring") else "expense"
+        await backend.add_transaction(user_id, {
+            "type": txn_type,
+            "amount": float(rng.randint(10, 5000)),
+            "category": category,
+            "description": f"{'earned' if txn_type == 'income' else 'spent'} {rng.randint(10, 5000)} "
+                           f"on {category} " + "x" * rng.randint(10, 60),
+            "timestamp": now - timedelta(minutes=i * 10)
+        }, f"bench-{i}")
+
+    for start in range(existing, count, 200):
+        await asyncio.gather(*(add(i) for i in range(start, min(start + 200, count))))
+
+
+async def run_mode(mode: str, user_id: int) -> dict:
+    baseline = rss_kb()
+    balance, rows, size = 0.0, 0, 0
+    start = time.perf_counter()
+
+    if mode == "frame":
+        # TransactionFrame.from_stream, with the payload counted on the way
+        frame = TransactionFrame()
+        async for txn in txn_db.iter_all_transactions(user_id):
+            frame.append(txn)
+            size += payload_bytes(txn)
+        balance, rows = frame.balance(), len(frame)
+    elif mode == "stream-projected":
+        txns = txn_db.iter_all_transactions(user_id, fields=('type', 'amount'))
+        async for txn in txns:
+            balance += txn["amount"] if txn["type"] == "income" else -txn["amount"]
+            rows += 1
+            size += payload_bytes(txn)
+    else:
+        fields = ALL_FIELDS if mode == "list-full" else ('type', 'amount')
+        txns = await txn_db.get_all_transactions(user_id, fields=fields)
+        for txn in txns:
+            balance += txn["amount"] if txn["type"] == "income" else -txn["amount"]
+            size += payload_bytes(txn)
+        rows = len(txns)
+
+    elapsed = time.perf_counter() - start
+    await close_backend()
+    return {
+        "mode": mode,
+        "rows": rows,
+        "balance": round(balance, 2),
+        "payload_bytes": size,
+        "seconds": elapsed,
+        "baseline_rss_kb": baseline,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--transactions", type=int, default=50_000)
+    arg_parser.add_argument("--mode", choices=MODES, help="run a single mode (used internally)")
+    args = arg_parser.parse_args()
+    user_id = BASE_USER_ID + args.transactions
+
+    if args.mode:
+        print(json.dumps(await run_mode(args.mode, user_id)))
+        return
+
+    await seed(user_id, args.transactions)
+    await close_backend()
+
+    print(f"{'mode':<18} {'rows':>7} {'payload':>10} {'time':>8} {'peak RSS':>10} {'growth':>9}")
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.transaction_scan",
+             "--transactions", str(args.transactions), "--mode", mode],
+            capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:<18} {result['rows']:>7} {result['payload_bytes'] / 1e6:>8.2f}MB "
+            f"{result['seconds']:>7.2f}s {result['peak_rss_kb'] / 1024:>8.1f}MB "
+            f"{(result['peak_rss_kb'] - result['baseline_rss_kb']) / 1024:>7.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
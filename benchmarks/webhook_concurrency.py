@@ -0,0 +1,88 @@
+# benchmarks/webhook_concurrency.py
+"""
+Measures how message throughput scales with the number of simultaneous users.
+
+Each simulated user runs the same DB path a webhook does (user upsert, intent
+parsing, transaction/summary/balance handling) without the outbound
+send_message call, so the numbers reflect the data layer only.
+
+Run it against the Firestore emulator or a scratch SQLite file, never
+against production data:
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.webhook_concurrency
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.webhook_concurrency
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.db import users as db_users
+from app.nlp import parser
+from app.services import finance_service
+
+MESSAGES = [
+    "spent 120 on lunch",
+    "paid 45 for bus",
+    "bought 300 books",
+    "earned 1500 from tutoring",
+    "summary",
+    "balance",
+]
+
+BASE_USER_ID = 900_000_000
+
+
+async def handle(user_id: int, text: str):
+    """Mirrors telegram_webhook minus the outbound send."""
+    await db_users.get_or_create_user(user_id, f"bench{user_id}")
+    intent = parser.get_intent(text)
+    if intent in ('expense', 'income'):
+        return await finance_service.process_transaction(user_id, text)
+    if intent == 'summary':
+        return await finance_service.generate_weekly_summary(user_id)
+    if intent == 'balance':
+        return await finance_service.get_balance(user_id)
+    return ""
+
+
+async def simulate_user(user_id: int, messages: int, latencies: list):
+    for _ in range(messages):
+        start = time.perf_counter()
+        await handle(user_id, random.choice(MESSAGES))
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(users: int, messages: int):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        simulate_user(BASE_USER_ID + i, messages, latencies) for i in range(users)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"{users:>6} users | {len(latencies) / elapsed:>8.1f} msg/s | "
+        f"p50 {statistics.median(latencies) * 1000:>7.1f} ms | p95 {p95 * 1000:>7.1f} ms"
+    )
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--levels", default="1,4,16,64", help="comma separated user counts")
+    arg_parser.add_argument("--messages", type=int, default=10, help="messages per user")
+    args = arg_parser.parse_args()
+
+    if settings.STORAGE_BACKEND == "firestore" and not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("WARNING: FIRESTORE_EMULATOR_HOST is not set, this will write to a live project.")
+
+    for level in (int(n) for n in args.levels.split(",")):
+        await run_level(level, args.messages)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,12 @@
+# tests/conftest.py
+import os
+import sys
+
+# The app reads its settings from the environment at import time
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "1:test")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "test")
+os.environ.setdefault("WEBHOOK_URL", "https://test.invalid")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,120 @@
+# tests/test_cache.py
+import asyncio
+from collections import Counter
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import TTLCache, get_cache_stats
+from app.db import budgets, goals
+from app.db.backends import set_backend
+from app.db.backends.sqlite import SQLiteBackend
+
+USER = 7
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    return clock
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache('test-expiry', maxsize=10, ttl=30)
+    cache.set('a', 1)
+    clock.now += 29
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache('test-lru', maxsize=2, ttl=30)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_stats_are_listed_per_cache(clock):
+    cache = TTLCache('test-stats', maxsize=10, ttl=30)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    stats = get_cache_stats()['test-stats']
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+
+
+class CountingBackend(SQLiteBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.reads = Counter()
+
+    async def get_budget(self, user_id, category):
+        self.reads['get_budget'] += 1
+        return await super().get_budget(user_id, category)
+
+    async def get_all_goals(self, user_id):
+        self.reads['get_all_goals'] += 1
+        return await super().get_all_goals(user_id)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = CountingBackend(str(tmp_path / 'finance.db'))
+    set_backend(backend)
+    budgets._budget_cache.clear()
+    goals._goals_cache.clear()
+    yield backend
+    set_backend(None)
+    asyncio.run(backend.close())
+
+
+def test_budget_reads_are_cached_and_refreshed_on_write(backend):
+    async def scenario():
+        missing = await budgets.get_budget(USER, 'Food')
+        await budgets.get_budget(USER, 'food')
+        await budgets.set_budget(USER, 'Food', 500)
+        after_set = await budgets.get_budget(USER, 'food')
+        await budgets.delete_budget(USER, 'food')
+        after_delete = await budgets.get_budget(USER, 'food')
+        return missing, after_set, after_delete
+
+    missing, after_set, after_delete = asyncio.run(scenario())
+    assert missing == {}
+    assert after_set['amount'] == 500
+    assert after_delete == {}
+    # Only the first lookup reached storage; writes update the cached entry
+    assert backend.reads['get_budget'] == 1
+
+
+def test_goal_writes_invalidate_the_cached_goals(backend):
+    async def scenario():
+        await goals.set_goal(USER, 'Bike', 500)
+        before = await goals.find_goal(USER, 'bike')
+        await goals.find_goal(USER, 'bike')
+        await goals.update_goal_progress(USER, 'Bike', 50)
+        after = await goals.find_goal(USER, 'bike')
+        await goals.delete_goal(USER, 'Bike')
+        return before, after, await goals.find_goal(USER, 'bike')
+
+    before, after, deleted = asyncio.run(scenario())
+    assert before['current_amount'] == 0
+    assert after['current_amount'] == 50
+    assert deleted is None
+    # One read per invalidation: after set_goal, update_goal_progress and delete_goal
+    assert backend.reads['get_all_goals'] == 3
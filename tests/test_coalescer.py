@@ -0,0 +1,128 @@
+# tests/test_coalescer.py
+import asyncio
+
+import pytest
+from google.api_core.exceptions import AlreadyExists
+
+from app.db.backends.coalescer import WriteCoalescer
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def create(self, ref, data):
+        self.writes.append(('create', ref, data))
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(('merge' if merge else 'set', ref, data))
+
+    def update(self, ref, data):
+        self.writes.append(('update', ref, data))
+
+    def delete(self, ref):
+        self.writes.append(('delete', ref, None))
+
+    async def commit(self):
+        self.db.commits.append(len(self.writes))
+        # Like Firestore, a create of an existing document rejects the
+        # whole batch and applies nothing
+        for op, ref, _ in self.writes:
+            if op == 'create' and ref in self.db.documents:
+                raise AlreadyExists(f"{ref} already exists")
+        for op, ref, data in self.writes:
+            self.db.documents.add(ref)
+            self.db.applied.append((ref, data))
+
+
+class FakeDB:
+    def __init__(self, existing=()):
+        self.documents = set(existing)
+        self.applied = []
+        self.commits = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def test_rejected_unit_is_isolated_and_the_rest_commit_in_order():
+    async def run():
+        db = FakeDB(existing={'txn-3'})
+        coalescer = WriteCoalescer(db, delay=0.01)
+        units = [
+            [('create', f'txn-{i}', i), ('merge', 'user', i)]
+            for i in range(8)
+        ]
+        results = await asyncio.gather(*(coalescer.submit(unit) for unit in units), return_exceptions=True)
+        return db, coalescer, results
+
+    db, coalescer, results = asyncio.run(run())
+    assert isinstance(results[3], AlreadyExists)
+    assert [result for i, result in enumerate(results) if i != 3] == [None] * 7
+    # Every other unit landed, and the shared document saw them in submission order
+    assert [data for ref, data in db.applied if ref == 'user'] == [0, 1, 2, 4, 5, 6, 7]
+    assert coalescer.splits > 0
+    assert coalescer.units == 7
+
+
+def test_full_batch_is_committed_without_waiting_for_the_timer():
+    async def run():
+        db = FakeDB()
+        coalescer = WriteCoalescer(db, delay=60)
+        unit = [('set', f'doc-{i}', i) for i in range(250)]
+        await asyncio.wait_for(
+            asyncio.gather(coalescer.submit(unit), coalescer.submit(list(unit))), timeout=1
+        )
+        return db
+
+    assert asyncio.run(run()).commits == [500]
+
+
+def test_unit_that_does_not_fit_starts_a_new_batch():
+    async def run():
+        db = FakeDB()
+        coalescer = WriteCoalescer(db, delay=0.01)
+        await asyncio.gather(
+            coalescer.submit([('set', f'a-{i}', i) for i in range(300)]),
+            coalescer.submit([('set', f'b-{i}', i) for i in range(300)]),
+        )
+        return db
+
+    assert asyncio.run(run()).commits == [300, 300]
+
+
+def test_oversized_unit_is_refused():
+    async def run():
+        await WriteCoalescer(FakeDB(), delay=0.01).submit([('set', f'doc-{i}', i) for i in range(501)])
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_timer_flushes_a_partial_batch():
+    async def run():
+        db = FakeDB()
+        coalescer = WriteCoalescer(db, delay=0.02)
+        await asyncio.wait_for(
+            asyncio.gather(coalescer.submit([('set', 'a', 1)]), coalescer.submit([('set', 'b', 2)])),
+            timeout=1
+        )
+        return db
+
+    assert asyncio.run(run()).commits == [2]
+
+
+def test_close_commits_whatever_is_queued():
+    async def run():
+        db = FakeDB()
+        coalescer = WriteCoalescer(db, delay=60)
+        pending = [asyncio.create_task(coalescer.submit([('set', f'doc-{i}', i)])) for i in range(3)]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(coalescer.close(), timeout=1)
+        await asyncio.gather(*pending)
+        return db
+
+    db = asyncio.run(run())
+    assert db.commits == [3]
+    assert sorted(ref for ref, _ in db.applied) == ['doc-0', 'doc-1', 'doc-2']
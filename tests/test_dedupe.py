@@ -0,0 +1,68 @@
+# tests/test_dedupe.py
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.api import telegram_webhook
+from app.core import metrics
+from app.core.config import settings
+from app.core.dedupe import UpdateDeduplicator, deduplicator
+
+
+def make_update(update_id: int, text: str = "balance") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def test_redelivered_update_is_handled_once(monkeypatch):
+    handled = []
+
+    async def handle_update(update, reply_in_webhook=False):
+        handled.append(update.update_id)
+
+    monkeypatch.setattr(telegram_webhook, "handle_update", handle_update)
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    app = FastAPI()
+    app.include_router(telegram_webhook.router, prefix="/api")
+
+    async def post_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/api/telegram", json=make_update(5001))
+            second = await client.post("/api/telegram", json=make_update(5001))
+            return first.json(), second.json()
+
+    before = deduplicator.duplicates
+    first, second = asyncio.run(post_twice())
+    assert handled == [5001]
+    assert first == {"status": "ok"}
+    assert second == {"status": "ok, duplicate update"}
+    assert deduplicator.duplicates == before + 1
+    assert f"finance_bot_duplicate_updates_total {before + 1}" in metrics.render()
+
+
+def test_forgotten_update_is_let_through_again():
+    async def scenario():
+        dedupe = UpdateDeduplicator(maxsize=2)
+        seen = [await dedupe.is_duplicate(1), await dedupe.is_duplicate(1)]
+        await dedupe.forget(1)
+        seen.append(await dedupe.is_duplicate(1))
+        # The oldest ID is dropped once more than maxsize are tracked
+        await dedupe.is_duplicate(2)
+        await dedupe.is_duplicate(3)
+        seen.append(await dedupe.is_duplicate(1))
+        return seen, dedupe.stats()
+
+    seen, stats = asyncio.run(scenario())
+    assert seen == [False, True, False, False]
+    assert stats == {'tracked': 2, 'duplicates': 1}
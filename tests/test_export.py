@@ -0,0 +1,98 @@
+# tests/test_export.py
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.api import telegram_webhook
+from app.db.backends import set_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.services import export_service
+from app.services.export_service import iter_export, parse_export_request
+
+USER = 9
+
+
+def test_export_request_format_and_range():
+    assert parse_export_request("export") == ('csv', None, None)
+    assert parse_export_request("Export JSON") == ('ndjson', None, None)
+    assert parse_export_request("export csv 2024-01-01 2024-03-31") == (
+        'csv', datetime(2024, 1, 1), datetime(2024, 4, 1)
+    )
+    assert parse_export_request("export 2024-02-01") == ('csv', datetime(2024, 2, 1), None)
+    fmt, since, until = parse_export_request("export json 30")
+    assert fmt == 'ndjson' and until is None
+    assert abs((datetime.utcnow() - since).days - 30) <= 1
+
+
+@pytest.mark.parametrize("text", [
+    "export 2024-13-45",
+    "export 2024-02-30",
+    "export 2024-03-31 2024-01-01",
+])
+def test_invalid_export_ranges_are_rejected(text):
+    assert parse_export_request(text) is None
+
+
+def test_invalid_range_gets_the_usage_line(monkeypatch):
+    async def started(work):
+        raise AssertionError("no export should start")
+    monkeypatch.setattr(telegram_webhook, 'run_in_background', started)
+    reply = asyncio.run(telegram_webhook._dispatch('export', USER, "export 2024-13-45"))
+    assert reply == export_service.EXPORT_USAGE
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    # Small pages, so the export comes out in several chunks
+    monkeypatch.setattr(export_service, 'PAGE_SIZE', 2)
+    backend = SQLiteBackend(str(tmp_path / 'finance.db'))
+    set_backend(backend)
+    txns = [
+        ('expense', 4.5, 'tea', 'chai, "masala"', datetime(2024, 3, 3, 9)),
+        ('income', 500.0, 'salary', 'march pay', datetime(2024, 3, 1, 10)),
+        ('expense', 120.0, 'bus', 'pass', datetime(2024, 3, 2, 8)),
+    ]
+    for number, (txn_type, amount, category, description, timestamp) in enumerate(txns):
+        asyncio.run(backend.add_transaction(USER, {
+            'type': txn_type, 'amount': amount, 'category': category,
+            'description': description, 'timestamp': timestamp,
+        }, txn_id=f't{number}'))
+    yield
+    set_backend(None)
+    asyncio.run(backend.close())
+
+
+def export(*args):
+    async def collect():
+        return [chunk async for chunk in iter_export(USER, *args)]
+    return asyncio.run(collect())
+
+
+def test_csv_export_is_chronological(history):
+    chunks = export('csv')
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows == [
+        ['timestamp', 'type', 'amount', 'category', 'description'],
+        ['2024-03-01T10:00:00', 'income', '500.0', 'salary', 'march pay'],
+        ['2024-03-02T08:00:00', 'expense', '120.0', 'bus', 'pass'],
+        ['2024-03-03T09:00:00', 'expense', '4.5', 'tea', 'chai, "masala"'],
+    ]
+
+
+def test_ndjson_export_of_a_range(history):
+    chunks = export('ndjson', datetime(2024, 3, 2), datetime(2024, 3, 3))
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{
+        'timestamp': '2024-03-02T08:00:00', 'type': 'expense', 'amount': 120.0,
+        'category': 'bus', 'description': 'pass',
+    }]
+
+
+def test_unknown_export_format(history):
+    with pytest.raises(ValueError):
+        export('xml')
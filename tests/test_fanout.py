@@ -0,0 +1,133 @@
+# tests/test_fanout.py
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from app.core import fanout
+from app.core.fanout import RateLimitedSender, TokenBucket, fan_out
+
+_sleep = asyncio.sleep
+
+
+class Clock:
+    """Stands in for time.monotonic; sleeping advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+        await _sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fanout.time, 'monotonic', clock)
+    monkeypatch.setattr(fanout.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+class FakeBot:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, fanout.time.monotonic()))
+        return chat_id
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    async def run():
+        # A power-of-two rate keeps the refill arithmetic exact on the fake clock
+        bucket = TokenBucket(rate=8, capacity=4)
+        for _ in range(20):
+            await bucket.acquire()
+
+    asyncio.run(run())
+    # 4 tokens were there at the start, the other 16 took 2 seconds to refill
+    assert clock.slept == pytest.approx(2.0)
+
+
+def test_sender_spaces_messages_to_one_chat():
+    async def run():
+        bot = FakeBot()
+        sender = RateLimitedSender(bot, global_rate=1000, per_chat_interval=0.05, max_retries=0)
+        await asyncio.gather(*(sender.send_message(1, 'hi') for _ in range(3)), sender.send_message(2, 'hi'))
+        return bot.sent
+
+    sent = asyncio.run(run())
+    chat_1 = [at for chat, at in sent if chat == 1]
+    assert all(b - a >= 0.045 for a, b in zip(chat_1, chat_1[1:]))
+    # Other chats don't wait for chat 1's spacing
+    assert [at for chat, at in sent if chat == 2][0] - chat_1[0] < 0.045
+
+
+def test_retry_after_pauses_every_send(clock):
+    async def run():
+        bot = FakeBot(errors=[RetryAfter(3)])
+        sender = RateLimitedSender(bot, global_rate=100, per_chat_interval=0, max_retries=2)
+        start = clock.now
+        await sender.send_message(1, 'hi')
+        # A send to another chat issued right after still waits out the pause
+        await sender.send_message(2, 'hi')
+        return sender, [at - start for _, at in bot.sent]
+
+    sender, offsets = asyncio.run(run())
+    assert sender.retries == 1
+    assert sender.sent == 2
+    assert offsets[0] >= 3.0
+    assert offsets[1] >= 3.0
+
+
+def test_retry_after_beyond_max_retries_is_raised(clock):
+    async def run():
+        bot = FakeBot(errors=[RetryAfter(1), RetryAfter(1)])
+        await RateLimitedSender(bot, global_rate=100, per_chat_interval=0, max_retries=1).send_message(1, 'hi')
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(run())
+
+
+def test_bad_request_is_not_retried(clock):
+    async def run():
+        bot = FakeBot(errors=[BadRequest('Chat not found')])
+        sender = RateLimitedSender(bot, global_rate=100, per_chat_interval=0, max_retries=3)
+        with pytest.raises(BadRequest):
+            await sender.send_message(1, 'hi')
+        return sender
+
+    assert asyncio.run(run()).retries == 0
+
+
+def test_fan_out_counts_failures_and_bounds_concurrency():
+    async def run():
+        in_flight = peak = 0
+
+        async def items():
+            for i in range(20):
+                yield i
+
+        async def handler(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            if item % 5 == 0:
+                raise ValueError(item)
+
+        return await fan_out(items(), handler, concurrency=3), peak
+
+    counts, peak = asyncio.run(run())
+    assert counts == {'succeeded': 16, 'failed': 4}
+    assert peak == 3
@@ -0,0 +1,162 @@
+# tests/test_firestore_backend.py
+import asyncio
+from datetime import datetime
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from app.db.backends.firestore import FirestoreBackend
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return FakeCollection(self.db, self.path + (name,))
+
+    async def get(self):
+        raise AssertionError("goal progress must not read the goal first")
+
+
+class FakeSnapshot:
+    def __init__(self, path, data):
+        self.id = path[-1]
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeQuery:
+    """Supports the select/where/order_by/limit/start_after chains the backend builds."""
+
+    OPS = {'>=': lambda a, b: a >= b, '<': lambda a, b: a < b}
+
+    def __init__(self, db, path, filters=(), orders=(), limit=None, after=None):
+        self.db = db
+        self.path = path
+        self.filters = filters
+        self.orders = orders
+        self._limit = limit
+        self.after = after
+
+    def _with(self, **changes):
+        fields = dict(filters=self.filters, orders=self.orders, limit=self._limit, after=self.after)
+        return FakeQuery(self.db, self.path, **{**fields, **changes})
+
+    def select(self, field_paths):
+        return self
+
+    def where(self, field_path, op_string, value):
+        return self._with(filters=self.filters + ((field_path, self.OPS[op_string], value),))
+
+    def order_by(self, field):
+        return self._with(orders=self.orders + (field,))
+
+    def limit(self, count):
+        return self._with(limit=count)
+
+    def start_after(self, snapshot):
+        return self._with(after=snapshot)
+
+    def _key(self, snapshot):
+        data = snapshot.to_dict()
+        return tuple(snapshot.id if field == '__name__' else data[field] for field in self.orders)
+
+    async def stream(self):
+        docs = [
+            FakeSnapshot(path, data) for path, data in self.db.documents.items()
+            if path[:-1] == self.path
+            and all(field in data and op(data[field], value) for field, op, value in self.filters)
+        ]
+        docs.sort(key=self._key)
+        if self.after is not None:
+            docs = [doc for doc in docs if self._key(doc) > self._key(self.after)]
+        for doc in docs[:self._limit]:
+            yield doc
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeRef(self.db, self.path + (doc_id,))
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def create(self, ref, data):
+        self.writes.append(('create', ref.path, data))
+
+    def update(self, ref, data):
+        self.writes.append(('update', ref.path, data))
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(('set', ref.path, data))
+
+    async def commit(self):
+        # Lets concurrent callers interleave between their writes
+        await asyncio.sleep(0)
+        for op, path, data in self.writes:
+            if op == 'create' and path in self.db.documents:
+                raise AlreadyExists(path)
+            if op == 'update' and path not in self.db.documents:
+                raise NotFound(path)
+        for op, path, data in self.writes:
+            document = self.db.documents.setdefault(path, {})
+            for field, value in data.items():
+                if isinstance(value, firestore.Increment):
+                    value = document.get(field, 0) + value.value
+                document[field] = value
+
+
+class FakeDB:
+    def __init__(self):
+        self.documents = {}
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def make_backend():
+    backend = FirestoreBackend.__new__(FirestoreBackend)
+    backend.db = FakeDB()
+    backend.coalescer = None
+    return backend
+
+
+def test_goal_progress_is_incremented_without_a_read():
+    async def scenario():
+        backend = make_backend()
+        await asyncio.gather(*(backend.add_goal_progress(1, 'Bike', 10) for _ in range(5)))
+        return backend.db.documents[('users', '1', 'goals', 'bike')]
+
+    goal = asyncio.run(scenario())
+    # All five find no goal. One creates it, and the others add to it
+    assert goal['current_amount'] == 50
+    assert goal['target_amount'] == 10
+    assert goal['goal_name'] == 'Bike'
+
+
+def test_transactions_are_read_in_timestamp_order():
+    backend = make_backend()
+    days = [5, 1, 4, 1, 3, 2]
+    for number, day in enumerate(days):
+        # Document IDs don't follow the timestamps
+        backend.db.documents[('users', '1', 'transactions', f'txn-{9 - number}')] = {
+            'type': 'expense', 'amount': float(number), 'category': 'food',
+            'timestamp': datetime(2024, 3, day),
+        }
+
+    async def read(**bounds):
+        return [txn['timestamp'].day async for txn in backend.iter_transactions(1, page_size=2, **bounds)]
+
+    # Pages of two, so every page resumes from a (timestamp, document ID) cursor
+    assert asyncio.run(read()) == [1, 1, 2, 3, 4, 5]
+    assert asyncio.run(read(since=datetime(2024, 3, 2), until=datetime(2024, 3, 5))) == [2, 3, 4]
@@ -0,0 +1,83 @@
+# tests/test_frame.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db import frame as frame_module
+from app.db.frame import TransactionFrame
+
+TXNS = [
+    {'type': 'income', 'amount': 1000.0, 'category': 'salary', 'timestamp': datetime(2024, 3, 1, 9)},
+    {'type': 'expense', 'amount': 40.0, 'category': 'food', 'timestamp': datetime(2024, 3, 2, 13)},
+    {'type': 'expense', 'amount': 15.5, 'category': 'food', 'timestamp': datetime(2024, 3, 4, 8)},
+    {'type': 'expense', 'amount': 300.0, 'category': 'rent', 'timestamp': datetime(2024, 4, 1)},
+    # Legacy transaction without a timestamp
+    {'type': 'expense', 'amount': 5.0, 'category': 'misc', 'timestamp': None},
+]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def frame(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(frame_module, '_numpy_loaded', True)
+        monkeypatch.setattr(frame_module, 'np', None)
+    else:
+        pytest.importorskip('numpy')
+    return TransactionFrame.from_records(TXNS)
+
+
+def test_totals_and_balance(frame):
+    assert len(frame) == 5
+    assert frame.totals() == {'income': 1000.0, 'expense': 360.5, 'count': 5}
+    assert frame.balance() == 639.5
+
+
+def test_expense_by_category(frame):
+    assert frame.expense_by_category() == {'food': 55.5, 'rent': 300.0, 'misc': 5.0}
+
+
+def test_window_is_half_open_and_skips_undated(frame):
+    march = frame.window(since=datetime(2024, 3, 1), until=datetime(2024, 4, 1))
+    assert march.period_totals() == {
+        'income': 1000.0, 'expense': 55.5, 'count': 3, 'categories': {'food': 55.5},
+    }
+    assert len(frame.window(since=datetime(2024, 3, 4, 8))) == 2
+    # Without a lower bound, undated transactions are kept
+    assert len(frame.window(until=datetime(2024, 3, 2))) == 2
+
+
+def test_window_accepts_aware_bounds(frame):
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert len(frame.window(since=datetime(2024, 4, 1, 5, 30, tzinfo=ist))) == 1
+
+
+def test_group_by_period(frame):
+    days = frame.group_by_period('day')
+    assert sorted(days) == [datetime(2024, 3, 1), datetime(2024, 3, 2), datetime(2024, 3, 4), datetime(2024, 4, 1)]
+
+    weeks = frame.group_by_period('week')
+    # 2024-03-01 is a Friday and 2024-03-04 a Monday
+    assert weeks[datetime(2024, 2, 26)] == {
+        'income': 1000.0, 'expense': 40.0, 'count': 2, 'categories': {'food': 40.0},
+    }
+    assert weeks[datetime(2024, 3, 4)]['count'] == 1
+    assert weeks[datetime(2024, 4, 1)]['categories'] == {'rent': 300.0}
+
+    months = frame.group_by_period('month')
+    assert months[datetime(2024, 3, 1)]['expense'] == 55.5
+    assert months[datetime(2024, 4, 1)]['expense'] == 300.0
+    # The undated transaction belongs to no bucket
+    assert sum(group['count'] for group in months.values()) == 4
+
+    with pytest.raises(ValueError):
+        frame.group_by_period('year')
+
+
+def test_from_stream_matches_from_records():
+    async def stream():
+        for txn in TXNS:
+            yield txn
+
+    streamed = asyncio.run(TransactionFrame.from_stream(stream()))
+    assert streamed.period_totals() == TransactionFrame.from_records(TXNS).period_totals()
@@ -0,0 +1,87 @@
+# tests/test_metrics.py
+import asyncio
+
+import pytest
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.update_queue import UpdateQueue
+from app.db.backends.coalescer import WriteCoalescer
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_ENABLED', True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_spans_and_counters_are_rendered(enabled):
+    for ms in range(1, 101):
+        metrics.observe('parse', ms / 1000)
+    metrics.count('intent', intent='log_expense')
+    metrics.count('intent', intent='log_expense')
+    with metrics.span('send'):
+        pass
+
+    text = metrics.render()
+    assert 'finance_bot_stage_seconds_count{stage="parse"} 100' in text
+    assert 'finance_bot_stage_seconds_count{stage="send"} 1' in text
+    assert 'finance_bot_intent_total{intent="log_expense"} 2' in text
+    p50 = next(line for line in text.splitlines()
+               if line.startswith('finance_bot_stage_seconds{stage="parse",quantile="0.5"}'))
+    # The buckets are about 19% wide, so the estimate is close to 50 ms
+    assert 0.045 < float(p50.split()[1]) < 0.056
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_ENABLED', False)
+    metrics.reset()
+    with metrics.span('parse'):
+        metrics.count('intent', intent='help')
+    assert 'finance_bot_stage_seconds_count' not in metrics.render()
+    assert 'finance_bot_intent_total' not in metrics.render()
+
+
+def test_pipeline_stats_are_rendered(enabled):
+    cache = TTLCache('test-metrics', maxsize=10, ttl=30)
+    cache.set('a', 1)
+    cache.get('a')
+
+    async def handled(item):
+        pass
+
+    async def scenario():
+        queue = UpdateQueue(handled, workers=1, maxsize=4, put_timeout=0.1, name='test-metrics')
+        queue.start()
+        await queue.submit(1, 'update')
+        await queue.drain(1)
+
+        class Batch:
+            def set(self, ref, data):
+                pass
+
+            async def commit(self):
+                pass
+
+        class DB:
+            def batch(self):
+                return Batch()
+
+        coalescer = WriteCoalescer(DB(), delay=0.001, name='test-metrics')
+        await asyncio.gather(*(coalescer.submit([('set', 'ref', {})]) for _ in range(3)))
+
+    asyncio.run(scenario())
+    text = metrics.render()
+    assert 'finance_bot_cache_events_total{cache="test-metrics",event="hits"} 1' in text
+    assert 'finance_bot_cache_entries{cache="test-metrics"} 1' in text
+    assert 'finance_bot_queue_updates_total{event="processed",queue="test-metrics"} 1' in text
+    assert 'finance_bot_queue_depth{queue="test-metrics"} 0' in text
+    assert 'finance_bot_queue_latency_seconds{quantile="0.5",queue="test-metrics"}' in text
+    assert 'finance_bot_duplicate_updates_total ' in text
+    # Three units from concurrent callers went out in one commit
+    assert 'finance_bot_coalescer_commits_total{coalescer="test-metrics"} 1' in text
+    assert 'finance_bot_coalescer_units_total{coalescer="test-metrics"} 3' in text
+    assert 'finance_bot_coalescer_splits_total{coalescer="test-metrics"} 0' in text
@@ -0,0 +1,95 @@
+# tests/test_parser.py
+import pytest
+
+from app.nlp.parser import get_intent, parse_transaction_message, parse_transactions
+
+
+def summarize(text):
+    return [(txn['type'], txn['amount'], txn['category']) for txn in parse_transactions(text)]
+
+
+@pytest.mark.parametrize("text", [
+    "spent 3,50 on tea",
+    "paid 1,5 for coffee",
+    "spent 100 on 2 pens and 3 books",
+    "spent 50 on bread and butter",
+    "spent 50, 60 on tea",
+    "spent 1,200 on rent",
+    "got 5000 salary and spent 200",
+    "spent 50 on tea,120 on bus",
+])
+def test_single_entry_messages_parse_like_before(text):
+    assert parse_transactions(text) == [parse_transaction_message(text)]
+
+
+def test_no_amount_gives_no_transactions():
+    assert parse_transactions("hello there") == []
+
+
+def test_comma_separated_entries():
+    assert summarize("spent 50 on tea, 120 on bus, 300 on books") == [
+        ('expense', 50.0, 'tea'), ('expense', 120.0, 'bus'), ('expense', 300.0, 'books'),
+    ]
+
+
+def test_one_entry_per_line():
+    assert summarize("tea 20\nbus 35") == [('expense', 20.0, 'tea'), ('expense', 35.0, 'bus')]
+
+
+def test_entries_keep_their_own_type():
+    assert summarize("spent 50 on tea; received 200 salary") == [
+        ('expense', 50.0, 'tea'), ('income', 200.0, 'salary'),
+    ]
+
+
+def test_and_splits_before_a_new_transaction_keyword():
+    assert summarize("spent 50 on tea and got 500 from mom") == [
+        ('expense', 50.0, 'tea'), ('income', 500.0, 'from mom'),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "spent 50 on tea and 120 on bus",
+    "spent 50 on tea, and 120 on bus",
+    "spent 50 on tea; and 120 on bus",
+])
+def test_and_splits_before_an_amount_with_its_own_phrase(text):
+    assert summarize(text) == [('expense', 50.0, 'tea'), ('expense', 120.0, 'bus')]
+
+
+def test_and_inside_a_phrase_keeps_later_amounts_in_it():
+    assert summarize("spent 100 on 2 pens and 3 books for school") == [
+        ('expense', 100.0, '2 pens and 3 books school'),
+    ]
+
+
+def test_and_splits_entries_without_a_category_phrase():
+    assert summarize("tea 50 and bus 120") == [('expense', 50.0, 'tea'), ('expense', 120.0, 'bus')]
+
+
+def test_entry_without_keyword_takes_previous_type():
+    assert summarize("received 200 salary, 300 bonus") == [
+        ('income', 200.0, 'salary'), ('income', 300.0, 'bonus'),
+    ]
+
+
+def test_entries_are_capped():
+    text = "\n".join(f"item{i} {i + 1}" for i in range(80))
+    assert len(parse_transactions(text)) == 50
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("export", "export"),
+    ("export json 30", "export"),
+    ("timezone Europe/London", "timezone"),
+    ("/import", "import"),
+    ("50 on export fees", "expense"),
+    ("paid 20 for a timezone converter", "expense"),
+    ("my timezone", "unknown"),
+])
+def test_command_words_only_count_at_the_start(text, intent):
+    assert get_intent(text) == intent
+
+
+def test_command_words_stay_in_categories():
+    assert parse_transaction_message("spent 50 on export fees")['category'] == "export fees"
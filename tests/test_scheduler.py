@@ -0,0 +1,108 @@
+# tests/test_scheduler.py
+import asyncio
+
+import pytest
+from telegram.error import BadRequest
+
+from app.core import scheduler
+from app.core.config import settings
+from app.core.fanout import RateLimitedSender
+
+WEEK = '2024-W10'
+
+
+class FakeBot:
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.sent.append(chat_id)
+
+
+class Shard:
+    """Fakes the storage and Bot API around one shard's run."""
+
+    def __init__(self, monkeypatch, users, fail_marks=0, fail_after=None, errors=None):
+        self.users = users
+        self.fail_marks = fail_marks
+        self.fail_after = fail_after
+        self.marked = []
+        self.state = {}
+        self.bot = FakeBot(errors)
+        sender = RateLimitedSender(self.bot, global_rate=1000, per_chat_interval=0, max_retries=0)
+        monkeypatch.setattr(scheduler, 'get_sender', lambda: sender)
+        monkeypatch.setattr(scheduler, 'iter_user_ids_pending_summary', self.pending)
+        monkeypatch.setattr(scheduler, 'generate_weekly_summary', self.summary)
+        monkeypatch.setattr(scheduler, 'mark_summaries_sent', self.mark)
+        monkeypatch.setattr(scheduler, 'acquire_lease', self.lease)
+        monkeypatch.setattr(scheduler, 'release_lease', self.release)
+        monkeypatch.setattr(scheduler, 'get_job_state', self.job_state)
+        monkeypatch.setattr(scheduler, 'set_job_state', self.set_job_state)
+        monkeypatch.setattr(settings, 'SUMMARY_SHARDS', 1)
+        monkeypatch.setattr(settings, 'SUMMARY_CONCURRENCY', 1)
+        monkeypatch.setattr(settings, 'SUMMARY_CHECKPOINT_EVERY', 2)
+
+    async def pending(self, week, slots, due):
+        for i, user_id in enumerate(self.users):
+            if i == self.fail_after:
+                # Let the users already queued be delivered first
+                await asyncio.sleep(0.01)
+                raise RuntimeError("storage unavailable")
+            yield user_id
+
+    async def summary(self, user_id, week):
+        return f"summary for {user_id}"
+
+    async def mark(self, user_ids, week):
+        if self.fail_marks:
+            self.fail_marks -= 1
+            raise RuntimeError("write failed")
+        self.marked.append(list(user_ids))
+
+    async def lease(self, name, owner, ttl):
+        return True
+
+    async def release(self, name, owner):
+        pass
+
+    async def job_state(self, name):
+        return self.state
+
+    async def set_job_state(self, name, **fields):
+        self.state = fields
+
+    def run(self):
+        return asyncio.run(scheduler.send_shard_summaries(WEEK, 0, (-1, 100), limit=1000))
+
+
+def test_failed_checkpoint_keeps_the_users_for_the_next_one(monkeypatch):
+    shard = Shard(monkeypatch, ['1', '2', '3', '4', '5'], fail_marks=1)
+    counts, complete = shard.run()
+    # The failed write is not blamed on the user whose delivery triggered it
+    assert counts == {'succeeded': 5, 'failed': 0}
+    assert complete
+    assert shard.marked == [['1', '2', '3'], ['4', '5']]
+
+
+def test_users_reached_before_an_error_are_checkpointed(monkeypatch):
+    shard = Shard(monkeypatch, ['1', '2', '3'], fail_after=1)
+    with pytest.raises(RuntimeError):
+        shard.run()
+    assert shard.bot.sent == ['1']
+    assert shard.marked == [['1']]
+
+
+def test_rejected_chat_is_checkpointed_and_the_cursor_moves_on(monkeypatch):
+    shard = Shard(monkeypatch, ['1', '2', '3'], errors={'2': BadRequest("Chat not found")})
+    counts, complete = shard.run()
+    assert counts == {'succeeded': 3, 'failed': 0}
+    assert complete
+    assert shard.bot.sent == ['1', '3']
+    assert shard.marked == [['1', '2'], ['3']]
+
+    asyncio.run(scheduler.dispatch_due_summaries())
+    # The next tick doesn't stop at the same chat again
+    assert 'cursor' in shard.state
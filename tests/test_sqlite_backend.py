@@ -0,0 +1,162 @@
+# tests/test_sqlite_backend.py
+import asyncio
+from datetime import datetime, timedelta
+
+from app.db.backends.base import week_start
+from app.db.backends.sqlite import SQLiteBackend
+
+USER = 42
+WEEK = '2024-W10'
+
+
+def txn(amount, category='food', txn_type='expense', timestamp=None, description='test'):
+    return {
+        'type': txn_type,
+        'amount': amount,
+        'category': category,
+        'description': description,
+        'timestamp': timestamp or week_start(WEEK) + timedelta(days=1),
+    }
+
+
+def run(tmp_path, scenario):
+    async def main():
+        backend = SQLiteBackend(str(tmp_path / 'finance.db'))
+        try:
+            return await scenario(backend)
+        finally:
+            await backend.close()
+    return asyncio.run(main())
+
+
+def test_add_transaction_is_idempotent_by_id(tmp_path):
+    async def scenario(backend):
+        first = await backend.add_transaction(USER, txn(10), txn_id='t1')
+        second = await backend.add_transaction(USER, txn(10), txn_id='t1')
+        return first, second, await backend.get_balance(USER)
+
+    assert run(tmp_path, scenario) == (True, False, -10)
+
+
+def test_add_transactions_counts_only_new_rows(tmp_path):
+    async def scenario(backend):
+        batch = [(f't{i}', txn(i)) for i in range(1, 4)]
+        first = await backend.add_transactions(USER, batch)
+        again = await backend.add_transactions(USER, batch)
+        mixed = await backend.add_transactions(USER, batch + [('t4', txn(4))])
+        return first, again, mixed, await backend.get_balance(USER)
+
+    assert run(tmp_path, scenario) == (3, 0, 1, -10)
+
+
+def test_add_transaction_group_credits_goals_once(tmp_path):
+    async def scenario(backend):
+        await backend.set_goal(USER, {'goal_name': 'Bike', 'target_amount': 500, 'current_amount': 0})
+        entries = [
+            ('g1', txn(30, txn_type='savings'), 'Bike'),
+            ('g2', txn(20), None),
+        ]
+        first = await backend.add_transaction_group(USER, entries)
+        again = await backend.add_transaction_group(USER, entries)
+        goal = await backend.get_goal(USER, 'bike')
+        return first, again, goal['current_amount'], await backend.get_balance(USER)
+
+    assert run(tmp_path, scenario) == (True, False, 30, -50)
+
+
+def test_lease_is_exclusive_until_released_or_expired(tmp_path):
+    async def scenario(backend):
+        ttl = timedelta(minutes=5)
+        results = [
+            await backend.acquire_lease('summary', 'a', ttl),
+            await backend.acquire_lease('summary', 'b', ttl),
+            # The holder can renew its own lease
+            await backend.acquire_lease('summary', 'a', ttl),
+        ]
+        # Only the holder can release it
+        await backend.release_lease('summary', 'b')
+        results.append(await backend.acquire_lease('summary', 'b', ttl))
+        await backend.release_lease('summary', 'a')
+        results.append(await backend.acquire_lease('summary', 'b', ttl))
+        # An expired lease can be taken over
+        await backend.acquire_lease('expired', 'a', timedelta(seconds=-1))
+        results.append(await backend.acquire_lease('expired', 'b', ttl))
+        return results
+
+    assert run(tmp_path, scenario) == [True, False, True, False, True, True]
+
+
+def test_claim_update_dedupes_until_released(tmp_path):
+    async def scenario(backend):
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        results = [
+            await backend.claim_update(1, expires_at),
+            await backend.claim_update(1, expires_at),
+            await backend.claim_update(2, expires_at),
+        ]
+        await backend.release_update(1)
+        results.append(await backend.claim_update(1, expires_at))
+        return results
+
+    assert run(tmp_path, scenario) == [True, False, True, True]
+
+
+def test_expired_update_markers_are_reclaimable(tmp_path):
+    async def scenario(backend):
+        first = await backend.claim_update(1, datetime.utcnow() - timedelta(seconds=1))
+        second = await backend.claim_update(1, datetime.utcnow() + timedelta(hours=1))
+        return first, second
+
+    assert run(tmp_path, scenario) == (True, True)
+
+
+def test_iter_transactions_pages_in_timestamp_order(tmp_path):
+    start = datetime(2024, 3, 1)
+    # Several transactions share a timestamp, so pages break inside a tie
+    stamps = [start + timedelta(hours=i // 3) for i in range(20)]
+
+    async def scenario(backend):
+        await backend.add_transactions(
+            USER, [(f't{i}', txn(i, timestamp=stamp)) for i, stamp in reversed(list(enumerate(stamps)))]
+        )
+        await backend.add_transaction(USER + 1, txn(99, timestamp=start), txn_id='other')
+
+        async def collect(**kwargs):
+            return [t async for t in backend.iter_transactions(USER, page_size=4, **kwargs)]
+
+        return (
+            await collect(),
+            await collect(since=start + timedelta(hours=2), until=start + timedelta(hours=4)),
+            await collect(fields=('amount',)),
+        )
+
+    everything, window, amounts = run(tmp_path, scenario)
+    assert len(everything) == 20
+    assert [t['timestamp'] for t in everything] == sorted(stamps)
+    assert sorted(t['amount'] for t in everything) == list(range(20))
+    assert sorted(t['amount'] for t in window) == list(range(6, 12))
+    assert all(start + timedelta(hours=2) <= t['timestamp'] < start + timedelta(hours=4) for t in window)
+    assert amounts[0] == {'amount': amounts[0]['amount']}
+
+
+def test_week_totals_match_the_raw_transactions(tmp_path):
+    start = week_start(WEEK)
+
+    async def scenario(backend):
+        await backend.add_transactions(USER, [
+            ('in', txn(1000, category='salary', txn_type='income', timestamp=start)),
+            ('food', txn(40.5, category='food', timestamp=start + timedelta(days=2))),
+            ('rent', txn(300, category='rent', timestamp=start + timedelta(days=6, hours=23))),
+            # Just outside the week on either side
+            ('before', txn(7, timestamp=start - timedelta(seconds=1))),
+            ('after', txn(9, timestamp=start + timedelta(days=7))),
+        ])
+        return await backend.get_week_totals(USER, WEEK), await backend.check_week_totals(USER, WEEK)
+
+    stored, check = run(tmp_path, scenario)
+    assert stored == {'income': 1000, 'expense': 340.5, 'count': 3,
+                      'categories': {'food': 40.5, 'rent': 300}}
+    assert check['week'] == WEEK
+    assert check['stored'] == stored
+    assert check['actual'] == stored
+    assert check['consistent'] is True
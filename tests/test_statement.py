@@ -0,0 +1,93 @@
+# tests/test_statement.py
+from datetime import datetime
+
+import pytest
+
+from app.nlp.statement import iter_statement, parse_date
+
+
+def parse(text):
+    return list(iter_statement(text.splitlines(keepends=True)))
+
+
+def test_debit_and_credit_columns_after_a_preamble():
+    rows = parse(
+        "HDFC BANK Ltd.\n"
+        "Statement of account,,,,\n"
+        "\n"
+        "Date,Narration,Chq./Ref.No.,Withdrawal Amt.,Deposit Amt.\n"
+        "01/03/24,UPI/40213/SWIGGY BANGALORE/Food,0000,\"1,250.50\",\n"
+        "02/03/24,NEFT CR ACME PAYROLL,0000,,50000.00\n"
+    )
+    assert [number for number, _ in rows] == [5, 6]
+    swiggy, salary = (txn for _, txn in rows)
+    assert (swiggy['type'], swiggy['amount'], swiggy['category']) == ('expense', 1250.5, 'swiggy bangalore')
+    assert swiggy['description'] == 'UPI/40213/SWIGGY BANGALORE/Food'
+    assert (salary['type'], salary['amount'], salary['category']) == ('income', 50000.0, 'acme payroll')
+    assert salary['timestamp'] == datetime(2024, 3, 2, 12)
+
+
+def test_signed_and_typed_amount_columns():
+    rows = parse(
+        "Transaction Date,Description,Amount,Category\n"
+        "2024-03-01,Coffee shop,-4.50,Eating out\n"
+        "2024-03-02,Refund,+20,\n"
+        "2024-03-03,Bus pass,(30.00),\n"
+    )
+    assert [(txn['type'], txn['amount'], txn['category']) for _, txn in rows] == [
+        ('expense', 4.5, 'eating out'),
+        ('income', 20.0, 'refund'),
+        ('expense', 30.0, 'bus pass'),
+    ]
+
+    rows = parse(
+        "Date,Details,Amount,Dr/Cr\n"
+        "05-03-2024,Rent March,15000,DR\n"
+        "06-03-2024,Interest,12.40,CR\n"
+    )
+    assert [(txn['type'], txn['amount']) for _, txn in rows] == [('expense', 15000.0), ('income', 12.4)]
+
+
+def test_rows_without_an_amount_yield_none():
+    rows = parse(
+        "Date,Narration,Debit,Credit\n"
+        "01/03/2024,Opening balance,,\n"
+        "\n"
+        "02/03/2024,Chai,20,\n"
+    )
+    # The blank line is skipped, the row without an amount is reported
+    assert [(number, txn is None) for number, txn in rows] == [(2, True), (4, False)]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-03-12", datetime(2024, 3, 12, 12)),
+    ("2024-03-12T08:30:00", datetime(2024, 3, 12, 8, 30)),
+    ("2024-03-12T08:30:00+05:30", datetime(2024, 3, 12, 3)),
+    ("12/03/2024", datetime(2024, 3, 12, 12)),
+    ("12/03/2024 10:15:00", datetime(2024, 3, 12, 12)),
+    ("12.03.2024", datetime(2024, 3, 12, 12)),
+    ("12-Mar-24", datetime(2024, 3, 12, 12)),
+    ("12 March 2024", datetime(2024, 3, 12, 12)),
+    ("12 Mar 2024 10:15 AM", datetime(2024, 3, 12, 12)),
+    ("Mar 12, 2024", datetime(2024, 3, 12, 12)),
+    # Day-first is tried before month-first
+    ("03/12/2024", datetime(2024, 12, 3, 12)),
+    ("12/31/2024", datetime(2024, 12, 31, 12)),
+    ("", None),
+    ("yesterday", None),
+])
+def test_date_formats(value, expected):
+    assert parse_date(value) == expected
+
+
+def test_headerless_rows_read_like_messages():
+    rows = parse(
+        "12/03/2024,spent 250 on groceries\n"
+        "got 5000 salary\n"
+        "no amount here\n"
+    )
+    (_, groceries), (_, salary), (_, nothing) = rows
+    assert (groceries['type'], groceries['amount'], groceries['category']) == ('expense', 250.0, 'groceries')
+    assert groceries['timestamp'] == datetime(2024, 3, 12, 12)
+    assert (salary['type'], salary['amount'], salary['timestamp']) == ('income', 5000.0, None)
+    assert nothing is None
@@ -0,0 +1,86 @@
+# tests/test_summary_slots.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.db import reconcile
+from app.db.backends import set_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.core.summary_slots import (
+    MINUTES_PER_CYCLE, cycle_minute, summary_slot, summary_week, valid_timezone
+)
+
+
+def test_cycle_starts_on_wednesday_utc():
+    # 2024-03-06 is a Wednesday
+    assert cycle_minute(datetime(2024, 3, 6)) == 0
+    assert cycle_minute(datetime(2024, 3, 5, 23, 59)) == MINUTES_PER_CYCLE - 1
+    assert cycle_minute(datetime(2024, 3, 10, 14)) == 4 * 24 * 60 + 14 * 60
+
+
+def test_cycle_minute_converts_aware_times_to_utc():
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert cycle_minute(datetime(2024, 3, 6, 5, 30, tzinfo=ist)) == 0
+
+
+def test_summary_week_is_the_week_before_the_cycle():
+    # The cycle from Wednesday 2024-03-06 covers ISO week 10 (March 4-10)
+    assert summary_week(datetime(2024, 3, 6)) == '2024-W10'
+    assert summary_week(datetime(2024, 3, 12, 23, 59)) == '2024-W10'
+    assert summary_week(datetime(2024, 3, 5, 23, 59)) == '2024-W09'
+
+
+def test_valid_timezone():
+    assert valid_timezone('Europe/London')
+    assert valid_timezone('UTC')
+    assert not valid_timezone('Mars/Olympus_Mons')
+    assert not valid_timezone('')
+
+
+def test_slot_is_stable_and_within_the_window(monkeypatch):
+    monkeypatch.setattr(settings, 'SUMMARY_LOCAL_TIME', '19:30')
+    monkeypatch.setattr(settings, 'SUMMARY_WINDOW_MINUTES', 120)
+    # Sunday 19:30 in UTC is 4 days and 19.5 hours into the cycle
+    sunday = 4 * 24 * 60 + 19 * 60 + 30
+    slots = [summary_slot(user_id, 'UTC') for user_id in range(200)]
+    assert all(sunday <= slot < sunday + 120 for slot in slots)
+    assert len(set(slots)) > 1
+    assert summary_slot(7, 'UTC') == summary_slot('7', 'UTC')
+
+
+def test_timezone_shifts_the_slot(monkeypatch):
+    monkeypatch.setattr(settings, 'SUMMARY_DEFAULT_TIMEZONE', 'Asia/Kolkata')
+    utc = summary_slot(7, 'UTC')
+    # Kolkata has no daylight saving, so it is always 5.5 hours earlier
+    assert summary_slot(7, 'Asia/Kolkata') == utc - 330
+    assert summary_slot(7) == summary_slot(7, 'Asia/Kolkata')
+
+
+def test_extreme_timezones_fall_inside_one_cycle(monkeypatch):
+    monkeypatch.setattr(settings, 'SUMMARY_WINDOW_MINUTES', 1)
+    # Sunday 00:00 at UTC+14 is Saturday 10:00 UTC, and Sunday 23:59 at
+    # UTC-12 is Monday 11:59 UTC
+    monkeypatch.setattr(settings, 'SUMMARY_LOCAL_TIME', '00:00')
+    assert summary_slot(7, 'Etc/GMT-14') == 3 * 24 * 60 + 10 * 60
+    monkeypatch.setattr(settings, 'SUMMARY_LOCAL_TIME', '23:59')
+    assert summary_slot(7, 'Etc/GMT+12') == 5 * 24 * 60 + 11 * 60 + 59
+
+
+def test_slot_refresh_reads_no_transactions(tmp_path, monkeypatch):
+    async def rebuild(user_id):
+        raise AssertionError("the slot refresh must not rebuild aggregates")
+    monkeypatch.setattr(reconcile, 'rebuild_user_aggregates', rebuild)
+
+    async def scenario():
+        backend = SQLiteBackend(str(tmp_path / 'finance.db'))
+        set_backend(backend)
+        try:
+            # A slot computed before the zone's daylight saving change
+            await backend.create_user(7, {'username': 'u', 'timezone': 'Europe/London', 'summary_slot': 1})
+            await reconcile.main(['--slots'])
+            return (await backend.get_user(7))['summary_slot']
+        finally:
+            set_backend(None)
+            await backend.close()
+
+    assert asyncio.run(scenario()) == summary_slot(7, 'Europe/London')